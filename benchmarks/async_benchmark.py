@@ -0,0 +1,119 @@
+"""Compare the requests/sec of sync and async routes at high concurrency.
+
+Both apps serve the same lookups of the same file data store, with the same
+cached JSON of the contacts. The baseline app declares its routes with `def`,
+like the controller did before the async routes, so that each request is
+handed to a worker thread of the thread pool. The controller awaits the
+in-memory lookups directly on the event loop. The requests are sent
+concurrently in-process with an ASGI transport, so the numbers include the
+routing and the HTTP handling, but no network.
+
+Usage:
+    python -m benchmarks.async_benchmark --cards 20000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+import contactlookup.controller as app_controller
+from benchmarks.corpus import FIRST_NAMES, write_corpus
+from contactlookup.controller import JSONBytesResponse
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+
+def _baseline_app(service: FileDataStoreService) -> FastAPI:
+    app = FastAPI()
+    app.middleware("http")(app_controller.conditional_get)
+
+    def contacts_response(contacts) -> JSONBytesResponse:
+        body = b",".join(map(service.get_contact_json, contacts))
+        return JSONBytesResponse(b'{"contacts":[' + body + b"]}")
+
+    @app.get("/contacts/{contact_id}")
+    def read_contact(contact_id: int):
+        contact = service.get_contact(contact_id)
+        if contact is None:
+            return {"contact": None}
+        return JSONBytesResponse(
+            b'{"contact":' + service.get_contact_json(contact) + b"}",
+        )
+
+    @app.get("/contacts/fname/{fname}")
+    def read_contacts_by_fname(fname: str):
+        return contacts_response(service.get_contacts_by_fname(fname))
+
+    @app.get("/contacts/phone/suffix/{suffix}")
+    def read_contacts_by_phone_number_suffix(suffix: str):
+        return contacts_response(service.get_contacts_by_phone_number_suffix(suffix))
+
+    return app
+
+
+async def _requests_per_second(
+    app: FastAPI,
+    urls: list[str],
+    concurrency: int,
+) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        queue = iter(urls)
+
+        async def worker():
+            for url in queue:
+                assert (await client.get(url)).status_code == 200
+
+        await asyncio.gather(*(client.get(url) for url in urls[:10]))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return len(urls) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = write_corpus(Path(tmp_dir) / "corpus.vcf", args.cards, args.seed)
+        service = FileDataStoreService()
+        service.set_contacts_file_path(file_path)
+        service.initialize()
+    app_controller.set_data_store_service(service)
+
+    rng = random.Random(args.seed)
+    urls = []
+    for index in range(args.requests):
+        if index % 3 == 0:
+            urls.append(f"/contacts/{rng.randint(1, args.cards)}")
+        elif index % 3 == 1:
+            urls.append(f"/contacts/fname/{rng.choice(FIRST_NAMES)}")
+        else:
+            urls.append(f"/contacts/phone/suffix/{rng.randint(0, 9999):04d}")
+
+    baseline = asyncio.run(
+        _requests_per_second(_baseline_app(service), urls, args.concurrency),
+    )
+    async_routes = asyncio.run(
+        _requests_per_second(app_controller.app, urls, args.concurrency),
+    )
+    print(f"contacts:     {args.cards}")
+    print(f"requests:     {args.requests}, {args.concurrency} concurrent")
+    print(f"sync routes:  {baseline:8.1f} requests/s")
+    print(
+        f"async routes: {async_routes:8.1f} requests/s "
+        f"({async_routes / baseline:.1f}x)",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Deterministic synthetic vCard corpus for the benchmarks.
+
+The distributions of the fields are set by a CorpusProfile, e.g. to share
+phone numbers between contacts, give them many addresses, large photos, or
+first names as skewed as in a real address book. The same count, seed and
+profile always give the same corpus.
+
+Usage:
+    python -m benchmarks.corpus corpus.vcf --cards 1000000 --photos 0.1
+"""
+
+import argparse
+import base64
+import random
+from collections.abc import Generator
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import accumulate
+from pathlib import Path
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+    "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph",
+    "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Kristen", "Karla", "Jeff",
+]  # fmt: skip
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+    "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Perez", "Kaufman", "Newman",
+]  # fmt: skip
+COMPANIES = ["Crescendo Associates", "Workerholic", "Viagenie", "Hollywood", "Acme"]
+TITLES = ["CEO", "Engineer", "Manager", "Analyst", "None"]
+STATES = ["CA", "NY", "TX", "WA", "MB", "ON", "DC", "MA", "VT", "IN"]
+COUNTRIES = ["USA", "CA", "Brazil", "Israel", "Namibia", "Montserrat"]
+ADDRESS_TYPES = ["WORK", "HOME", "OTHER"]
+# Number of distinct shared phone numbers, e.g. office lines and landlines.
+SHARED_NUMBER_POOL = 1000
+# Maximum length of a line of a vCard, longer lines are folded
+LINE_LENGTH = 75
+
+
+@dataclass(frozen=True, slots=True)
+class CorpusProfile:
+    """Distributions of the fields of the generated vCards.
+
+    Attributes:
+        shared_numbers (float): The fraction of the phone numbers drawn from a
+            small pool of numbers shared by many contacts.
+        max_addresses (int): Each card has 0 to `max_addresses` addresses.
+        photos (float): The fraction of the cards with an inline PHOTO.
+        photo_bytes (int): The size of each photo, before base64 encoding.
+        name_skew (float): The exponent of the Zipf distribution of the first
+            names. 0 draws them uniformly.
+    """
+
+    shared_numbers: float = 0.0
+    max_addresses: int = 3
+    photos: float = 0.0
+    photo_bytes: int = 4096
+    name_skew: float = 0.0
+
+
+DEFAULT_PROFILE = CorpusProfile()
+
+
+@lru_cache
+def _name_cum_weights(skew: float) -> list[float]:
+    return list(accumulate(1 / rank**skew for rank in range(1, len(FIRST_NAMES) + 1)))
+
+
+@lru_cache
+def _photo_lines(size: int) -> str:
+    """Get the folded lines of a PHOTO property of `size` bytes.
+
+    All the cards share the same photo, so that the corpus is quick to
+    generate, but the parser reads each of them.
+    """
+    data = base64.b64encode(random.Random(size).randbytes(size)).decode("ascii")
+    line = f"PHOTO:data:image/jpeg;base64,{data}"
+    return "\r\n ".join(
+        [line[:LINE_LENGTH]]
+        + [
+            line[start : start + LINE_LENGTH - 1]
+            for start in range(LINE_LENGTH, len(line), LINE_LENGTH - 1)
+        ],
+    )
+
+
+def generate_vcard(
+    rng: random.Random,
+    profile: CorpusProfile = DEFAULT_PROFILE,
+) -> str:
+    """Generate a single vCard."""
+    if profile.name_skew:
+        first_name = rng.choices(
+            FIRST_NAMES,
+            cum_weights=_name_cum_weights(profile.name_skew),
+        )[0]
+    else:
+        first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+    lines = [
+        "BEGIN:VCARD",
+        "VERSION:4.0",
+        f"N:{last_name};{first_name};;;",
+        f"FN:{first_name} {last_name}",
+        f"TITLE:{rng.choice(TITLES)}",
+        f"ORG;TYPE=work:{rng.choice(COMPANIES)}",
+    ]
+    for _ in range(rng.randint(1, 3)):
+        if profile.shared_numbers and rng.random() < profile.shared_numbers:
+            lines.append(
+                f"TEL;TYPE=work:+1-555-{1000000 + rng.randrange(SHARED_NUMBER_POOL)}",
+            )
+            continue
+        lines.append(
+            f"TEL;TYPE=cell:+{rng.randint(1, 99)}-{rng.randint(100, 999)}-"
+            f"{rng.randint(1000000, 9999999)}",
+        )
+    for _ in range(rng.randint(0, profile.max_addresses)):
+        street = f"{rng.randint(1, 99999)} {rng.choice(LAST_NAMES)} St"
+        lines.append(
+            f"ADR;TYPE={rng.choice(ADDRESS_TYPES)};PREF=1:;;{street};"
+            f"{rng.choice(LAST_NAMES)}ville;{rng.choice(STATES)};"
+            f"{rng.randint(10000, 99999)};{rng.choice(COUNTRIES)}",
+        )
+    lines.append(
+        f"BDAY:{rng.randint(1940, 2005)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+    )
+    for _ in range(rng.randint(1, 2)):
+        lines.append(
+            f"EMAIL:{first_name.lower()}.{last_name.lower()}"
+            f"{rng.randint(1, 99999)}@example.net",
+        )
+    if profile.photos and rng.random() < profile.photos:
+        lines.append(_photo_lines(profile.photo_bytes))
+    lines.append("END:VCARD")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def generate_vcards(
+    count: int,
+    seed: int = 0,
+    profile: CorpusProfile = DEFAULT_PROFILE,
+) -> Generator[str, None, None]:
+    """Generate `count` vCards. The same seed always gives the same corpus."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield generate_vcard(rng, profile)
+
+
+def write_corpus(
+    file_path: Path,
+    count: int,
+    seed: int = 0,
+    profile: CorpusProfile = DEFAULT_PROFILE,
+) -> Path:
+    """Write a corpus of `count` vCards to `file_path`."""
+    with file_path.open("w", encoding="utf-8", newline="") as vcf_file:
+        for vcard in generate_vcards(count, seed=seed, profile=profile):
+            vcf_file.write(vcard)
+    return file_path
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Add the options of a CorpusProfile to the arguments of a script."""
+    parser.add_argument("--shared-numbers", type=float, default=0.0)
+    parser.add_argument("--max-addresses", type=int, default=3)
+    parser.add_argument("--photos", type=float, default=0.0)
+    parser.add_argument("--photo-bytes", type=int, default=4096)
+    parser.add_argument("--name-skew", type=float, default=0.0)
+
+
+def profile_from_arguments(args: argparse.Namespace) -> CorpusProfile:
+    return CorpusProfile(
+        shared_numbers=args.shared_numbers,
+        max_addresses=args.max_addresses,
+        photos=args.photos,
+        photo_bytes=args.photo_bytes,
+        name_skew=args.name_skew,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    write_corpus(args.output, args.cards, args.seed, profile_from_arguments(args))
+    print(f"{args.cards} cards written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
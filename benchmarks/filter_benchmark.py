@@ -0,0 +1,83 @@
+"""Compare multi-field filters on the file and columnar data store services.
+
+The columnar times are reported for the vectorized scan alone, and for the
+scan plus building the Contact objects of the matching rows.
+
+Usage:
+    python -m benchmarks.filter_benchmark --cards 200000
+"""
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+
+from benchmarks.corpus import write_corpus
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.services.columnar_data_store_service import (
+    ColumnarDataStoreService,
+)
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+FILTERS = [
+    ContactFilter(state="CA", company_contains="acme"),
+    ContactFilter(first_name="Mary", country="USA"),
+    ContactFilter(title_contains="eng", city="Smithville"),
+]
+
+
+def _seconds_per_call(function: Callable[[], object], repeat: int) -> float:
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = write_corpus(Path(tmp_dir) / "corpus.vcf", args.cards, args.seed)
+        file_service = FileDataStoreService()
+        file_service.set_contacts_file_path(file_path)
+        file_service.initialize()
+        columnar_service = ColumnarDataStoreService()
+        columnar_service.set_contacts_file_path(file_path)
+        columnar_service.initialize()
+
+    for contact_filter in FILTERS:
+        conditions = {
+            name: value
+            for name in contact_filter.__slots__
+            if (value := getattr(contact_filter, name)) is not None
+        }
+        count = len(file_service.filter_contacts(contact_filter))
+        assert count == len(columnar_service.filter_contacts(contact_filter))
+        file_time = _seconds_per_call(
+            partial(file_service.filter_contacts, contact_filter),
+            args.repeat,
+        )
+        table = columnar_service._table
+        scan_time = _seconds_per_call(
+            partial(columnar_service._filter_mask, table, contact_filter),
+            args.repeat,
+        )
+        columnar_time = _seconds_per_call(
+            partial(columnar_service.filter_contacts, contact_filter),
+            args.repeat,
+        )
+        print(f"{conditions}: {count} contacts")
+        print(f"  file scan:                {file_time * 1000:10.1f} ms")
+        print(f"  columnar scan:            {scan_time * 1000:10.1f} ms")
+        print(f"  columnar scan and build:  {columnar_time * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Measure the latency of fuzzy name searches on the trigram index.
+
+The contacts are generated directly, without a VCF file, so that the index can
+be measured at millions of contacts. Their names are made of random syllables,
+which gives tens of thousands of distinct names, like a real address book.
+Each query is the name of a random contact with a random typo.
+
+Usage:
+    python -m benchmarks.fuzzy_benchmark --contacts 1000000 --target-ms 10
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from contactlookup.indexes.trigram_index import TrigramIndex
+from contactlookup.models.contact import Contact
+
+SYLLABLES = [
+    "an", "bel", "car", "da", "el", "fer", "gi", "han", "is", "jo", "ka", "lin",
+    "ma", "na", "ol", "per", "qui", "ro", "sa", "ter", "u", "vi", "wen", "xa",
+    "yo", "zel", "bri", "chen", "dor", "fa", "gor", "lu", "mi", "nor", "ra",
+]  # fmt: skip
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def generate_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def add_typo(rng: random.Random, name: str) -> str:
+    """Substitute, insert, delete or transpose one letter of a name."""
+    position = rng.randrange(len(name))
+    kind = rng.randrange(4)
+    if kind == 0:
+        return name[:position] + rng.choice(LETTERS) + name[position + 1 :]
+    if kind == 1:
+        return name[:position] + rng.choice(LETTERS) + name[position:]
+    if kind == 2 and len(name) > 3:
+        return name[:position] + name[position + 1 :]
+    if position < len(name) - 1:
+        return (
+            name[:position] + name[position + 1] + name[position] + name[position + 2 :]
+        )
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--target-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    first_names = [generate_name(rng) for _ in range(args.contacts // 50 + 1)]
+    last_names = [generate_name(rng) for _ in range(args.contacts // 20 + 1)]
+    contacts = [
+        Contact(
+            contact_id,
+            rng.choice(first_names),
+            rng.choice(last_names),
+            None,
+            None,
+            None,
+        )
+        for contact_id in range(1, args.contacts + 1)
+    ]
+
+    start = time.perf_counter()
+    index = TrigramIndex()
+    for contact in contacts:
+        index.add(contact)
+    build_time = time.perf_counter() - start
+
+    queries = []
+    for _ in range(args.queries):
+        contact = rng.choice(contacts)
+        if rng.random() < 0.5:
+            queries.append(add_typo(rng, contact.first_name))
+        else:
+            queries.append(
+                f"{add_typo(rng, contact.first_name)} {contact.last_name}",
+            )
+
+    latencies = []
+    found = 0
+    for query in queries:
+        start = time.perf_counter()
+        results = index.search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += bool(results)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+
+    print(f"contacts:     {len(contacts)}")
+    print(f"terms:        {len(index)}")
+    print(f"build:        {build_time:8.1f} s")
+    print(f"found:        {found}/{len(queries)} queries")
+    print(f"p50 latency:  {statistics.median(latencies):8.2f} ms")
+    print(f"p99 latency:  {p99:8.2f} ms")
+    print(f"max latency:  {latencies[-1]:8.2f} ms")
+    print(
+        f"p99 target:   {args.target_ms:8.2f} ms "
+        + ("OK" if p99 <= args.target_ms else "MISSED"),
+    )
+
+
+if __name__ == "__main__":
+    main()
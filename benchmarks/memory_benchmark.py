@@ -0,0 +1,63 @@
+"""Measure the memory used per contact by the parsed contacts and the indexes.
+
+Usage:
+    python -m benchmarks.memory_benchmark --cards 20000
+"""
+
+import argparse
+import logging
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.corpus import write_corpus
+from contactlookup.indexes.contact_indexes import ContactIndexes
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+
+def _bytes_per_contact(file_path: Path) -> tuple[int, float, float]:
+    """Get the number of contacts, and the bytes per contact used by the
+    contacts alone and by the contacts with all their indexes."""
+    logger = logging.getLogger(__name__)
+    FileDataStoreService.contact_id = 0
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        contacts = list(
+            FileDataStoreService.read_vcf_file(file_path=file_path, logger=logger),
+        )
+        contacts_size, _ = tracemalloc.get_traced_memory()
+
+        indexes = ContactIndexes()
+        for contact in contacts:
+            indexes.add_contact(contact)
+        indexes.build()
+        indexes_size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    count = max(len(contacts), 1)
+    return (
+        len(contacts),
+        (contacts_size - start) / count,
+        (indexes_size - start) / count,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = write_corpus(Path(tmp_dir) / "corpus.vcf", args.cards, args.seed)
+        count, contacts_rate, indexes_rate = _bytes_per_contact(file_path)
+
+    print(f"contacts:             {count}")
+    print(f"contacts only:        {contacts_rate:8.0f} bytes/contact")
+    print(f"contacts and indexes: {indexes_rate:8.0f} bytes/contact")
+
+
+if __name__ == "__main__":
+    main()
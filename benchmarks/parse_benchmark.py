@@ -0,0 +1,50 @@
+"""Compare the parsing throughput of the fast path extractor and vobject.
+
+Usage:
+    python -m benchmarks.parse_benchmark --cards 20000
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.corpus import write_corpus
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+
+def _cards_per_second(file_path: Path, fast_path: bool) -> tuple[int, float]:
+    logger = logging.getLogger(__name__)
+    FileDataStoreService.contact_id = 0
+    start = time.perf_counter()
+    count = sum(
+        1
+        for _ in FileDataStoreService.read_vcf_file(
+            file_path=file_path,
+            logger=logger,
+            fast_path=fast_path,
+        )
+    )
+    elapsed = time.perf_counter() - start
+    return count, count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = write_corpus(Path(tmp_dir) / "corpus.vcf", args.cards, args.seed)
+        vobject_count, vobject_rate = _cards_per_second(file_path, fast_path=False)
+        fast_count, fast_rate = _cards_per_second(file_path, fast_path=True)
+
+    print(f"vobject:   {vobject_count} cards, {vobject_rate:10.0f} cards/sec")
+    print(f"fast path: {fast_count} cards, {fast_rate:10.0f} cards/sec")
+    print(f"speedup:   {fast_rate / vobject_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Compare the phone number and email postings with dicts of contacts.
+
+The corpus has a fraction of phone numbers shared by many contacts. Each index
+is measured for its memory per key, its lookup time, and the number of
+contacts it returns for all the phone numbers:
+
+* last writer wins: dict of one Contact per key, which loses shared keys.
+  This is how the file data store indexed phone numbers and emails before.
+* lists: dict of a list of Contacts per key.
+* postings: the Postings of the file data store.
+
+Usage:
+    python -m benchmarks.postings_benchmark --cards 100000 --shared 0.2
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from benchmarks.corpus import CorpusProfile, write_corpus
+from contactlookup.indexes.contact_indexes import ContactIndexes
+from contactlookup.indexes.postings import Postings
+from contactlookup.models.contact import Contact
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+
+def _last_writer_wins(contacts: list[Contact]) -> dict[str, Contact]:
+    index = {}
+    for contact in contacts:
+        for phone_number in contact.phone_numbers:
+            index[phone_number.number] = contact
+        for email in contact.emails:
+            index[email.email] = contact
+    return index
+
+
+def _lists(contacts: list[Contact]) -> dict[str, list[Contact]]:
+    index: dict[str, list[Contact]] = {}
+    for contact in contacts:
+        for phone_number in contact.phone_numbers:
+            index.setdefault(phone_number.number, []).append(contact)
+        for email in contact.emails:
+            index.setdefault(email.email, []).append(contact)
+    return index
+
+
+def _postings(contacts: list[Contact]) -> Postings:
+    index = Postings()
+    for contact in contacts:
+        for phone_number in contact.phone_numbers:
+            index.add(phone_number.number, contact.id)
+        for email in contact.emails:
+            key = email.email.lower()
+            index.add(email.email if key == email.email else key, contact.id)
+    return index
+
+
+def _measure(build: Callable[[], object]) -> tuple[object, int]:
+    """Build an index, and get the bytes it allocated."""
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        index = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return index, size - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shared", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = write_corpus(
+            Path(tmp_dir) / "corpus.vcf",
+            args.cards,
+            args.seed,
+            CorpusProfile(shared_numbers=args.shared),
+        )
+        FileDataStoreService.contact_id = 0
+        contacts = list(
+            FileDataStoreService.read_vcf_file(file_path=file_path, logger=logger),
+        )
+    indexes = ContactIndexes()
+    indexes.all_contacts = contacts
+    numbers = list(
+        dict.fromkeys(
+            phone_number.number
+            for contact in contacts
+            for phone_number in contact.phone_numbers
+        ),
+    )
+
+    # The indexes are of different types
+    lookups: dict[str, Callable[[Any, str], list[Contact]]] = {
+        "last writer wins": lambda index, key: (
+            [contact] if (contact := index.get(key)) else []
+        ),
+        "lists": lambda index, key: index.get(key, []),
+        "postings": lambda index, key: indexes.get_contacts(index.get(key)),
+    }
+    builds = {
+        "last writer wins": _last_writer_wins,
+        "lists": _lists,
+        "postings": _postings,
+    }
+    print(f"{len(contacts)} contacts, {len(numbers)} distinct phone numbers")
+    for name, build in builds.items():
+        index, size = _measure(lambda: build(contacts))
+        lookup = lookups[name]
+        start = time.perf_counter()
+        found = sum(len(lookup(index, number)) for number in numbers)
+        lookup_time = (time.perf_counter() - start) / len(numbers)
+        print(f"{name}:")
+        print(f"  memory:   {size / len(index):8.1f} bytes/key")
+        print(f"  lookup:   {lookup_time * 1e6:8.2f} us")
+        print(f"  contacts: {found:8d}")
+
+
+if __name__ == "__main__":
+    main()
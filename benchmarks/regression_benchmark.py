@@ -0,0 +1,315 @@
+"""Measure the ingest and the lookups of the file data store, and compare them
+with a baseline.
+
+For each corpus size, the corpus is loaded by FileDataStoreService in a new
+process, so that its peak RSS is that of a single load. The process reports:
+
+* the ingest rate, in cards/s, and the time of each stage of the load,
+* the peak RSS of the process, before and after the load,
+* the latency percentiles of each endpoint, for lookups of random contacts of
+  the corpus. The requests are sent one at a time in-process with an ASGI
+  transport, so the latencies include the routing and the JSON responses, but
+  no network.
+
+The results are written as JSON with `--output`. With `--compare`, they are
+compared with such a file, and the script fails if any of them regressed by
+more than `--tolerance`.
+
+Usage:
+    python -m benchmarks.regression_benchmark --cards 10000 100000 --output baseline.json
+    python -m benchmarks.regression_benchmark --cards 10000 100000 --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+from benchmarks.corpus import (
+    STATES,
+    CorpusProfile,
+    add_profile_arguments,
+    profile_from_arguments,
+    write_corpus,
+)
+from contactlookup.models.contact import Contact
+
+# Version of the format of the results
+RESULTS_FORMAT = 1
+# Paths of the measured endpoints, for a random contact
+ENDPOINTS: dict[str, Callable[[random.Random, Contact], str]] = {
+    "/contacts/{contact_id}": lambda rng, contact: f"/contacts/{contact.id}",
+    "/contacts/fname/{fname}": lambda rng, contact: (
+        f"/contacts/fname/{quote(contact.first_name)}"
+    ),
+    "/contacts/fname/prefix/{prefix}": lambda rng, contact: (
+        f"/contacts/fname/prefix/{quote(contact.first_name[:3])}"
+    ),
+    "/contacts/lname/{lname}": lambda rng, contact: (
+        f"/contacts/lname/{quote(contact.last_name)}"
+    ),
+    "/contacts/fullname/{fname}/{lname}": lambda rng, contact: (
+        f"/contacts/fullname/{quote(contact.first_name)}/{quote(contact.last_name)}"
+    ),
+    "/contacts/phone/{phone_number}": lambda rng, contact: (
+        f"/contacts/phone/{quote(rng.choice(contact.phone_numbers).number, safe='')}"
+    ),
+    "/contacts/phone/suffix/{suffix}": lambda rng, contact: (
+        f"/contacts/phone/suffix/{rng.choice(contact.phone_numbers).number[-4:]}"
+    ),
+    "/contacts/email/{email}": lambda rng, contact: (
+        f"/contacts/email/{quote(rng.choice(contact.emails).email, safe='')}"
+    ),
+    "/contacts/state/{state}": lambda rng, contact: (
+        f"/contacts/state/{rng.choice(STATES)}?limit=100"
+    ),
+    "/contacts/name/fuzzy/{name}": lambda rng, contact: (
+        f"/contacts/name/fuzzy/{quote(contact.first_name + ' ' + contact.last_name)}"
+    ),
+    "/search": lambda rng, contact: (
+        f"/search?q={quote(contact.first_name + ' ' + contact.last_name)}"
+    ),
+}
+# Warm-up requests of each endpoint, which are not measured
+WARMUP_REQUESTS = 5
+
+
+def _peak_rss_bytes() -> int:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In kilobytes on Linux, and in bytes on macOS
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def _percentiles(seconds: list[float]) -> dict[str, float]:
+    """Get the p50, p90 and p99 and the maximum of durations, in ms."""
+    cuts = statistics.quantiles(seconds, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * 1000,
+        "p90": cuts[89] * 1000,
+        "p99": cuts[98] * 1000,
+        "max": max(seconds) * 1000,
+    }
+
+
+async def _latencies(app, urls: list[str]) -> list[float]:
+    # Imported here, so that the parent process does not import the app.
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for url in urls[:WARMUP_REQUESTS]:
+            assert (await client.get(url)).status_code == 200
+        latencies = []
+        for url in urls:
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, url
+        return latencies
+
+
+def measure(file_path: Path, queries: int, seed: int) -> dict:
+    """Load a corpus, and measure the load and the lookups of the endpoints.
+
+    Run it in a new process, so that the peak RSS is only that of this load.
+    """
+    import contactlookup.controller as app_controller
+    from contactlookup.services.file_data_store_service import FileDataStoreService
+
+    start_rss = _peak_rss_bytes()
+    FileDataStoreService.contact_id = 0
+    service = FileDataStoreService()
+    service.set_contacts_file_path(file_path)
+    start = time.perf_counter()
+    assert service.initialize(), f"Could not load {file_path}"
+    ingest_seconds = time.perf_counter() - start
+    ingest_rss = _peak_rss_bytes()
+    contacts = service.all_contacts
+    stats = service.get_ingest_stats()
+    assert stats is not None, "The file data store has no ingest stats."
+
+    app_controller.set_data_store_service(service)
+    rng = random.Random(seed)
+    latencies = {}
+    for endpoint, url in ENDPOINTS.items():
+        urls = [url(rng, rng.choice(contacts)) for _ in range(queries)]
+        latencies[endpoint] = _percentiles(
+            asyncio.run(_latencies(app_controller.app, urls)),
+        )
+    return {
+        "contacts": len(contacts),
+        "ingest_seconds": ingest_seconds,
+        "ingest_cards_per_second": len(contacts) / ingest_seconds,
+        "ingest_stages_seconds": {
+            "read": stats.read_seconds,
+            "parse": stats.parse_seconds,
+            "index": stats.index_seconds,
+        },
+        "start_rss_bytes": start_rss,
+        "ingest_peak_rss_bytes": ingest_rss,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "latency_ms": latencies,
+    }
+
+
+def _corpus_path(
+    corpus_dir: Path,
+    cards: int,
+    seed: int,
+    profile: CorpusProfile,
+) -> Path:
+    """Get the path of a corpus, and generate it if it does not exist yet."""
+    digest = hashlib.sha1(repr(profile).encode("utf-8")).hexdigest()[:8]
+    file_path = corpus_dir / f"corpus-{cards}-{seed}-{digest}.vcf"
+    if not file_path.exists():
+        print(f"Generating {cards} cards...", file=sys.stderr)
+        partial_path = file_path.with_suffix(".partial")
+        write_corpus(partial_path, cards, seed, profile)
+        partial_path.rename(file_path)
+    return file_path
+
+
+def run(
+    sizes: list[int],
+    corpus_dir: Path,
+    queries: int,
+    seed: int,
+    profile: CorpusProfile,
+) -> dict:
+    """Measure the corpora of each size, and get the results."""
+    runs = []
+    # A new interpreter for each corpus, rather than a fork of this one
+    context = multiprocessing.get_context("spawn")
+    for cards in sizes:
+        file_path = _corpus_path(corpus_dir, cards, seed, profile)
+        print(f"Measuring {cards} cards...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(measure, file_path, queries, seed).result()
+        runs.append({"cards": cards, **result})
+    return {
+        "format": RESULTS_FORMAT,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "queries": queries,
+        "profile": asdict(profile),
+        "runs": runs,
+    }
+
+
+def _metrics(run_results: dict) -> dict[str, tuple[float, bool]]:
+    """Get the compared metrics of a run, and whether higher is better."""
+    metrics = {
+        "ingest cards/s": (run_results["ingest_cards_per_second"], True),
+        "peak RSS MB": (run_results["peak_rss_bytes"] / 2**20, False),
+    }
+    for endpoint, latency in run_results["latency_ms"].items():
+        metrics[f"{endpoint} p50 ms"] = (latency["p50"], False)
+        metrics[f"{endpoint} p99 ms"] = (latency["p99"], False)
+    return metrics
+
+
+def compare(baseline: dict, results: dict, tolerance: float) -> list[str]:
+    """Print the changes of the results from a baseline, and get the
+    regressions larger than `tolerance`, a fraction of the baseline."""
+    for key in ("seed", "queries", "profile"):
+        if baseline.get(key) != results[key]:
+            print(f"warning: the {key} differs from the baseline", file=sys.stderr)
+    baseline_runs = {run["cards"]: run for run in baseline["runs"]}
+    regressions = []
+    for run_results in results["runs"]:
+        baseline_run = baseline_runs.get(run_results["cards"])
+        if baseline_run is None:
+            print(f"No baseline of {run_results['cards']} cards")
+            continue
+        print(f"{run_results['cards']} cards:")
+        baseline_metrics = _metrics(baseline_run)
+        for name, (value, higher_is_better) in _metrics(run_results).items():
+            if name not in baseline_metrics:
+                continue
+            baseline_value = baseline_metrics[name][0]
+            change = value / baseline_value - 1 if baseline_value else 0.0
+            regressed = (-change if higher_is_better else change) > tolerance
+            print(
+                f"  {name:48} {baseline_value:12.3f} {value:12.3f} {change:+8.1%}"
+                + ("  REGRESSED" if regressed else ""),
+            )
+            if regressed:
+                regressions.append(f"{run_results['cards']} cards: {name}")
+    return regressions
+
+
+def _print_results(results: dict):
+    for run_results in results["runs"]:
+        stages = run_results["ingest_stages_seconds"]
+        print(f"{run_results['cards']} cards:")
+        print(
+            f"  ingest:   {run_results['ingest_cards_per_second']:10.0f} cards/s "
+            f"({run_results['ingest_seconds']:.1f}s: read {stages['read']:.1f}s, "
+            f"parse {stages['parse']:.1f}s, index {stages['index']:.1f}s)",
+        )
+        print(
+            f"  peak RSS: {run_results['peak_rss_bytes'] / 2**20:10.1f} MB "
+            f"({run_results['start_rss_bytes'] / 2**20:.1f} MB before the load)",
+        )
+        for endpoint, latency in run_results["latency_ms"].items():
+            print(
+                f"  {endpoint:38} p50 {latency['p50']:8.3f} ms "
+                f"p90 {latency['p90']:8.3f} ms p99 {latency['p99']:8.3f} ms",
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--corpus-dir",
+        type=Path,
+        help="Keep the generated corpora in this directory, to reuse them.",
+    )
+    parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+    parser.add_argument("--compare", type=Path, help="JSON results of a baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profile = profile_from_arguments(args)
+    if args.corpus_dir:
+        args.corpus_dir.mkdir(parents=True, exist_ok=True)
+        results = run(args.cards, args.corpus_dir, args.queries, args.seed, profile)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = run(args.cards, Path(tmp_dir), args.queries, args.seed, profile)
+
+    _print_results(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
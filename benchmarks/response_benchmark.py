@@ -0,0 +1,87 @@
+"""Compare the requests/sec of /contacts/state/{state} with FastAPI's encoding
+and with the cached JSON of the contacts.
+
+Both apps serve the same pages of the same file data store. The baseline app
+returns the contacts to FastAPI, which encodes them with `jsonable_encoder` on
+every request, like the controller did before the JSON cache. The requests
+are sent in-process with the test client, so the numbers include the routing
+and the HTTP handling, but no network.
+
+Usage:
+    python -m benchmarks.response_benchmark --cards 20000 --limit 1000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Query
+from fastapi.testclient import TestClient
+
+import contactlookup.controller as app_controller
+from benchmarks.corpus import STATES, write_corpus
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+
+def _baseline_app(service: FileDataStoreService) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/contacts/state/{state}")
+    def read_contacts_by_state(
+        state: str,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: int = Query(0, ge=0),
+    ):
+        contacts = service.get_contacts_by_state(state, after=cursor, limit=limit + 1)
+        next_cursor = contacts[limit - 1].id if len(contacts) > limit else None
+        return {"contacts": contacts[:limit], "next_cursor": next_cursor}
+
+    return app
+
+
+def _requests_per_second(client: TestClient, urls: list[str]) -> float:
+    for url in urls[:10]:
+        client.get(url)
+    start = time.perf_counter()
+    for url in urls:
+        assert client.get(url).status_code == 200
+    return len(urls) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = write_corpus(Path(tmp_dir) / "corpus.vcf", args.cards, args.seed)
+        service = FileDataStoreService()
+        service.set_contacts_file_path(file_path)
+        service.initialize()
+    app_controller.set_data_store_service(service)
+
+    urls = [
+        f"/contacts/state/{STATES[index % len(STATES)]}?limit={args.limit}"
+        for index in range(args.requests)
+    ]
+    baseline_client = TestClient(_baseline_app(service))
+    cached_client = TestClient(app_controller.app)
+    assert all(
+        baseline_client.get(url).json() == cached_client.get(url).json()
+        for url in urls[: len(STATES)]
+    )
+
+    baseline = _requests_per_second(baseline_client, urls)
+    cached = _requests_per_second(cached_client, urls)
+    print(f"contacts:         {args.cards}")
+    print(f"contacts/page:    {args.limit}")
+    print(f"jsonable_encoder: {baseline:8.1f} requests/s")
+    print(f"cached JSON:      {cached:8.1f} requests/s ({cached / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
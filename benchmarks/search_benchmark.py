@@ -0,0 +1,73 @@
+"""Measure the latency of full-text searches on the text index.
+
+Each query is one to three random tokens of a random contact of the corpus, so
+every query has at least one match. The queries are run twice, and the second
+run is reported, since the first search of a common token sorts its postings.
+
+Usage:
+    python -m benchmarks.search_benchmark --cards 200000
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.corpus import write_corpus
+from contactlookup.indexes.text_index import TextIndex, contact_tokens
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = write_corpus(Path(tmp_dir) / "corpus.vcf", args.cards, args.seed)
+        FileDataStoreService.contact_id = 0
+        contacts = list(
+            FileDataStoreService.read_vcf_file(file_path=file_path, logger=logger),
+        )
+
+    start = time.perf_counter()
+    index = TextIndex()
+    for contact in contacts:
+        index.add(contact)
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    queries = []
+    for _ in range(args.queries):
+        tokens = contact_tokens(rng.choice(contacts))
+        queries.append(
+            " ".join(rng.sample(tokens, min(len(tokens), rng.randint(1, 3)))),
+        )
+
+    for query in queries:
+        index.search(query)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        latencies.append(((time.perf_counter() - start) * 1000, query))
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1][0]
+
+    print(f"contacts:     {len(contacts)}")
+    print(f"build:        {build_time:8.1f} s")
+    print(
+        f"p50 latency:  {statistics.median(latency for latency, _ in latencies):8.2f} ms",
+    )
+    print(f"p99 latency:  {p99:8.2f} ms")
+    print(f"max latency:  {latencies[-1][0]:8.2f} ms ({latencies[-1][1]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-"""Initialize logger"""
+"""Contact lookup package.
 
-from contactlookup.utils import initialize_application_logger
-
-initialize_application_logger()
+Importing the package has no side effects. The application logger is set up
+by the command line interface, see `contactlookup.__main__`.
+"""
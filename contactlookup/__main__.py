@@ -1,26 +1,44 @@
-"""Main module for the contactlookup package."""
+"""Main module for the contactlookup package.
+
+The modules of the server and of the data store services are imported when
+they are used, so that `contactlookup --help` does not pay for them.
+"""
 
 import logging
+import shutil
 import site
+import tempfile
 import traceback
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import fire
-import uvicorn
-
-import contactlookup.controller as app_controller
 from contactlookup.definitions import (
+    COLUMNAR_DATA_STORE_SERVICE,
+    DATABASE_DATA_STORE_SERVICE,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
     FILE_DATA_STORE_SERVICE,
     ROOT_DIR,
     SAMPLE_CONTACTS_DIR,
     SAMPLE_CONTACTS_FILE,
 )
-from contactlookup.services.data_store_service import DataStoreService
-from contactlookup.services.file_data_store_service import FileDataStoreService
-from contactlookup.utils import split_unix_path_string
+from contactlookup.utils import initialize_application_logger, split_unix_path_string
+
+if TYPE_CHECKING:
+    from contactlookup.services.columnar_data_store_service import (
+        ColumnarDataStoreService,
+    )
+    from contactlookup.services.data_store_service import DataStoreService
+    from contactlookup.services.database_data_store_service import (
+        DatabaseDataStoreService,
+    )
+    from contactlookup.services.file_data_store_service import FileDataStoreService
 
 
-def _load_contacts_file(service: FileDataStoreService, contacts_file_path: str | None):
+def _load_contacts_file(
+    service: "FileDataStoreService | ColumnarDataStoreService | DatabaseDataStoreService",
+    contacts_file_path: str | None,
+):
     # Ensure the contacts file path is provided.
     # If no file is provided by the user, use the default contacts file:
     # SAMPLE_CONTACTS_DIR/SAMPLE_CONTACTS_FILE in the tests directory.
@@ -80,16 +98,33 @@ def _load_contacts_file(service: FileDataStoreService, contacts_file_path: str |
 def _setup(
     data_store_service: str | None = None,
     contacts_file_path: str | None = None,
-) -> DataStoreService | None:
+    parse_workers: int = 1,
+    snapshot: bool = False,
+    incremental: bool = False,
+    database_path: str | None = None,
+    phonetic: bool = False,
+) -> "DataStoreService | None":
     """
     data_store_service is used to indicate the type of data store service to
     use.
     Options:
     1. f: indicates FileDataStoreService
-    2. d: indicates DatabaseDataStoreService (not implemented)
+    2. c: indicates ColumnarDataStoreService (requires numpy)
+    3. d: indicates DatabaseDataStoreService (SQLite)
 
     If no data_store_service is provided, the default is FileDataStoreService.
     If an invalid data_store_service is provided, the default is FileDataStoreService.
+
+    parse_workers is the number of processes used to parse the contacts file.
+    snapshot enables saving the parsed contacts next to the contacts file, so
+    that the next start does not parse the file again if it has not changed.
+    incremental enables only parsing the new and changed cards when the
+    contacts file is reloaded.
+    database_path is the path of the SQLite database of the
+    DatabaseDataStoreService. Defaults to the contacts file path with a
+    .sqlite suffix.
+    phonetic enables the index of the Soundex keys of the names of the
+    FileDataStoreService, for the sound-alike lookups.
     """
     logger = logging.getLogger(__name__)
     if not data_store_service:
@@ -98,15 +133,75 @@ def _setup(
 
     logger.info("Using data store service option: %s", data_store_service)
     # Tell the user what data store service is being used
-    if data_store_service == FILE_DATA_STORE_SERVICE:
+    if data_store_service == COLUMNAR_DATA_STORE_SERVICE:
+        try:
+            # NumPy is an optional dependency, only imported when it is used.
+            from contactlookup.services.columnar_data_store_service import (
+                ColumnarDataStoreService,
+            )
+
+            print("Using ColumnarDataStoreService")
+        except ImportError as e:
+            logger.error("_setup|Columnar data store service unavailable: %s", e)
+            print(
+                "ColumnarDataStoreService requires numpy: "
+                "pip install numpy. Using FileDataStoreService",
+            )
+            data_store_service = FILE_DATA_STORE_SERVICE
+    elif data_store_service == DATABASE_DATA_STORE_SERVICE:
+        from contactlookup.services.database_data_store_service import (
+            DatabaseDataStoreService,
+        )
+
+        print("Using DatabaseDataStoreService")
+    elif data_store_service == FILE_DATA_STORE_SERVICE:
         print("Using FileDataStoreService")
     else:
-        # Not implemented databaseconnection. Would require a database connection.
         print("Invalid data store service. Using FileDataStoreService")
         print(f"data_store_service: {data_store_service}")
         data_store_service = FILE_DATA_STORE_SERVICE
+    if data_store_service == FILE_DATA_STORE_SERVICE:
+        from contactlookup.services.file_data_store_service import (
+            FileDataStoreService,
+        )
+
+    # Only the file data store service snapshots, reloads and indexes the
+    # phonetic keys.
+    ignored_options = [
+        name
+        for name, value in (
+            ("snapshot", snapshot),
+            ("incremental", incremental),
+            ("phonetic", phonetic),
+        )
+        if value
+    ]
+    if ignored_options and data_store_service != FILE_DATA_STORE_SERVICE:
+        logger.warning(
+            "_setup|Options ignored by the %s data store service: %s",
+            data_store_service,
+            ", ".join(ignored_options),
+        )
+        print(
+            "Ignoring the options of FileDataStoreService: "
+            + ", ".join(f"--{name}" for name in ignored_options),
+        )
 
-    service = FileDataStoreService()
+    service: FileDataStoreService | ColumnarDataStoreService | DatabaseDataStoreService
+    if data_store_service == COLUMNAR_DATA_STORE_SERVICE:
+        service = ColumnarDataStoreService(parse_workers=parse_workers)
+    elif data_store_service == DATABASE_DATA_STORE_SERVICE:
+        service = DatabaseDataStoreService(
+            database_path=Path(database_path) if database_path else None,
+            parse_workers=parse_workers,
+        )
+    else:
+        service = FileDataStoreService(
+            parse_workers=parse_workers,
+            snapshot=snapshot,
+            incremental=incremental,
+            phonetic=phonetic,
+        )
     _load_contacts_file(service=service, contacts_file_path=contacts_file_path)
     initialized = service.initialize()
     if not initialized:
@@ -118,38 +213,115 @@ def _setup(
 
 def cli():
     """Command line interface."""
+    import fire
+
     fire.Fire(main)
 
 
-def main(service: str | None = FILE_DATA_STORE_SERVICE, file: str | None = None):
+def main(
+    service: str | None = FILE_DATA_STORE_SERVICE,
+    file: str | None = None,
+    parse_workers: int = 1,
+    snapshot: bool = False,
+    watch: float = 0,
+    incremental: bool = False,
+    database: str | None = None,
+    phonetic: bool = False,
+    workers: int = 1,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    loop: str = "auto",
+    http: str = "auto",
+    backlog: int = 2048,
+    keep_alive: int = 5,
+):
     """Expose API to query contacts.
 
     Args:
-        service (str | None, optional): The data store service to use. Defaults to FILE_DATA_STORE_SERVICE.
+        service (str | None, optional): The data store service to use, f (file), c (columnar) or d (SQLite database). Defaults to FILE_DATA_STORE_SERVICE.
         file (str | None, optional): The path to the contacts file. Defaults to None.
+        parse_workers (int, optional): The number of processes used to parse the contacts file. Defaults to 1.
+        snapshot (bool, optional): Save the parsed contacts next to the contacts file, and load them on the next start if the file has not changed. Defaults to False.
+        watch (float, optional): Check the contacts file for changes every `watch` seconds, and reload it when it changes. Only with 1 worker. Defaults to 0 (disabled).
+        incremental (bool, optional): When the contacts file is reloaded, only parse the cards that were added or changed. Defaults to False.
+        database (str | None, optional): The path of the SQLite database used by the d service. Defaults to the contacts file path with a .sqlite suffix.
+        phonetic (bool, optional): Index the Soundex keys of the names, so that sound-alike lookups do not scan all the contacts. Defaults to False.
+        workers (int, optional): The number of server processes. The contacts are loaded once, then the workers are forked and share their memory. Defaults to 1.
+        host (str, optional): The host to bind. Defaults to DEFAULT_HOST.
+        port (int, optional): The port to bind. Defaults to DEFAULT_PORT.
+        loop (str, optional): The event loop of uvicorn, auto, asyncio or uvloop. Defaults to auto.
+        http (str, optional): The HTTP parser of uvicorn, auto, h11 or httptools. Defaults to auto.
+        backlog (int, optional): The maximum number of connections waiting to be accepted. Defaults to 2048.
+        keep_alive (int, optional): Close the idle keep-alive connections after this many seconds. Defaults to 5.
     """
-    data_store_service = _setup(data_store_service=service, contacts_file_path=file)
+    initialize_application_logger()
+    logger = logging.getLogger(__name__)
+    if watch > 0 and workers > 1:
+        # Each worker would reload the file on its own. The workers would then
+        # disagree on the contact IDs, cursors and ETags, and no longer share
+        # the memory of the contacts.
+        logger.error("main|Cannot watch the contacts file with %s workers", workers)
+        print("--watch requires a single worker. Restart the workers to reload.")
+        return
+    data_store_service = _setup(
+        data_store_service=service,
+        contacts_file_path=file,
+        parse_workers=parse_workers,
+        snapshot=snapshot,
+        incremental=incremental,
+        database_path=database,
+        phonetic=phonetic,
+    )
     if not data_store_service:
         return
 
     # At this point, the data store service is initialized
     # We can now run the FastAPI application
-    logger = logging.getLogger(__name__)
     logger.info("Data store service initialized")
     print("Data store service initialized")
 
+    import contactlookup.controller as app_controller
+    from contactlookup.server import serve
+    from contactlookup.services.file_data_store_service import FileDataStoreService
+
     app_controller.set_data_store_service(data_store_service)
+    if watch > 0 and isinstance(data_store_service, FileDataStoreService):
+        logger.info("Watching the contacts file every %s seconds", watch)
+        data_store_service.start_watching(interval=watch)
+
+    # The workers share their metrics through the files of a directory, so
+    # that a scrape gets the metrics of all of them.
+    metrics_dir = (
+        Path(tempfile.mkdtemp(prefix="contactlookup-metrics-")) if workers > 1 else None
+    )
+
+    def on_worker_start():
+        if metrics_dir:
+            app_controller.share_metrics(metrics_dir)
 
     # Run the FastAPI application
     try:
         logger.info("Starting FastAPI application")
-        uvicorn.run(app_controller.app, host="0.0.0.0", port=8000)
+        serve(
+            app_controller.app,
+            host=host,
+            port=port,
+            workers=workers,
+            loop=loop,
+            http=http,
+            backlog=backlog,
+            timeout_keep_alive=keep_alive,
+            on_worker_start=on_worker_start,
+        )
     except Exception as e:
         logger.error("Error starting FastAPI application: %s", e)
         print(f"Error starting FastAPI application: {e}")
         stack_trace = traceback.format_exc()
         logger.error("Stack trace: %s", stack_trace)
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
-    fire.Fire(main)
+    cli()
@@ -1,92 +1,498 @@
 """Controller for the contactlookup app."""
 
-from fastapi import FastAPI
+import logging
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
 
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from contactlookup.metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    RequestMetrics,
+    read_metrics_files,
+    render_metrics,
+    write_metrics_file,
+)
+from contactlookup.models.contact import Contact
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup
+from contactlookup.serialization import encode_json
+from contactlookup.services.async_data_store_service import AsyncDataStoreService
 from contactlookup.services.data_store_service import DataStoreService
 
 app = FastAPI()
 service: DataStoreService | None = None
+# The routes are async, and await the lookups of the service through this.
+async_service: AsyncDataStoreService | None = None
+
+# Pages of the list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Values of a bulk lookup
+MAX_LOOKUP_VALUES = 10000
+# Clients may keep the responses, but must check that they are still current
+# with a conditional request, which is answered from the ETag alone.
+CACHE_CONTROL = "no-cache"
+# The paths of the responses that only depend on the contacts
+_CACHED_PATHS = ("/contacts", "/search")
+
+
+class JSONBytesResponse(Response):
+    """A response whose body is already encoded JSON.
+
+    The contacts are not validated or encoded again by FastAPI: the body is
+    assembled from the JSON of each contact, which the data store can cache.
+    """
+
+    media_type = "application/json"
+
+
+async def _contacts_response(
+    contacts: list[Contact],
+    **fields,
+) -> JSONBytesResponse:
+    """Get a response with a list of contacts, and some other fields.
+
+    Only called by the routes, once they checked that the service is set.
+    """
+    assert async_service is not None, "Data store service not set."
+    contacts_json = await async_service.get_contacts_json(contacts)
+    body = [b'{"contacts":[', b",".join(contacts_json), b"]"]
+    for name, value in fields.items():
+        body.append(b",%s:%s" % (encode_json(name), encode_json(value)))
+    body.append(b"}")
+    return JSONBytesResponse(b"".join(body))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check if an If-None-Match header matches an ETag, weakly."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """Tag the responses with the version of the contacts, and answer the
+    requests of a client that has the current version with 304 Not Modified,
+    without running the route."""
+    version = service.get_dataset_version() if service else None
+    if (
+        version is None
+        or request.method not in ("GET", "HEAD")
+        or not request.url.path.startswith(_CACHED_PATHS)
+    ):
+        return await call_next(request)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
+
+# Added after the other middlewares, so that it measures all of them, e.g. the
+# 304 Not Modified responses of `conditional_get`.
+request_metrics = RequestMetrics()
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+# The directory where the workers share their metrics, see share_metrics
+metrics_dir: Path | None = None
+
+
+def share_metrics(directory: Path, interval: float = 1.0):
+    """Share the metrics of this worker process with the other workers.
+
+    The counters of this worker are written to `directory` every `interval`
+    seconds by a daemon thread, and before each scrape. The scrapes then get
+    the metrics of all the workers. Call it in each worker.
+    """
+    global metrics_dir
+    metrics_dir = directory
+
+    def write_periodically():
+        logger = logging.getLogger(__name__)
+        while True:
+            time.sleep(interval)
+            try:
+                _write_metrics(directory)
+            except OSError as e:
+                logger.error("share_metrics|Error writing the metrics: %s", e)
+
+    threading.Thread(target=write_periodically, daemon=True).start()
 
 
-def set_data_store_service(data_store_service: DataStoreService):
+def _write_metrics(directory: Path):
+    cache_stats = service.get_cache_stats() if service else []
+    write_metrics_file(directory, request_metrics, cache_stats)
+
+
+def set_data_store_service(data_store_service: DataStoreService | None):
     """Set the data store service.
 
     In the future, we will implement a database service to store contacts. This
     function will be used to set the database service to be used by the
     controller.
 
+    The service and its async wrapper are always set together here.
+
     Args:
-        data_store_service (DataStoreService): The data store service.
+        data_store_service (DataStoreService | None): The data store service,
+            or None to unset it.
     """
-    global service
+    global service, async_service
     service = data_store_service
+    async_service = (
+        AsyncDataStoreService(data_store_service)
+        if data_store_service is not None
+        else None
+    )
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     """Welcome message."""
     msg = "Welcome to the Contact Lookup App. Use the /docs endpoint to see the API documentation."
     return {"message": msg}
 
 
+@app.get("/metrics")
+async def read_metrics():
+    """Get the metrics of the requests and of the data store, in the
+    Prometheus text format.
+
+    They are rendered in a worker thread: the index sizes are measured by
+    walking the indexes, the database is queried, and the metrics of the other
+    workers are read from their files.
+    """
+    body = await run_in_threadpool(_render_metrics)
+    return Response(body, media_type=CONTENT_TYPE)
+
+
+def _render_metrics() -> str:
+    """Render the metrics of this worker, or of all the workers if they share
+    their metrics."""
+    if metrics_dir is None:
+        return render_metrics(request_metrics, service)
+    _write_metrics(metrics_dir)
+    all_request_metrics, cache_stats = read_metrics_files(metrics_dir)
+    return render_metrics(all_request_metrics, service, cache_stats)
+
+
+@app.get("/search")
+async def search_contacts(q: str, limit: int = Query(10, ge=1, le=100)):
+    """Get the contacts that have all the words of a query in any of their
+    fields, best match first.
+
+    e.g. /search?q=acme%20toronto
+    """
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.search_contacts(q, limit)
+    return await _contacts_response(contacts)
+
+
+async def _page(
+    contacts: list[Contact],
+    limit: int,
+    cursor: Callable[[Contact], int | str] = lambda contact: contact.id,
+) -> JSONBytesResponse:
+    """Get a page of contacts sorted by ID from the page and the next contact.
+
+    `next_cursor` is the cursor of the next page, or None on the last page. It
+    is the `cursor` of the last contact of the page.
+    """
+    next_cursor = cursor(contacts[limit - 1]) if len(contacts) > limit else None
+    return await _contacts_response(contacts[:limit], next_cursor=next_cursor)
+
+
+def _name_cursor(contact: Contact) -> str:
+    """Get the cursor of the page after a contact, for the pages sorted by
+    first name and ID."""
+    return f"{contact.first_name}:{contact.id}"
+
+
+def _parse_name_cursor(cursor: str | None) -> tuple[str, int] | None:
+    """Get the (first name, ID) of a cursor of `_name_cursor`."""
+    if cursor is None:
+        return None
+    first_name, _, contact_id = cursor.rpartition(":")
+    if not contact_id.isdigit():
+        raise HTTPException(status_code=422, detail="Invalid cursor.")
+    return first_name, int(contact_id)
+
+
 @app.get("/contacts")
-def read_contacts():
-    """Get all contacts."""
-    if not service:
+async def read_contacts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int = Query(0, ge=0),
+):
+    """Get all contacts, sorted by ID, one page at a time.
+
+    e.g. /contacts?limit=100&cursor=1234, where the cursor is the
+    `next_cursor` of the previous page.
+    """
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts(after=cursor, limit=limit + 1)
+    return await _page(contacts, limit)
+
+
+# Declared before /contacts/{contact_id}, which would match "filter" as an ID.
+@app.get("/contacts/filter")
+async def read_contacts_by_filter(
+    contact_filter: ContactFilter = Depends(),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int = Query(0, ge=0),
+):
+    """Get contacts that match all the given conditions, sorted by ID, one page
+    at a time like /contacts.
+
+    e.g. /contacts/filter?state=CA&company_contains=acme
+    """
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    if not contact_filter.has_conditions():
+        raise HTTPException(
+            status_code=400,
+            detail="At least one condition is required.",
+        )
+    contacts = await async_service.filter_contacts(
+        contact_filter,
+        after=cursor,
+        limit=limit + 1,
+    )
+    return await _page(contacts, limit)
+
+
+@app.post("/contacts/lookup")
+async def lookup_contacts(lookup: ContactLookup):
+    """Get the contacts of many phone numbers, emails and first names at once.
+
+    e.g. {"phone_numbers": ["+1 555-0100"], "emails": ["a@example.com"],
+    "first_names": ["Jeff"]}
+
+    Each value is mapped to the IDs of its contacts, and each contact is
+    returned once in `contacts`, keyed by ID.
+    """
+    if not async_service:
         return {"Error": "Data store service not set"}
-    contacts = service.get_contacts()
-    return {"contacts": contacts}
+    if len(lookup) > MAX_LOOKUP_VALUES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {MAX_LOOKUP_VALUES} values can be looked up at once.",
+        )
+    result = await async_service.lookup_contacts(lookup)
+    contact_ids = sorted(result.contacts)
+    contacts_json = await async_service.get_contacts_json(
+        [result.contacts[contact_id] for contact_id in contact_ids],
+    )
+    contacts = b",".join(
+        b'"%d":%s' % (contact_id, contact_json)
+        for contact_id, contact_json in zip(contact_ids, contacts_json)
+    )
+    return JSONBytesResponse(
+        b'{"phone_numbers":%s,"emails":%s,"first_names":%s,"contacts":{%s}}'
+        % (
+            encode_json(result.phone_numbers),
+            encode_json(result.emails),
+            encode_json(result.first_names),
+            contacts,
+        ),
+    )
 
 
 @app.get("/contacts/{contact_id}")
-def read_contact(contact_id: int):
+async def read_contact(contact_id: int):
     """Get contact by ID."""
-    if not service:
+    if not async_service:
         return {"Error": "Data store service not set"}
-    contact = service.get_contact(contact_id)
-    return {"contact": contact}
+    contact = await async_service.get_contact(contact_id)
+    if contact is None:
+        return {"contact": None}
+    (contact_json,) = await async_service.get_contacts_json([contact])
+    return JSONBytesResponse(b'{"contact":' + contact_json + b"}")
 
 
 @app.get("/contacts/fname/{fname}")
-def read_contacts_by_fname(fname: str):
+async def read_contacts_by_fname(fname: str):
     """Get contacts by first name."""
-    if not service:
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_fname(fname)
+    return await _contacts_response(contacts)
+
+
+@app.get("/contacts/fname/prefix/{prefix}")
+async def read_contacts_by_fname_prefix(
+    prefix: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+):
+    """Get contacts whose first name starts with a prefix, sorted by first name
+    and ID, one page at a time like /contacts.
+
+    e.g. /contacts/fname/prefix/je?limit=100&cursor=JEFF:1234
+    """
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_fname_prefix(
+        prefix,
+        after=_parse_name_cursor(cursor),
+        limit=limit + 1,
+    )
+    return await _page(contacts, limit, _name_cursor)
+
+
+@app.get("/contacts/fname/range/{start}/{end}")
+async def read_contacts_by_fname_range(
+    start: str,
+    end: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+):
+    """Get contacts whose first name is between start (inclusive) and end
+    (exclusive), sorted by first name and ID, one page at a time like
+    /contacts/fname/prefix/{prefix}."""
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_fname_range(
+        start,
+        end,
+        after=_parse_name_cursor(cursor),
+        limit=limit + 1,
+    )
+    return await _page(contacts, limit, _name_cursor)
+
+
+@app.get("/contacts/lname/{lname}")
+async def read_contacts_by_lname(lname: str):
+    """Get contacts by last name."""
+    if not async_service:
         return {"Error": "Data store service not set"}
-    contacts = service.get_contacts_by_fname(fname)
-    return {"contacts": contacts}
+    contacts = await async_service.get_contacts_by_lname(lname)
+    return await _contacts_response(contacts)
+
+
+@app.get("/contacts/lname/prefix/{prefix}")
+async def read_contacts_by_lname_prefix(prefix: str):
+    """Get contacts whose last name starts with a prefix."""
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_lname_prefix(prefix)
+    return await _contacts_response(contacts)
+
+
+@app.get("/contacts/fullname/{fname}/{lname}")
+async def read_contacts_by_full_name(fname: str, lname: str):
+    """Get contacts by first and last name."""
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_full_name(fname, lname)
+    return await _contacts_response(contacts)
+
+
+@app.get("/contacts/name/phonetic/{name}")
+async def read_contacts_by_phonetic_name(name: str):
+    """Get the contacts whose first or last name sounds like each word of a
+    name, e.g. SMYTH for SMITH."""
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_phonetic_name(name)
+    return await _contacts_response(contacts)
+
+
+@app.get("/contacts/name/fuzzy/{name}")
+async def read_contacts_by_fuzzy_name(name: str, limit: int = Query(10, ge=1, le=100)):
+    """Get the contacts whose names best match a name with typos, best match
+    first.
+
+    e.g. /contacts/name/fuzzy/jonh%20smtih?limit=5
+    """
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_fuzzy_name(name, limit)
+    return await _contacts_response(contacts)
 
 
 @app.get("/contacts/phone/{phone_number}")
-def read_contacts_by_phone_number(phone_number: str):
+async def read_contacts_by_phone_number(phone_number: str):
     """Get contacts by phone number."""
-    if not service:
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_phone_number(phone_number)
+    return await _contacts_response(contacts)
+
+
+@app.get("/contacts/phone/suffix/{suffix}")
+async def read_contacts_by_phone_number_suffix(suffix: str):
+    """Get contacts with a phone number that ends with some digits.
+
+    e.g. the last 7 digits, to match numbers with or without a country code.
+    """
+    if not async_service:
+        return {"Error": "Data store service not set"}
+    contacts = await async_service.get_contacts_by_phone_number_suffix(suffix)
+    return await _contacts_response(contacts)
+
+
+@app.get("/contacts/phone/contains/{digits}")
+async def read_contacts_by_phone_number_containing(digits: str):
+    """Get contacts with a phone number that contains some digits."""
+    if not async_service:
         return {"Error": "Data store service not set"}
-    contacts = service.get_contacts_by_phone_number(phone_number)
-    return {"contacts": contacts}
+    contacts = await async_service.get_contacts_by_phone_number_containing(digits)
+    return await _contacts_response(contacts)
 
 
 @app.get("/contacts/email/{email}")
-def read_contacts_by_email(email: str):
+async def read_contacts_by_email(email: str):
     """Get contacts by email."""
-    if not service:
+    if not async_service:
         return {"Error": "Data store service not set"}
-    contacts = service.get_contacts_by_email(email)
-    return {"contacts": contacts}
+    contacts = await async_service.get_contacts_by_email(email)
+    return await _contacts_response(contacts)
 
 
 @app.get("/contacts/country/{country}")
-def read_contacts_by_country(country: str):
-    """Get contacts by country."""
-    if not service:
+async def read_contacts_by_country(
+    country: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int = Query(0, ge=0),
+):
+    """Get contacts by country, sorted by ID, one page at a time like
+    /contacts."""
+    if not async_service:
         return {"Error": "Data store service not set"}
-    contacts = service.get_contacts_by_country(country)
-    return {"contacts": contacts}
+    contacts = await async_service.get_contacts_by_country(
+        country,
+        after=cursor,
+        limit=limit + 1,
+    )
+    return await _page(contacts, limit)
 
 
 @app.get("/contacts/state/{state}")
-def read_contacts_by_state(state: str):
-    """Get contacts by state."""
-    if not service:
+async def read_contacts_by_state(
+    state: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int = Query(0, ge=0),
+):
+    """Get contacts by state, sorted by ID, one page at a time like
+    /contacts."""
+    if not async_service:
         return {"Error": "Data store service not set"}
-    contacts = service.get_contacts_by_state(state)
-    return {"contacts": contacts}
+    contacts = await async_service.get_contacts_by_state(
+        state,
+        after=cursor,
+        limit=limit + 1,
+    )
+    return await _page(contacts, limit)
@@ -10,3 +10,7 @@ VCF_EXTENSION = ".vcf"
 SAMPLE_CONTACTS_DIR = "tests/data"
 SAMPLE_CONTACTS_FILE = "contactlookup_sample_contacts.vcf"
 FILE_DATA_STORE_SERVICE = "f"
+COLUMNAR_DATA_STORE_SERVICE = "c"
+DATABASE_DATA_STORE_SERVICE = "d"
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8000
@@ -0,0 +1,308 @@
+"""The contacts of a data store and the indexes used to search them."""
+
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+from contactlookup.indexes.name_index import (
+    NameIndex,
+    first_name_only_key,
+    last_name_key,
+)
+from contactlookup.indexes.phone_index import PhoneNumberIndex
+from contactlookup.indexes.phonetic import contact_phonetic_keys
+from contactlookup.indexes.postings import Postings
+from contactlookup.indexes.text_index import TextIndex
+from contactlookup.indexes.trigram_index import TrigramIndex
+from contactlookup.models.contact import Contact
+from contactlookup.serialization import ContactJsonCache
+
+
+class ContactIndexes:
+    """A set of indexes built from the same contacts.
+
+    The indexes are always built, saved and replaced together, so a reader
+    holding a reference to a ContactIndexes object sees a consistent view of
+    the contacts.
+    """
+
+    def __init__(self, track_fingerprints: bool = False, phonetic: bool = False):
+        # Sorted by contact ID.
+        self.all_contacts: list[Contact] = []
+        self.contacts_by_name: NameIndex = NameIndex(key=first_name_only_key)
+        self.contacts_by_last_name: NameIndex = NameIndex(key=last_name_key)
+        # The IDs of the contacts with each Soundex key of their first and
+        # last names. Only built on demand.
+        self.contacts_by_phonetic_name: Postings | None = (
+            Postings() if phonetic else None
+        )
+        # The IDs of all the contacts with each phone number and email.
+        self.contacts_by_phone_number: Postings = Postings()
+        # The keys of contacts_by_phone_number, searchable by suffix and by
+        # substring.
+        self.phone_number_index: PhoneNumberIndex = PhoneNumberIndex()
+        # Keyed by lowercase email.
+        self.contacts_by_email: Postings = Postings()
+        # The terms of the names, for fuzzy name searches.
+        self.name_trigram_index: TrigramIndex = TrigramIndex()
+        # The tokens of all the fields, for full-text searches.
+        self.text_index: TextIndex = TextIndex()
+        self.contacts_by_state: dict[str, list[Contact]] = {}
+        self.contacts_by_country: dict[str, list[Contact]] = {}
+        # The contacts parsed from each distinct vCard, keyed by the
+        # fingerprint of the raw card. Only kept for incremental reloads.
+        self.card_fingerprints: dict[bytes, list[Contact]] | None = (
+            {} if track_fingerprints else None
+        )
+        # The version of the contacts, see DataStoreService.get_dataset_version.
+        # None if it is not known.
+        self.version: str | None = None
+        # The JSON of the contacts already returned by the API.
+        self.contact_json: ContactJsonCache = ContactJsonCache()
+        # The highest contact ID ever assigned. IDs are not reused after a
+        # contact is removed.
+        self.last_contact_id: int = 0
+
+    def add_contact(self, contact: Contact, fingerprint: bytes | None = None):
+        """Add a contact to all the indexes.
+
+        `build` must be called once all the contacts are added.
+        """
+        self.all_contacts.append(contact)
+        self.last_contact_id = max(self.last_contact_id, contact.id)
+        if self.card_fingerprints is not None and fingerprint is not None:
+            self.card_fingerprints.setdefault(fingerprint, []).append(contact)
+        if self.contacts_by_phonetic_name is not None:
+            for key in contact_phonetic_keys(contact):
+                self.contacts_by_phonetic_name.add(key, contact.id)
+        for number in _phone_number_keys(contact):
+            self.contacts_by_phone_number.add(number, contact.id)
+        for email in _email_keys(contact):
+            self.contacts_by_email.add(email, contact.id)
+        self.name_trigram_index.add(contact)
+        self.text_index.add(contact)
+        for address in contact.addresses:
+            # A contact is listed once even if several addresses share a key
+            if address.state:
+                if address.state not in self.contacts_by_state:
+                    self.contacts_by_state[address.state] = []
+                contacts = self.contacts_by_state[address.state]
+                if not contacts or contacts[-1] is not contact:
+                    contacts.append(contact)
+            if address.country:
+                if address.country not in self.contacts_by_country:
+                    self.contacts_by_country[address.country] = []
+                contacts = self.contacts_by_country[address.country]
+                if not contacts or contacts[-1] is not contact:
+                    contacts.append(contact)
+
+    def build(self):
+        """Build the indexes that are sorted once all the contacts are added."""
+        self.contacts_by_name.build(self.all_contacts)
+        self.contacts_by_last_name.build(self.all_contacts)
+        self.phone_number_index.build(self.contacts_by_phone_number)
+
+    def get_contact(self, contact_id: int) -> Contact | None:
+        """Get a contact by ID."""
+        all_contacts = self.all_contacts
+        size = len(all_contacts)
+
+        if (size > 0 and contact_id > 0) and contact_id <= size:
+            contact = all_contacts[contact_id - 1]
+            if contact.id == contact_id:
+                return contact
+        # Contacts removed by an incremental reload leave gaps in the IDs.
+        # IDs are unique and sorted, so the contact is before its position.
+        index = bisect_left(
+            all_contacts,
+            contact_id,
+            hi=min(contact_id, size),
+            key=lambda contact: contact.id,
+        )
+        if index < size and all_contacts[index].id == contact_id:
+            return all_contacts[index]
+        return None
+
+    def get_contacts(self, contact_ids: Iterable[int]) -> list[Contact]:
+        """Get contacts by ID, skipping the IDs that do not exist."""
+        all_contacts = self.all_contacts
+        size = len(all_contacts)
+        contacts = []
+        for contact_id in contact_ids:
+            # Same as get_contact, with the common case inlined
+            if 0 < contact_id <= size:
+                contact = all_contacts[contact_id - 1]
+                if contact.id == contact_id:
+                    contacts.append(contact)
+                    continue
+            found = self.get_contact(contact_id)
+            if found is not None:
+                contacts.append(found)
+        return contacts
+
+    def updated(
+        self,
+        removed: list[tuple[bytes, Contact]],
+        added: list[tuple[bytes, Contact]],
+    ) -> "ContactIndexes":
+        """Get a copy of the indexes with contacts removed and added.
+
+        The indexes themselves are not modified, so they can keep serving
+        lookups while the copy is built. Only the entries of the changed
+        contacts are updated, the rest of each index is copied as is.
+
+        Args:
+            removed (list[tuple[bytes, Contact]]): The contacts to remove, with
+                the fingerprints of their cards.
+            added (list[tuple[bytes, Contact]]): The contacts to add, with the
+                fingerprints of their cards. Their IDs must be greater than
+                `last_contact_id`.
+
+        Returns:
+            ContactIndexes: The updated indexes.
+        """
+        removed_contacts = [contact for _, contact in removed]
+        added_contacts = [contact for _, contact in added]
+        removed_ids = {contact.id for contact in removed_contacts}
+
+        indexes = ContactIndexes()
+        indexes.contact_json = self.contact_json.updated(removed_ids)
+        indexes.all_contacts = (
+            [contact for contact in self.all_contacts if contact.id not in removed_ids]
+            if removed_ids
+            else list(self.all_contacts)
+        )
+        indexes.all_contacts.extend(added_contacts)
+        indexes.last_contact_id = max(
+            [self.last_contact_id, *(contact.id for contact in added_contacts)],
+        )
+        indexes.contacts_by_name = self.contacts_by_name.updated(
+            removed_contacts,
+            added_contacts,
+        )
+        indexes.contacts_by_last_name = self.contacts_by_last_name.updated(
+            removed_contacts,
+            added_contacts,
+        )
+        if self.contacts_by_phonetic_name is not None:
+            indexes.contacts_by_phonetic_name = self.contacts_by_phonetic_name.updated(
+                _keyed_ids(removed_contacts, contact_phonetic_keys),
+                _keyed_ids(added_contacts, contact_phonetic_keys),
+            )
+
+        indexes.contacts_by_phone_number = self.contacts_by_phone_number.updated(
+            _keyed_ids(removed_contacts, _phone_number_keys),
+            _keyed_ids(added_contacts, _phone_number_keys),
+        )
+        indexes.phone_number_index = self.phone_number_index.updated(
+            [
+                number
+                for contact in removed_contacts
+                for number in _phone_number_keys(contact)
+                if number not in indexes.contacts_by_phone_number
+            ],
+            [
+                number
+                for contact in added_contacts
+                for number in _phone_number_keys(contact)
+                if number not in self.contacts_by_phone_number
+            ],
+        )
+        indexes.contacts_by_email = self.contacts_by_email.updated(
+            _keyed_ids(removed_contacts, _email_keys),
+            _keyed_ids(added_contacts, _email_keys),
+        )
+        indexes.name_trigram_index = self.name_trigram_index.updated(
+            removed_contacts,
+            added_contacts,
+        )
+        indexes.text_index = self.text_index.updated(
+            removed_contacts,
+            added_contacts,
+        )
+        indexes.contacts_by_state = _update_lists(
+            self.contacts_by_state,
+            removed_contacts,
+            removed_ids,
+            added_contacts,
+            lambda contact: (address.state for address in contact.addresses),
+        )
+        indexes.contacts_by_country = _update_lists(
+            self.contacts_by_country,
+            removed_contacts,
+            removed_ids,
+            added_contacts,
+            lambda contact: (address.country for address in contact.addresses),
+        )
+
+        if self.card_fingerprints is not None:
+            card_fingerprints = dict(self.card_fingerprints)
+            for fingerprint, contact in removed:
+                remaining = [
+                    other
+                    for other in card_fingerprints.get(fingerprint, [])
+                    if other is not contact
+                ]
+                if remaining:
+                    card_fingerprints[fingerprint] = remaining
+                else:
+                    card_fingerprints.pop(fingerprint, None)
+            for fingerprint, contact in added:
+                card_fingerprints[fingerprint] = [
+                    *card_fingerprints.get(fingerprint, []),
+                    contact,
+                ]
+            indexes.card_fingerprints = card_fingerprints
+        return indexes
+
+
+def _phone_number_keys(contact: Contact) -> list[str]:
+    return [phone.number for phone in contact.phone_numbers if phone.number]
+
+
+def _email_keys(contact: Contact) -> list[str]:
+    keys = []
+    for email in contact.emails:
+        key = email.email.lower()
+        # Share the string of the email when it is already in lowercase
+        keys.append(email.email if key == email.email else key)
+    return [key for key in keys if key]
+
+
+def _keyed_ids(
+    contacts: Iterable[Contact],
+    keys: Callable[[Contact], Iterable[str]],
+) -> list[tuple[str, int]]:
+    """Get the (key, contact ID) pairs of some contacts."""
+    return [(key, contact.id) for contact in contacts for key in keys(contact)]
+
+
+def _update_lists(
+    index: dict[str, list[Contact]],
+    removed: Iterable[Contact],
+    removed_ids: set[int],
+    added: Iterable[Contact],
+    keys: Callable[[Contact], Iterable[str | None]],
+) -> dict[str, list[Contact]]:
+    """Copy an index of contact lists, and rebuild the lists of changed keys.
+
+    The lists of the unchanged keys are shared with the original index. The
+    lists stay sorted by contact ID, since added contacts have the highest IDs.
+    """
+    updated = dict(index)
+    for key in {key for contact in removed for key in keys(contact) if key}:
+        remaining = [
+            contact for contact in updated.get(key, []) if contact.id not in removed_ids
+        ]
+        if remaining:
+            updated[key] = remaining
+        else:
+            updated.pop(key, None)
+    copied: set[str] = set()
+    for contact in added:
+        for key in dict.fromkeys(filter(None, keys(contact))):
+            if key not in copied:
+                # Never append to a list shared with the original index.
+                updated[key] = list(updated.get(key, []))
+                copied.add(key)
+            updated[key].append(contact)
+    return updated
@@ -0,0 +1,401 @@
+"""Columnar in-memory table of contacts.
+
+Instead of one Python object per contact, each field is stored as a column.
+String columns are dictionary-encoded: every distinct value is stored once,
+and each row holds the int32 code of its value in a NumPy array. A filter is
+evaluated once per distinct value, and then applied to all the rows at once
+with vectorized NumPy operations, so a scan over millions of rows does not
+touch a single Python object per row.
+
+Phone numbers, emails and addresses are stored in child tables, with the rows
+of each contact kept together. `Contact` objects are only built for the rows
+returned by a query. The distinct phone numbers are also kept in a suffix
+array, for the lookups of the numbers that end with or contain some digits,
+the terms of the names in a trigram index, for fuzzy name searches, and the
+tokens of all the fields in an inverted index, for full-text searches.
+
+NumPy is an optional dependency, only needed by the columnar data store.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Mapping
+
+import numpy as np
+
+from contactlookup.indexes.phone_index import PhoneNumberIndex
+from contactlookup.indexes.text_index import TextIndex
+from contactlookup.indexes.trigram_index import TrigramIndex
+from contactlookup.models.address import Address
+from contactlookup.models.contact import Contact
+from contactlookup.models.email import Email
+from contactlookup.models.phone_number import PhoneNumber
+
+CONTACT_COLUMNS = (
+    "first_name",
+    "last_name",
+    "other_names",
+    "company",
+    "title",
+    "nickname",
+    "birthday",
+)
+PHONE_NUMBER_COLUMNS = ("number", "type")
+EMAIL_COLUMNS = ("email", "type")
+ADDRESS_COLUMNS = ("street", "city", "state", "postal_code", "type", "country")
+
+
+class StringColumn:
+    """A dictionary-encoded column of optional strings."""
+
+    def __init__(self):
+        # The distinct values of the column. A row holds the index of its
+        # value in this list.
+        self.values: list[str | None] = []
+        self._codes_by_value: dict[str | None, int] = {}
+        self._pending_codes = array("i")
+        self.codes: np.ndarray = np.empty(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str | None:
+        return self.values[self.codes[row]]
+
+    def append(self, value: str | None):
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._codes_by_value[value] = code
+        self._pending_codes.append(code)
+
+    def freeze(self):
+        """Move the appended codes to the NumPy array of the column."""
+        self.codes = np.array(self._pending_codes, dtype=np.int32)
+        self._pending_codes = array("i")
+
+    def take(self, rows: np.ndarray) -> list[str | None]:
+        """Get the values of some rows."""
+        values = self.values
+        return [values[code] for code in self.codes[rows].tolist()]
+
+    def code(self, value: str | None) -> int | None:
+        """Get the code of a value, or None if no row has it."""
+        return self._codes_by_value.get(value)
+
+    def equals(self, value: str | None) -> np.ndarray:
+        """Get a mask of the rows whose value is `value`."""
+        code = self.code(value)
+        if code is None:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == code
+
+    def equals_any(self, values: Iterable[str | None]) -> np.ndarray:
+        """Get a mask of the rows whose value is one of `values`."""
+        codes = [
+            code
+            for value in values
+            if (code := self._codes_by_value.get(value)) is not None
+        ]
+        return np.isin(self.codes, np.array(codes, dtype=np.int32))
+
+    def rows_by_key(
+        self,
+        codes_by_key: Mapping[str, Iterable[int]],
+    ) -> dict[str, np.ndarray]:
+        """Get the rows of each key, whose value has one of the codes of the
+        key, e.g. the spellings of an email in any case.
+
+        All the keys are matched in one vectorized pass over the rows, and the
+        rows of each key are sorted.
+        """
+        keys = list(codes_by_key)
+        pairs = sorted(
+            (code, index)
+            for index, key in enumerate(keys)
+            for code in codes_by_key[key]
+        )
+        codes = np.array([code for code, _ in pairs], dtype=np.int32)
+        code_keys = np.array([index for _, index in pairs], dtype=np.int64)
+        rows = np.flatnonzero(np.isin(self.codes, codes))
+        row_keys = code_keys[np.searchsorted(codes, self.codes[rows])]
+        order = np.argsort(row_keys, kind="stable")
+        rows = rows[order]
+        bounds = np.searchsorted(row_keys[order], np.arange(len(keys) + 1))
+        return {
+            key: rows[bounds[index] : bounds[index + 1]]
+            for index, key in enumerate(keys)
+        }
+
+    def matches(self, predicate: Callable[[str | None], bool]) -> np.ndarray:
+        """Get a mask of the rows whose value matches `predicate`.
+
+        The predicate is called once per distinct value, not once per row.
+        """
+        value_mask = np.fromiter(
+            (predicate(value) for value in self.values),
+            dtype=bool,
+            count=len(self.values),
+        )
+        return value_mask[self.codes]
+
+
+class ChildTable:
+    """The rows of a child record type, e.g. phone numbers.
+
+    The rows of each contact are adjacent. `offsets[row]` to
+    `offsets[row + 1]` are the child rows of the contact in `row`.
+    """
+
+    def __init__(self, columns: tuple[str, ...]):
+        self.columns: dict[str, StringColumn] = {
+            name: StringColumn() for name in columns
+        }
+        self._pending_offsets = array("q", [0])
+        self.offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        # The contact row of each child row.
+        self.contact_rows: np.ndarray = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.contact_rows)
+
+    def append(self, records: Iterable[Iterable[str | None]]):
+        """Append the child records of the next contact."""
+        count = 0
+        for values in records:
+            for column, value in zip(self.columns.values(), values):
+                column.append(value)
+            count += 1
+        self._pending_offsets.append(self._pending_offsets[-1] + count)
+
+    def freeze(self):
+        for column in self.columns.values():
+            column.freeze()
+        self.offsets = np.array(self._pending_offsets, dtype=np.int64)
+        self._pending_offsets = array("q", [0])
+        self.contact_rows = np.repeat(
+            np.arange(len(self.offsets) - 1, dtype=np.int64),
+            np.diff(self.offsets),
+        )
+
+    def take(self, contact_rows: np.ndarray) -> list[list[tuple]]:
+        """Get the records of some contacts, as tuples of column values."""
+        starts = self.offsets[contact_rows]
+        counts = self.offsets[contact_rows + 1] - starts
+        # The child rows of all the contacts, in one array: each contact's
+        # run starts at its offset and has one row per record.
+        run_starts = np.cumsum(counts) - counts
+        child_rows = np.repeat(starts - run_starts, counts) + np.arange(counts.sum())
+        records = list(
+            zip(*(column.take(child_rows) for column in self.columns.values())),
+        )
+        records_by_contact = []
+        position = 0
+        for count in counts.tolist():
+            records_by_contact.append(records[position : position + count])
+            position += count
+        return records_by_contact
+
+    def contact_rows_by_key(
+        self,
+        name: str,
+        codes_by_key: Mapping[str, Iterable[int]],
+    ) -> dict[str, np.ndarray]:
+        """Get the sorted contact rows of each key, that have a child row whose
+        value of a column has one of the codes of the key."""
+        return {
+            key: np.unique(self.contact_rows[rows])
+            for key, rows in self.columns[name].rows_by_key(codes_by_key).items()
+        }
+
+    def contact_mask(self, mask: np.ndarray, size: int) -> np.ndarray:
+        """Get a mask of the contacts that have at least one matching row."""
+        contacts = np.zeros(size, dtype=bool)
+        contacts[self.contact_rows[mask]] = True
+        return contacts
+
+
+class ContactTable:
+    """Contacts stored as dictionary-encoded columns.
+
+    Rows are appended with `append`, and the table can be queried once
+    `freeze` is called. The rows are in the order of the contact IDs.
+    """
+
+    def __init__(self):
+        self.columns: dict[str, StringColumn] = {
+            name: StringColumn() for name in CONTACT_COLUMNS
+        }
+        self._pending_ids = array("q")
+        self.ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.phone_numbers = ChildTable(PHONE_NUMBER_COLUMNS)
+        self.emails = ChildTable(EMAIL_COLUMNS)
+        self.addresses = ChildTable(ADDRESS_COLUMNS)
+        self.phone_number_index = PhoneNumberIndex()
+        self.name_trigram_index = TrigramIndex()
+        self.text_index = TextIndex()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, contact: Contact):
+        """Append a contact. Contacts must be appended in the order of their IDs."""
+        self._pending_ids.append(contact.id)
+        for name, column in self.columns.items():
+            column.append(getattr(contact, name))
+        self.phone_numbers.append(
+            (phone_number.number, phone_number.type)
+            for phone_number in contact.phone_numbers
+        )
+        self.emails.append((email.email, email.type) for email in contact.emails)
+        self.addresses.append(
+            (
+                address.street,
+                address.city,
+                address.state,
+                address.postal_code,
+                address.type,
+                address.country,
+            )
+            for address in contact.addresses
+        )
+        self.name_trigram_index.add(contact)
+        self.text_index.add(contact)
+
+    def freeze(self):
+        """Convert the appended rows to NumPy arrays."""
+        self.ids = np.array(self._pending_ids, dtype=np.int64)
+        self._pending_ids = array("q")
+        for column in self.columns.values():
+            column.freeze()
+        self.phone_numbers.freeze()
+        self.emails.freeze()
+        self.addresses.freeze()
+        self.phone_number_index.build(self.phone_numbers.columns["number"].values)
+
+    def find_row(self, contact_id: int) -> int | None:
+        """Get the row of a contact ID."""
+        row = int(np.searchsorted(self.ids, contact_id))
+        if row < len(self.ids) and self.ids[row] == contact_id:
+            return row
+        return None
+
+    def all_rows(self) -> np.ndarray:
+        return np.ones(len(self.ids), dtype=bool)
+
+    def contact(self, row: int) -> Contact:
+        """Build the Contact of a row."""
+        return self._build(np.array([row]))[0]
+
+    def _first_row_after(self, contact_id: int) -> int:
+        """Get the first row with an ID greater than a contact ID."""
+        return int(np.searchsorted(self.ids, contact_id, side="right"))
+
+    def contacts(
+        self,
+        mask: np.ndarray,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list[Contact]:
+        """Build the Contacts of the rows selected by a mask.
+
+        Only the rows with an ID greater than `after` are built, and at most
+        `limit` of them if it is not None.
+        """
+        start = self._first_row_after(after)
+        rows = np.flatnonzero(mask[start:])[:limit] + start
+        return self._build(rows)
+
+    def sorted_contacts(
+        self,
+        name: str,
+        predicate: Callable[[str], bool],
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list[Contact]:
+        """Build the Contacts of the rows whose value of a column matches
+        `predicate`, sorted by that value and then by ID.
+
+        Only the rows whose (value, ID) is greater than `after` are built, and
+        at most `limit` of them if it is not None. The matching values are
+        sorted once, and the rows are sorted by the rank of their value.
+        """
+        column = self.columns[name]
+        matches = sorted(
+            (value, code)
+            for code, value in enumerate(column.values)
+            if value is not None and predicate(value)
+        )
+        values = [value for value, _ in matches]
+        value_ranks = np.full(len(column.values), -1, dtype=np.int64)
+        value_ranks[[code for _, code in matches]] = np.arange(len(matches))
+        ranks = value_ranks[column.codes]
+        mask = ranks >= 0
+        if after is not None:
+            after_value, after_id = after
+            after_rank = bisect_left(values, after_value)
+            mask &= ranks >= after_rank
+            if after_rank < len(values) and values[after_rank] == after_value:
+                mask &= (ranks > after_rank) | (self.ids > after_id)
+        rows = np.flatnonzero(mask)
+        order = np.lexsort((self.ids[rows], ranks[rows]))[:limit]
+        return self._build(rows[order])
+
+    def contacts_after(self, after: int = 0, limit: int | None = None) -> list[Contact]:
+        """Build the Contacts with an ID greater than `after`, at most `limit`
+        of them if it is not None, without scanning the other rows."""
+        start = self._first_row_after(after)
+        end = len(self.ids) if limit is None else min(start + limit, len(self.ids))
+        return self._build(np.arange(start, end))
+
+    def contacts_by_id(self, contact_ids: Iterable[int]) -> list[Contact]:
+        """Build the Contacts of some contact IDs, in the same order."""
+        rows = [self.find_row(contact_id) for contact_id in contact_ids]
+        return self._build(
+            np.array([row for row in rows if row is not None], dtype=np.int64),
+        )
+
+    def _build(self, rows: np.ndarray) -> list[Contact]:
+        # Gather the values of all the rows column by column, which is much
+        # faster than reading the NumPy arrays one value at a time.
+        ids = self.ids[rows].tolist()
+        fields = zip(*(column.take(rows) for column in self.columns.values()))
+        phone_numbers = self.phone_numbers.take(rows)
+        emails = self.emails.take(rows)
+        addresses = self.addresses.take(rows)
+
+        contacts = []
+        for contact_id, values, numbers, email_values, address_values in zip(
+            ids,
+            fields,
+            phone_numbers,
+            emails,
+            addresses,
+        ):
+            # The values are in the order of CONTACT_COLUMNS
+            contact = Contact(contact_id, *values)
+            contact.phone_numbers.extend(
+                PhoneNumber(number=number, contact_id=contact_id, type=number_type)
+                for number, number_type in numbers
+            )
+            contact.emails.extend(
+                Email(email=email, type=email_type, contact_id=contact_id)
+                for email, email_type in email_values
+            )
+            contact.addresses.extend(
+                Address(
+                    street=street,
+                    city=city,
+                    state=state,
+                    postal_code=postal_code,
+                    contact_id=contact_id,
+                    type=address_type,
+                    country=country,
+                )
+                for street, city, state, postal_code, address_type, country in (
+                    address_values
+                )
+            )
+            contacts.append(contact)
+        return contacts
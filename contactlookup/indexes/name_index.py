@@ -0,0 +1,143 @@
+"""Sorted-array index of contacts by name.
+
+The contacts are sorted once, when the index is built, and stored in a single
+contiguous list. Lookups use binary search, so finding all the contacts with a
+given name costs O(log n + k), where k is the number of matches. Prefix and
+range queries have the same cost, since matching contacts are adjacent in the
+sorted list.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable
+
+from contactlookup.models.contact import Contact
+
+
+def first_name_key(contact: Contact) -> tuple[str, ...]:
+    """Sort contacts by first name, then by last name."""
+    return (contact.first_name, contact.last_name)
+
+
+def first_name_only_key(contact: Contact) -> tuple[str, ...]:
+    """Sort contacts by first name, and so by first name and then by ID."""
+    return (contact.first_name,)
+
+
+def last_name_key(contact: Contact) -> tuple[str, ...]:
+    """Sort contacts by last name, then by first name."""
+    return (contact.last_name, contact.first_name)
+
+
+def prefix_successor(prefix: str) -> str | None:
+    """Get the smallest string that is greater than every string with `prefix`."""
+    if not prefix:
+        return None
+    last_char = ord(prefix[-1])
+    if last_char == 0x10FFFF:
+        return prefix_successor(prefix[:-1])
+    return prefix[:-1] + chr(last_char + 1)
+
+
+class NameIndex:
+    """Contacts sorted by a name key, searchable with binary search.
+
+    Only the leading fields of the key are used for lookups. Contacts that
+    share a key are kept in the order of their IDs.
+    """
+
+    def __init__(self, key: Callable[[Contact], tuple[str, ...]] = first_name_key):
+        self._key = key
+        self._contacts: list[Contact] = []
+
+    def __len__(self) -> int:
+        return len(self._contacts)
+
+    def _sort_key(self, contact: Contact) -> tuple:
+        return (*self._key(contact), contact.id)
+
+    def _bisect(self, target: tuple) -> int:
+        return bisect_left(self._contacts, target, key=self._sort_key)
+
+    def build(self, contacts: Iterable[Contact]):
+        """Build the index from scratch."""
+        self._contacts = sorted(contacts, key=self._sort_key)
+
+    def updated(
+        self,
+        removed: Iterable[Contact],
+        added: Iterable[Contact],
+    ) -> "NameIndex":
+        """Get a copy of the index with contacts removed and added.
+
+        The index itself is not modified, so it can keep serving lookups while
+        the copy is built. The unchanged runs of the sorted list are copied as
+        slices, so the cost is O(n) copying plus O(k log n) for k changes,
+        instead of sorting all the contacts again.
+        """
+        # (position in the current list, order, contact). Insertions at a
+        # position go before the removal of the contact at that position.
+        changes: list[tuple[int, int, Contact | None]] = []
+        for contact in removed:
+            position = self._bisect(self._sort_key(contact))
+            if position < len(self._contacts) and self._contacts[position] is contact:
+                changes.append((position, 1, None))
+        for contact in sorted(added, key=self._sort_key):
+            changes.append((self._bisect(self._sort_key(contact)), 0, contact))
+        changes.sort(key=lambda change: change[:2])
+
+        contacts: list[Contact] = []
+        previous = 0
+        for position, _, added_contact in changes:
+            contacts.extend(self._contacts[previous:position])
+            if added_contact is None:
+                previous = position + 1
+            else:
+                contacts.append(added_contact)
+                previous = position
+        contacts.extend(self._contacts[previous:])
+
+        index = NameIndex(key=self._key)
+        index._contacts = contacts
+        return index
+
+    def get(self, *names: str) -> list[Contact]:
+        """Get the contacts whose leading key fields are equal to `names`."""
+        if not names:
+            return []
+        start = self._bisect(names)
+        # No string sorts between a name and the name followed by "\0"
+        end = self._bisect((*names[:-1], names[-1] + "\0"))
+        return self._contacts[start:end]
+
+    def prefix(
+        self,
+        prefix: str,
+        after: tuple | None = None,
+        limit: int | None = None,
+    ) -> list[Contact]:
+        """Get the contacts whose first key field starts with `prefix`, like
+        `range`."""
+        return self.range(prefix, prefix_successor(prefix), after, limit)
+
+    def range(
+        self,
+        start: str,
+        end: str | None = None,
+        after: tuple | None = None,
+        limit: int | None = None,
+    ) -> list[Contact]:
+        """Get the contacts whose first key field is in [start, end).
+
+        Only the contacts whose sort key, the key followed by the ID, is
+        greater than `after` are returned, and at most `limit` of them.
+        """
+        start_index = self._bisect((start,))
+        if after is not None:
+            start_index = max(
+                start_index,
+                bisect_right(self._contacts, after, key=self._sort_key),
+            )
+        end_index = len(self._contacts) if end is None else self._bisect((end,))
+        if limit is not None:
+            end_index = min(end_index, start_index + limit)
+        return self._contacts[start_index:end_index]
@@ -0,0 +1,171 @@
+"""Suffix array index of phone numbers.
+
+The digits of all the distinct phone numbers are concatenated into a single
+string, each number followed by a separator. The suffix array holds the
+starting position of every suffix of every number, sorted by the suffix up
+to and including the separator. All the suffixes that start with a given
+string are adjacent in the array, so:
+
+* "contains" queries are a binary search for the suffixes that start with
+  the query digits, and
+* "ends with" queries are a binary search for the suffixes that start with
+  the query digits followed by the separator.
+
+Both cost O(m log n + k) for a query of m digits and k matches, whatever the
+number of contacts. The suffix array is a compact array of ints instead of a
+list of strings, which would take several times more memory.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+
+from contactlookup.indexes.name_index import prefix_successor
+
+# Ends each number in the text of the index. It is not a digit, so a query
+# only matches past the end of a number if the query ends with it.
+SEPARATOR = "|"
+
+
+class PhoneNumberIndex:
+    """Phone numbers searchable by suffix and by substring.
+
+    The index only holds the numbers, which are mapped to their contacts by
+    the caller.
+    """
+
+    def __init__(self):
+        self._text: str = ""
+        # The position of each number in the text.
+        self._positions: dict[str, int] = {}
+        # The positions of the suffixes in the text, sorted by suffix.
+        self._suffixes: array = array("i")
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _suffix(self, position: int) -> str:
+        """Get the suffix at a position, up to and including its separator."""
+        return self._text[position : self._text.index(SEPARATOR, position) + 1]
+
+    def _number_at(self, position: int) -> str:
+        """Get the number that the suffix at a position is part of."""
+        text = self._text
+        start = text.rfind(SEPARATOR, 0, position) + 1
+        return text[start : text.index(SEPARATOR, position)]
+
+    def _append(self, numbers: Iterable[str]) -> list[int]:
+        """Append numbers to the text, and get the positions of their
+        suffixes."""
+        parts = [self._text]
+        length = len(self._text)
+        suffixes: list[int] = []
+        for number in numbers:
+            if not number or number in self._positions:
+                continue
+            self._positions[number] = length
+            suffixes.extend(range(length, length + len(number)))
+            parts.append(number + SEPARATOR)
+            length += len(number) + 1
+        self._text = "".join(parts)
+        return suffixes
+
+    def build(self, numbers: Iterable[str]):
+        """Build the index from scratch."""
+        self._text = ""
+        self._positions = {}
+        suffixes = self._append(numbers)
+        self._suffixes = array("i", sorted(suffixes, key=self._suffix))
+
+    def updated(
+        self,
+        removed: Iterable[str],
+        added: Iterable[str],
+    ) -> "PhoneNumberIndex":
+        """Get a copy of the index with numbers removed and added.
+
+        The index itself is not modified, so it can keep serving lookups while
+        the copy is built. The text of the removed numbers is left in place
+        until it takes up more than half the text, and the index is rebuilt.
+        """
+        removed_positions: set[int] = set()
+        positions = dict(self._positions)
+        for number in removed:
+            position = positions.pop(number, None)
+            if position is not None:
+                removed_positions.update(range(position, position + len(number)))
+
+        index = PhoneNumberIndex()
+        live_length = sum(len(number) + 1 for number in positions)
+        if live_length * 2 < len(self._text):
+            index.build([*positions, *added])
+            return index
+
+        index._text = self._text
+        index._positions = positions
+        suffixes = (
+            array(
+                "i",
+                (
+                    position
+                    for position in self._suffixes
+                    if position not in removed_positions
+                ),
+            )
+            if removed_positions
+            else self._suffixes
+        )
+        added_suffixes = sorted(index._append(added), key=index._suffix)
+
+        # Merge the sorted added suffixes into the sorted array, copying the
+        # runs between the insertion points as slices.
+        merged = array("i")
+        previous = 0
+        for position in added_suffixes:
+            insertion_point = bisect_left(
+                suffixes,
+                index._suffix(position),
+                key=index._suffix,
+            )
+            merged.extend(suffixes[previous:insertion_point])
+            merged.append(position)
+            previous = insertion_point
+        merged.extend(suffixes[previous:])
+        index._suffixes = merged
+        return index
+
+    def _search(self, query: str) -> list[str]:
+        """Get the numbers that have a suffix starting with `query`."""
+        if not query:
+            return []
+        length = len(query)
+        text = self._text
+
+        def key(position: int) -> str:
+            # The suffix, cut to the length of the query
+            end = min(position + length, text.index(SEPARATOR, position) + 1)
+            return text[position:end]
+
+        start = bisect_left(self._suffixes, query, key=key)
+        successor = prefix_successor(query)
+        end = (
+            bisect_left(self._suffixes, successor, key=key)
+            if successor is not None
+            else len(self._suffixes)
+        )
+        # A number can contain the query more than once
+        return list(
+            dict.fromkeys(
+                self._number_at(position) for position in self._suffixes[start:end]
+            ),
+        )
+
+    def ending_with(self, digits: str) -> list[str]:
+        """Get the numbers that end with `digits`."""
+        if not digits:
+            return []
+        return self._search(digits + SEPARATOR)
+
+    def containing(self, digits: str) -> list[str]:
+        """Get the numbers that contain `digits`."""
+        return self._search(digits)
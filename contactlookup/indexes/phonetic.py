@@ -0,0 +1,53 @@
+"""Phonetic keys of names, for sound-alike lookups.
+
+Names are keyed with American Soundex: the first letter of the name, followed
+by three digits for the consonants that follow it, so that names that sound
+alike get the same key, e.g. SMITH and SMYTH (S530), or SEAN and SHAWN
+(S500). A sound-alike lookup is a single dict access on the key.
+"""
+
+from contactlookup.indexes.trigram_index import name_terms
+from contactlookup.models.contact import Contact
+
+# Vowels, Y, H and W have no digit. Vowels and Y separate two consonants with
+# the same digit, H and W do not.
+_DIGITS = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+_SILENT = frozenset("HW")
+
+
+def soundex(term: str) -> str:
+    """Get the Soundex key of a term, or "" if it has no Latin letter."""
+    letters = [char for char in term.upper() if "A" <= char <= "Z"]
+    if not letters:
+        return ""
+    key = [letters[0]]
+    previous = _DIGITS.get(letters[0], "")
+    for letter in letters[1:]:
+        if letter in _SILENT:
+            continue
+        digit = _DIGITS.get(letter, "")
+        if digit and digit != previous:
+            key.append(digit)
+            if len(key) == 4:
+                break
+        previous = digit
+    return "".join(key).ljust(4, "0")
+
+
+def phonetic_keys(*names: str | None) -> list[str]:
+    """Get the distinct Soundex keys of the terms of some names."""
+    keys = dict.fromkeys(soundex(term) for term in name_terms(*names))
+    keys.pop("", None)
+    return list(keys)
+
+
+def contact_phonetic_keys(contact: Contact) -> list[str]:
+    """Get the Soundex keys of the first and last names of a contact."""
+    return phonetic_keys(contact.first_name, contact.last_name)
@@ -0,0 +1,88 @@
+"""Compact multi-valued index of contact IDs by key.
+
+Each key, e.g. a phone number or an email, maps to the IDs of all the contacts
+that have it. Most keys belong to a single contact, so the ID is stored inline
+as the dict value. Only keys shared by several contacts get a packed array of
+IDs, which takes 4 bytes per ID instead of a list of references. Lookups are a
+single dict access.
+
+The IDs of a key are kept in the order they were added, which is the order of
+the contact IDs.
+"""
+
+from array import array
+from collections.abc import Iterable, Iterator
+
+# Typecode of the arrays of contact IDs.
+_ID_TYPECODE = "i"
+
+
+class Postings:
+    """Map keys to the IDs of the contacts that have them."""
+
+    def __init__(self):
+        self._ids: dict[str, int | array] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def get(self, key: str) -> tuple[int, ...]:
+        """Get the IDs of the contacts that have a key."""
+        ids = self._ids.get(key)
+        if ids is None:
+            return ()
+        if isinstance(ids, int):
+            return (ids,)
+        return tuple(ids)
+
+    def add(self, key: str, contact_id: int):
+        """Add a contact ID to a key. Adding the same ID twice has no effect."""
+        ids = self._ids.get(key)
+        if ids is None:
+            self._ids[key] = contact_id
+        elif isinstance(ids, int):
+            if ids != contact_id:
+                self._ids[key] = array(_ID_TYPECODE, (ids, contact_id))
+        elif contact_id not in ids:
+            ids.append(contact_id)
+
+    def updated(
+        self,
+        removed: Iterable[tuple[str, int]],
+        added: Iterable[tuple[str, int]],
+    ) -> "Postings":
+        """Get a copy of the postings with (key, contact ID) pairs removed and
+        added.
+
+        The postings themselves are not modified, so they can keep serving
+        lookups while the copy is built. The arrays of the unchanged keys are
+        shared with the copy.
+        """
+        postings = Postings()
+        postings._ids = dict(self._ids)
+        for key, contact_id in removed:
+            ids = postings._ids.get(key)
+            if ids is None:
+                continue
+            if isinstance(ids, int):
+                if ids == contact_id:
+                    del postings._ids[key]
+                continue
+            remaining = [other for other in ids if other != contact_id]
+            if len(remaining) == 1:
+                postings._ids[key] = remaining[0]
+            else:
+                # Never modify an array shared with the original postings.
+                postings._ids[key] = array(_ID_TYPECODE, remaining)
+        for key, contact_id in added:
+            ids = postings._ids.get(key)
+            if isinstance(ids, array) and ids is self._ids.get(key):
+                postings._ids[key] = array(_ID_TYPECODE, ids)
+            postings.add(key, contact_id)
+        return postings
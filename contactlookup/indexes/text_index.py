@@ -0,0 +1,385 @@
+"""Inverted index for full-text search across all the fields of the contacts.
+
+The names, company, title, nickname, addresses and the local part of the
+emails of each contact are split into uppercase tokens. The index maps every
+token to the IDs of the contacts that have it, in a packed array sorted by
+contact ID. Most tokens appear once in a contact, so only the contacts that
+have a token several times are kept with their count.
+
+A query matches the contacts that have all of its tokens, ranked by BM25:
+rare tokens weigh more than common ones, and a token weighs more in a short
+contact than in a long one. The postings of the rarest token are scored
+first, and its contacts are visited from the best score for that token. The
+other tokens are looked up only for these contacts: by binary search, or
+with set intersections when the rarest token is common too. The visit stops
+as soon as a contact cannot reach the top k, even with the best possible
+score for the other tokens.
+"""
+
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Callable, Iterable, Sequence
+
+from contactlookup.models.contact import Contact
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# BM25 parameters: k1 caps the weight of a repeated token, and b sets how
+# much the length of a contact lowers the weight of its tokens.
+K1 = 1.2
+B = 0.75
+# Postings of at least this many contacts are long: their impact order is kept
+# between queries, and they are intersected with sets instead of binary
+# searches.
+_LONG_POSTINGS = 1024
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Split a text into uppercase tokens."""
+    if not text:
+        return []
+    return _TOKEN.findall(text.upper())
+
+
+def contact_tokens(contact: Contact) -> list[str]:
+    """Get the tokens of all the searchable fields of a contact."""
+    tokens = []
+    for value in (
+        contact.first_name,
+        contact.last_name,
+        contact.other_names,
+        contact.company,
+        contact.title,
+        contact.nickname,
+    ):
+        tokens.extend(tokenize(value))
+    for address in contact.addresses:
+        for value in (
+            address.street,
+            address.city,
+            address.state,
+            address.postal_code,
+            address.country,
+        ):
+            tokens.extend(tokenize(value))
+    for email in contact.emails:
+        tokens.extend(tokenize(email.email.partition("@")[0]))
+    return tokens
+
+
+class _TokenPostings:
+    """The contacts that have a token, sorted by contact ID."""
+
+    __slots__ = ("ids", "repeated", "max_frequency", "min_length", "impact_order")
+
+    def __init__(self):
+        self.ids: array = array("i")
+        # The number of occurrences of the token in the contacts that have it
+        # more than once.
+        self.repeated: dict[int, int] = {}
+        # Bounds of the score of the token in any of the contacts. They are
+        # not lowered when contacts are removed, so they stay valid bounds.
+        self.max_frequency: int = 0
+        self.min_length: int = 0
+        # (average length, positions, shortest lengths) of
+        # TextIndex._impact_order
+        self.impact_order: tuple[float, array, array] | None = None
+
+    def copy(self) -> "_TokenPostings":
+        postings = _TokenPostings()
+        postings.ids = array("i", self.ids)
+        postings.repeated = dict(self.repeated)
+        postings.max_frequency = self.max_frequency
+        postings.min_length = self.min_length
+        return postings
+
+    def append(self, contact_id: int, frequency: int, length: int):
+        self.ids.append(contact_id)
+        if frequency > 1:
+            self.repeated[contact_id] = frequency
+        self.max_frequency = max(self.max_frequency, frequency)
+        self.min_length = min(self.min_length, length) if self.min_length else length
+
+    def frequency(self, contact_id: int) -> int:
+        """Get the number of occurrences of the token in a contact."""
+        index = bisect_left(self.ids, contact_id)
+        if index < len(self.ids) and self.ids[index] == contact_id:
+            return self.repeated.get(contact_id, 1)
+        return 0
+
+
+class TextIndex:
+    """Contacts searchable by the tokens of all their fields."""
+
+    def __init__(self):
+        self._postings: dict[str, _TokenPostings] = {}
+        # The number of tokens of each contact, indexed by contact ID. 0 for
+        # the IDs that are not in the index.
+        self._lengths: array = array("H")
+        self._count: int = 0
+        self._total_length: int = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _length(self, contact_id: int) -> int:
+        if contact_id < len(self._lengths):
+            return self._lengths[contact_id]
+        return 0
+
+    def _add(self, contact: Contact, copied: set[str] | None = None):
+        """Add a contact, whose ID must be greater than all the indexed IDs.
+
+        Args:
+            contact (Contact): The contact.
+            copied (set[str] | None): The tokens whose postings were already
+                copied from another index. The others are copied before they
+                are modified. None if the postings are not shared.
+        """
+        tokens = contact_tokens(contact)
+        if not tokens:
+            return
+        length = min(len(tokens), 0xFFFF)
+        if len(self._lengths) <= contact.id:
+            self._lengths.extend([0] * (contact.id + 1 - len(self._lengths)))
+        self._lengths[contact.id] = length
+        self._count += 1
+        self._total_length += length
+        for token, frequency in Counter(tokens).items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = _TokenPostings()
+                if copied is not None:
+                    copied.add(token)
+            elif copied is not None and token not in copied:
+                postings = self._postings[token] = postings.copy()
+                copied.add(token)
+            postings.append(contact.id, frequency, length)
+
+    def add(self, contact: Contact):
+        """Add a contact. Contacts must be added in the order of their IDs."""
+        self._add(contact)
+
+    def updated(
+        self,
+        removed: Iterable[Contact],
+        added: Iterable[Contact],
+    ) -> "TextIndex":
+        """Get a copy of the index with contacts removed and added.
+
+        The index itself is not modified, so it can keep serving lookups while
+        the copy is built. The IDs of the added contacts must be greater than
+        all the indexed IDs.
+        """
+        index = TextIndex()
+        index._postings = dict(self._postings)
+        index._lengths = array("H", self._lengths)
+        index._count = self._count
+        index._total_length = self._total_length
+
+        removed_ids: dict[str, set[int]] = {}
+        for contact in removed:
+            length = index._length(contact.id)
+            if not length:
+                continue
+            index._lengths[contact.id] = 0
+            index._count -= 1
+            index._total_length -= length
+            for token in set(contact_tokens(contact)):
+                removed_ids.setdefault(token, set()).add(contact.id)
+        copied: set[str] = set()
+        for token, contact_ids in removed_ids.items():
+            postings = index._postings.get(token)
+            if postings is None:
+                continue
+            remaining = _TokenPostings()
+            remaining.ids = array(
+                "i",
+                (
+                    contact_id
+                    for contact_id in postings.ids
+                    if contact_id not in contact_ids
+                ),
+            )
+            if not remaining.ids:
+                del index._postings[token]
+                continue
+            remaining.repeated = {
+                contact_id: frequency
+                for contact_id, frequency in postings.repeated.items()
+                if contact_id not in contact_ids
+            }
+            remaining.max_frequency = postings.max_frequency
+            remaining.min_length = postings.min_length
+            index._postings[token] = remaining
+            copied.add(token)
+
+        for contact in added:
+            index._add(contact, copied)
+        return index
+
+    def _idf(self, postings: _TokenPostings) -> float:
+        count = len(postings.ids)
+        return math.log(1 + (self._count - count + 0.5) / (count + 0.5))
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, float]]:
+        """Get the contacts that have all the tokens of a query, best match
+        first.
+
+        Returns:
+            list[tuple[int, float]]: (contact ID, BM25 score) of at most
+                `limit` contacts, sorted by score and then by ID.
+        """
+        if limit < 1 or not self._count:
+            return []
+        all_postings = []
+        for token in dict.fromkeys(tokenize(query)):
+            postings = self._postings.get(token)
+            if postings is None:
+                # Every token must match
+                return []
+            all_postings.append(postings)
+        if not all_postings:
+            return []
+        all_postings.sort(key=lambda postings: len(postings.ids))
+        rarest, others = all_postings[0], all_postings[1:]
+
+        average_length = self._total_length / self._count
+        term_weight = _term_weight(average_length)
+        lengths = self._lengths
+        rarest_idf = self._idf(rarest)
+        others_idf = [self._idf(postings) for postings in others]
+
+        # The top k so far, as a min-heap of (score, -contact ID)
+        top: list[tuple[float, int]] = []
+
+        def push(score: float, contact_id: int):
+            entry = (score, -contact_id)
+            if len(top) < limit:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+
+        # The contacts that have all the tokens, when the rarest token is
+        # common too. Set intersections are faster than a binary search per
+        # contact.
+        candidates: set[int] | None = None
+        if others and len(rarest.ids) >= _LONG_POSTINGS:
+            candidates = set(rarest.ids)
+            for postings in others:
+                candidates.intersection_update(postings.ids)
+            if not candidates:
+                return []
+
+        # The best possible score of the other tokens in the contacts of at
+        # least some length, by length
+        others_bounds: dict[int, float] = {}
+        # Visit the contacts of the rarest token from its best score. The
+        # scores only depend on the frequency and the length, which take few
+        # values.
+        ids = rarest.ids
+        rarest_repeated = rarest.repeated
+        scores: dict[tuple[int, int], float] = {}
+        order, min_lengths = self._impact_order(rarest, average_length)
+        for index, position in enumerate(order):
+            contact_id = ids[position]
+            if candidates is not None and contact_id not in candidates:
+                continue
+            length = lengths[contact_id]
+            key = (rarest_repeated.get(contact_id, 1), length)
+            score = scores.get(key)
+            if score is None:
+                score = scores[key] = rarest_idf * term_weight(*key)
+            if len(top) == limit:
+                # No contact left can reach the top k
+                min_length = min_lengths[index]
+                others_bound = others_bounds.get(min_length)
+                if others_bound is None:
+                    others_bound = others_bounds[min_length] = sum(
+                        idf
+                        * term_weight(
+                            postings.max_frequency,
+                            max(min_length, postings.min_length),
+                        )
+                        for idf, postings in zip(others_idf, others)
+                    )
+                if score + others_bound < top[0][0]:
+                    break
+            for idf, postings in zip(others_idf, others):
+                frequency = (
+                    postings.frequency(contact_id)
+                    if candidates is None
+                    else postings.repeated.get(contact_id, 1)
+                )
+                if not frequency:
+                    break
+                score += idf * term_weight(frequency, length)
+            else:
+                push(score, contact_id)
+        return _ranked(top)
+
+    def _impact_order(
+        self,
+        postings: _TokenPostings,
+        average_length: float,
+    ) -> tuple[Sequence[int], Sequence[int]]:
+        """Get the positions of the postings of a token, sorted by the score
+        of the token in each contact, and then by contact ID.
+
+        The order of long postings is kept until the average length of the
+        contacts changes.
+
+        Returns:
+            tuple[Sequence[int], Sequence[int]]: The positions, and the
+                shortest length of the contacts from each position to the end.
+        """
+        cached = postings.impact_order
+        if cached is not None and cached[0] == average_length:
+            return cached[1], cached[2]
+        term_weight = _term_weight(average_length)
+        ids = postings.ids
+        repeated = postings.repeated
+        lengths = self._lengths
+        order = sorted(
+            range(len(ids)),
+            key=lambda position: (
+                -term_weight(
+                    repeated.get(ids[position], 1),
+                    lengths[ids[position]],
+                ),
+                ids[position],
+            ),
+        )
+        min_lengths = [0] * len(order)
+        min_length = 0xFFFF
+        for index in range(len(order) - 1, -1, -1):
+            min_length = min(min_length, lengths[ids[order[index]]])
+            min_lengths[index] = min_length
+        if len(order) >= _LONG_POSTINGS:
+            postings.impact_order = (
+                average_length,
+                array("i", order),
+                array("H", min_lengths),
+            )
+        return order, min_lengths
+
+
+def _term_weight(average_length: float) -> Callable[[int, int], float]:
+    """Get the BM25 weight of a token, before its IDF, from its frequency in
+    a contact and the length of the contact."""
+    length_weight = K1 * B / average_length
+    base = K1 * (1 - B)
+
+    def term_weight(frequency: int, length: int) -> float:
+        return frequency * (K1 + 1) / (frequency + base + length_weight * length)
+
+    return term_weight
+
+
+def _ranked(top: list[tuple[float, int]]) -> list[tuple[int, float]]:
+    """Get the (contact ID, score) of a top k heap, best first."""
+    return [(-negative_id, score) for score, negative_id in sorted(top, reverse=True)]
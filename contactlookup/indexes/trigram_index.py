@@ -0,0 +1,424 @@
+"""Trigram index for fuzzy, typo-tolerant name search.
+
+The first, last, other and nick names of the contacts are split into terms,
+e.g. "MARY ANN" into "MARY" and "ANN". The index maps every trigram of a term
+(three consecutive letters, the term being padded with spaces) to the terms
+that contain it, and every term to the IDs of the contacts that have it.
+
+A query term is matched in three steps:
+
+1. Candidate pruning: a term within edit distance k of the query shares at
+   least n - 4k of the n trigrams of the query, since an edit changes at most
+   4 trigrams. Only the terms that share enough trigrams, whose length is
+   within k of the query, and that have at most k letters that the query does
+   not have (and the other way around) are kept. The letters of each term are
+   kept as a bit mask, so the last check is a few integer operations.
+2. Scoring: the Levenshtein distance of each candidate is computed with a
+   bit-parallel algorithm, and the candidates more than k edits away are
+   dropped. The transposition of two adjacent letters counts as a single
+   edit, so that "JONH" is one typo away from "JOHN".
+3. Ranking: contacts are sorted by their total distance to the query terms,
+   then by ID, and only the top k are returned.
+
+Counting the shared trigrams touches every term of the posting lists of the
+query trigrams, but not the other terms, nor any contact.
+"""
+
+import heapq
+import re
+from array import array
+from collections import Counter
+from collections.abc import Callable, Collection, Iterable, Mapping, Sequence
+
+from contactlookup.indexes.postings import Postings
+from contactlookup.models.contact import Contact
+
+# Names are split into terms on anything that is not a letter or a digit.
+_TERM_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def name_terms(*names: str | None) -> list[str]:
+    """Split names into distinct uppercase terms."""
+    terms: dict[str, None] = {}
+    for name in names:
+        if name:
+            for term in _TERM_SEPARATORS.split(name.upper()):
+                if term:
+                    terms[term] = None
+    return list(terms)
+
+
+def contact_name_terms(contact: Contact) -> list[str]:
+    """Get the terms of the first, last, other and nick names of a contact."""
+    return name_terms(
+        contact.first_name,
+        contact.last_name,
+        contact.other_names,
+        contact.nickname,
+    )
+
+
+def trigrams(term: str) -> set[str]:
+    """Get the trigrams of a term. The padding marks the start and the end of
+    the term, so that short terms have trigrams too."""
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def letter_mask(term: str) -> int:
+    """Get a bit mask of the letters of a term, with a bit per occurrence.
+
+    Bits 0 to 63 are set by the first occurrence of each letter, bits 64 to
+    127 by the second one, and bits 128 to 191 by the third and following
+    ones. An edit removes at most one letter and adds at most one letter, so
+    each of two terms within k edits has at most k bits that the other does
+    not have. Letters that share a bit can only make the masks closer.
+    """
+    mask = 0
+    for char in term:
+        bit = 1 << (ord(char) & 63)
+        for _ in range(2):
+            if not mask & bit:
+                break
+            bit <<= 64
+        mask |= bit
+    return mask
+
+
+def default_max_distance(term: str) -> int:
+    """Get the number of typos tolerated in a query term."""
+    if len(term) <= 2:
+        return 0
+    if len(term) <= 5:
+        return 1
+    return 2
+
+
+def min_shared_trigrams(term: str, max_distance: int) -> int:
+    """Get the number of trigrams that a candidate must share with `term`.
+
+    A term within `max_distance` edits of `term` shares at least
+    n - 4 * max_distance of its n trigrams. This bound is often 0 when two
+    edits are allowed, so candidates must also share one trigram, or two
+    trigrams when two edits are allowed. The terms two edits away that share
+    a single trigram are skipped: they rank last, and they are most of the
+    candidates of a short query.
+    """
+    return max(len(trigrams(term)) - 4 * max_distance, min(max_distance, 2), 1)
+
+
+def _char_masks(pattern: str) -> dict[str, int]:
+    """Get the bit mask of the positions of each character in a pattern."""
+    masks: dict[str, int] = {}
+    bit = 1
+    for char in pattern:
+        masks[char] = masks.get(char, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def _distance(char_masks: dict[str, int], length: int, text: str) -> int:
+    """Get the edit distance between a pattern and a text.
+
+    This is the bit-parallel algorithm of Myers, with the transpositions of
+    Hyyro: a column of the dynamic programming table is encoded as the bits
+    of its vertical deltas, and is computed from the previous column with a
+    few integer operations, instead of one operation per cell.
+
+    Args:
+        char_masks (dict[str, int]): The `_char_masks` of the pattern.
+        length (int): The length of the pattern.
+        text (str): The text.
+    """
+    if length == 0:
+        return len(text)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    # The vertical deltas of the column: +1 in vp, -1 in vn
+    vp = full
+    vn = 0
+    d0 = 0
+    previous_match = 0
+    distance = length
+    get_match = char_masks.get
+    for char in text:
+        match = get_match(char, 0)
+        transposition = ((~d0 & match) << 1) & previous_match
+        d0 = ((((match & vp) + vp) ^ vp) | match | vn | transposition) & full
+        # x ^ full is ~x within the bits of the pattern
+        hp = vn | ((d0 | vp) ^ full)
+        hn = vp & d0
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | ((d0 | hp) ^ full)
+        vn = hp & d0
+        previous_match = match
+    return distance
+
+
+def bounded_distance(source: str, target: str, max_distance: int) -> int | None:
+    """Get the edit distance between two strings, if it is at most
+    `max_distance`.
+
+    Insertions, deletions, substitutions and transpositions of adjacent
+    characters count as one edit each.
+
+    Returns:
+        int | None: The distance, or None if it is greater than `max_distance`.
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return None
+    distance = _distance(_char_masks(source), len(source), target)
+    return distance if distance <= max_distance else None
+
+
+def match_terms(
+    term: str,
+    candidates: Iterable[str],
+    max_distance: int,
+) -> dict[str, int]:
+    """Get the candidates within `max_distance` edits of a term, with their
+    distance. For candidates that were not pruned by an index yet."""
+    query_mask = letter_mask(term)
+    char_masks = _char_masks(term)
+    length = len(term)
+    matches = {}
+    for candidate in candidates:
+        if abs(len(candidate) - length) > max_distance:
+            continue
+        mask = letter_mask(candidate)
+        if (query_mask & ~mask).bit_count() > max_distance or (
+            mask & ~query_mask
+        ).bit_count() > max_distance:
+            continue
+        distance = _distance(char_masks, length, candidate)
+        if distance <= max_distance:
+            matches[candidate] = distance
+    return matches
+
+
+def rank_matches(
+    matches: Sequence[Mapping[str, int]],
+    contact_ids: Callable[[str], Collection[int]],
+    limit: int,
+) -> list[tuple[int, int]]:
+    """Rank the contacts that match all the terms of a query.
+
+    Args:
+        matches (Sequence[Mapping[str, int]]): For each query term, the distance
+            of every indexed term that matches it.
+        contact_ids (Callable[[str], Collection[int]]): Get the IDs of the
+            contacts that have an indexed term.
+        limit (int): The maximum number of contacts to return.
+
+    Returns:
+        list[tuple[int, int]]: (contact ID, total distance) of the best
+            contacts, sorted by distance and then by ID.
+    """
+    if not matches or limit < 1:
+        return []
+    if len(matches) == 1:
+        return _rank_term_matches(matches[0], contact_ids, limit)
+
+    # (distance, contact IDs) of the matching terms of each query term, the
+    # closest terms last.
+    postings = [
+        sorted(
+            ((distance, contact_ids(term)) for term, distance in term_matches.items()),
+            key=lambda match: -match[0],
+        )
+        for term_matches in matches
+    ]
+    # Start from the query term that matches the fewest contacts, and only
+    # intersect the contacts of the other terms with it.
+    postings.sort(key=lambda term_postings: sum(len(ids) for _, ids in term_postings))
+    scores: dict[int, int] = {}
+    for distance, ids in postings[0]:
+        scores.update(dict.fromkeys(ids, distance))
+    for term_postings in postings[1:]:
+        best: dict[int, int] = {}
+        for distance, ids in term_postings:
+            best.update(dict.fromkeys(scores.keys() & ids, distance))
+        # Every query term must be matched by the contact
+        scores = {
+            contact_id: scores[contact_id] + distance
+            for contact_id, distance in best.items()
+        }
+        if not scores:
+            return []
+    ranked = heapq.nsmallest(
+        limit,
+        ((score, contact_id) for contact_id, score in scores.items()),
+    )
+    return [(contact_id, score) for score, contact_id in ranked]
+
+
+def _rank_term_matches(
+    term_matches: Mapping[str, int],
+    contact_ids: Callable[[str], Iterable[int]],
+    limit: int,
+) -> list[tuple[int, int]]:
+    """Rank the contacts that match a single query term.
+
+    The contacts are collected one distance at a time, from the closest terms,
+    and the farther terms are skipped once there are enough contacts.
+    """
+    ranked: list[tuple[int, int]] = []
+    seen: set[int] = set()
+    for distance in sorted(set(term_matches.values())):
+        tier: set[int] = set()
+        for term, term_distance in term_matches.items():
+            if term_distance == distance:
+                tier.update(contact_ids(term))
+        tier -= seen
+        ranked.extend(
+            (contact_id, distance) for contact_id in sorted(tier)[: limit - len(ranked)]
+        )
+        if len(ranked) >= limit:
+            break
+        seen |= tier
+    return ranked
+
+
+class TrigramIndex:
+    """Name terms searchable by edit distance.
+
+    Terms whose contacts are all removed stay in the trigram postings, but
+    they no longer match any contact.
+    """
+
+    def __init__(self):
+        self._terms: list[str] = []
+        self._term_ids: dict[str, int] = {}
+        # The letter mask of each term.
+        self._masks: list[int] = []
+        # The IDs of the terms that have each trigram.
+        self._trigrams: dict[str, array] = {}
+        # The IDs of the contacts that have each term.
+        self._contacts: Postings = Postings()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _add_term(self, term: str, copied: set[str] | None = None):
+        """Add a term to the trigram postings.
+
+        Args:
+            term (str): The term, which must not be in the index yet.
+            copied (set[str] | None): The trigrams whose postings were already
+                copied from another index. The others are copied before they
+                are modified. None if the postings are not shared.
+        """
+        term_id = len(self._terms)
+        self._terms.append(term)
+        self._term_ids[term] = term_id
+        self._masks.append(letter_mask(term))
+        for trigram in trigrams(term):
+            term_ids = self._trigrams.get(trigram)
+            if term_ids is None:
+                self._trigrams[trigram] = array("i", (term_id,))
+                if copied is not None:
+                    copied.add(trigram)
+                continue
+            if copied is not None and trigram not in copied:
+                term_ids = self._trigrams[trigram] = array("i", term_ids)
+                copied.add(trigram)
+            term_ids.append(term_id)
+
+    def add(self, contact: Contact):
+        """Add the name terms of a contact."""
+        for term in contact_name_terms(contact):
+            if term not in self._term_ids:
+                self._add_term(term)
+            self._contacts.add(term, contact.id)
+
+    def updated(
+        self,
+        removed: Iterable[Contact],
+        added: Iterable[Contact],
+    ) -> "TrigramIndex":
+        """Get a copy of the index with contacts removed and added.
+
+        The index itself is not modified, so it can keep serving lookups while
+        the copy is built.
+        """
+        added = list(added)
+        index = TrigramIndex()
+        index._terms = list(self._terms)
+        index._term_ids = dict(self._term_ids)
+        index._masks = list(self._masks)
+        index._trigrams = dict(self._trigrams)
+        index._contacts = self._contacts.updated(
+            [
+                (term, contact.id)
+                for contact in removed
+                for term in contact_name_terms(contact)
+            ],
+            [
+                (term, contact.id)
+                for contact in added
+                for term in contact_name_terms(contact)
+            ],
+        )
+        copied: set[str] = set()
+        for contact in added:
+            for term in contact_name_terms(contact):
+                if term not in index._term_ids:
+                    index._add_term(term, copied)
+        return index
+
+    def matches(self, term: str, max_distance: int | None = None) -> dict[str, int]:
+        """Get the indexed terms within `max_distance` edits of a term, with
+        their distance. The default distance depends on the length of the
+        term."""
+        if max_distance is None:
+            max_distance = default_max_distance(term)
+        counts: Counter[int] = Counter()
+        for trigram in trigrams(term):
+            term_ids = self._trigrams.get(trigram)
+            if term_ids is not None:
+                counts.update(term_ids)
+        min_shared = min_shared_trigrams(term, max_distance)
+        query_mask = letter_mask(term)
+        char_masks = _char_masks(term)
+        length = len(term)
+        terms = self._terms
+        masks = self._masks
+        matches = {}
+        for term_id, count in counts.items():
+            if count < min_shared:
+                continue
+            mask = masks[term_id]
+            if (query_mask & ~mask).bit_count() > max_distance or (
+                mask & ~query_mask
+            ).bit_count() > max_distance:
+                continue
+            candidate = terms[term_id]
+            if abs(len(candidate) - length) > max_distance:
+                continue
+            distance = _distance(char_masks, length, candidate)
+            if distance <= max_distance:
+                matches[candidate] = distance
+        return matches
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        max_distance: int | None = None,
+    ) -> list[tuple[int, int]]:
+        """Get the contacts whose names best match all the terms of a query.
+
+        Returns:
+            list[tuple[int, int]]: (contact ID, total distance) of at most
+                `limit` contacts, sorted by distance and then by ID.
+        """
+        return rank_matches(
+            [self.matches(term, max_distance) for term in name_terms(query)],
+            self._contacts.get,
+            limit,
+        )
@@ -0,0 +1,360 @@
+"""Metrics of the app, in the Prometheus text format.
+
+The requests are measured by MetricsMiddleware, a plain ASGI middleware that
+only adds a dict update and a bisect to each request. The statistics of the
+data store are collected when the metrics are rendered.
+
+Each worker process of contactlookup.server counts its own requests. With
+several workers, each of them writes its counters to a file of a shared
+directory with write_metrics_file, and the worker that answers a scrape
+renders the sum of all the files, see read_metrics_files. The counters of the
+scrapes are then monotonic, whichever worker answers them, but the counts of
+the other workers may lag behind by the interval of their writes.
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from starlette.routing import Match
+
+from contactlookup.models.stats import CacheStats
+from contactlookup.services.data_store_service import DataStoreService
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+# The route of the requests that do not match any route
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    """Count observations in buckets of upper bounds, like a Prometheus
+    histogram."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets: tuple[float, ...] = buckets
+        # The last count is of the observations above all the buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float):
+        """Add an observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RequestMetrics:
+    """Count and latency of the requests of each route."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self._buckets: tuple[float, ...] = buckets
+        # By method, route and status
+        self.requests: dict[tuple[str, str, int], int] = {}
+        # By method and route
+        self.durations: dict[tuple[str, str], Histogram] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        """Record a request."""
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.durations.get((method, route))
+        if histogram is None:
+            histogram = self.durations[(method, route)] = Histogram(self._buckets)
+        histogram.observe(seconds)
+
+
+def write_metrics_file(
+    directory: Path,
+    request_metrics: RequestMetrics,
+    cache_stats: list[CacheStats],
+):
+    """Write the counters of this process to a file of `directory`.
+
+    The file is replaced atomically, so that the other processes never read
+    a partial file.
+    """
+    data = {
+        "requests": [
+            [method, route, status, count]
+            for (method, route, status), count in list(
+                request_metrics.requests.items(),
+            )
+        ],
+        "durations": [
+            [method, route, list(histogram.counts), histogram.sum]
+            for (method, route), histogram in list(request_metrics.durations.items())
+        ],
+        "caches": [[stats.name, stats.hits, stats.misses] for stats in cache_stats],
+    }
+    file_path = directory / f"{os.getpid()}.json"
+    temp_path = directory / f"{os.getpid()}.tmp"
+    temp_path.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(temp_path, file_path)
+
+
+def read_metrics_files(
+    directory: Path,
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> tuple[RequestMetrics, list[CacheStats]]:
+    """Get the sum of the counters of all the files of `directory`.
+
+    The files of the processes that exited are kept, so that the sums never
+    decrease.
+    """
+    request_metrics = RequestMetrics(buckets)
+    caches: dict[str, CacheStats] = {}
+    for file_path in sorted(directory.glob("*.json")):
+        try:
+            data = json.loads(file_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        for method, route, status, count in data["requests"]:
+            key = (method, route, status)
+            request_metrics.requests[key] = request_metrics.requests.get(key, 0) + count
+        for method, route, counts, total in data["durations"]:
+            histogram = request_metrics.durations.get((method, route))
+            if histogram is None:
+                histogram = request_metrics.durations[(method, route)] = Histogram(
+                    buckets,
+                )
+            histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+            histogram.sum += total
+        for name, hits, misses in data["caches"]:
+            stats = caches.setdefault(name, CacheStats(name, 0, 0))
+            stats.hits += hits
+            stats.misses += misses
+    return request_metrics, list(caches.values())
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records each HTTP request in RequestMetrics.
+
+    The requests are labeled with the path of their route, e.g.
+    /contacts/fname/{fname}, so that the number of labels is bounded.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics: RequestMetrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.observe(
+                scope["method"],
+                _route_path(scope),
+                status,
+                time.perf_counter() - start,
+            )
+
+
+def _route_path(scope) -> str:
+    """Get the path of the route of a request."""
+    route = scope.get("route")
+    if route is None:
+        # The response was sent before routing, e.g. 304 Not Modified
+        app = scope.get("app")
+        for candidate in app.routes if app else ():
+            match, _ = candidate.matches(scope)
+            if match != Match.NONE:
+                route = candidate
+                break
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+def _labels(**labels) -> str:
+    escaped = (
+        '%s="%s"'
+        % (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _metric(
+    lines: list[str],
+    name: str,
+    kind: str,
+    description: str,
+    samples: Iterable[tuple[str, float]],
+):
+    """Add a metric and its samples, given as (suffix and labels, value)."""
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+    lines.extend(f"{name}{series} {value}" for series, value in samples)
+
+
+def render_metrics(
+    request_metrics: RequestMetrics,
+    service: DataStoreService | None,
+    cache_stats: list[CacheStats] | None = None,
+) -> str:
+    """Render the metrics of the requests and of the data store.
+
+    `cache_stats` replaces the cache statistics of the service, e.g. with
+    those of all the workers.
+    """
+    lines: list[str] = []
+    _metric(
+        lines,
+        "contactlookup_http_requests_total",
+        "counter",
+        "Requests by method, route and status.",
+        (
+            (_labels(method=method, route=route, status=status), count)
+            for (method, route, status), count in sorted(
+                request_metrics.requests.items(),
+            )
+        ),
+    )
+    _metric(
+        lines,
+        "contactlookup_http_request_duration_seconds",
+        "histogram",
+        "Latency of the requests by method and route.",
+        (
+            sample
+            for (method, route), histogram in sorted(request_metrics.durations.items())
+            for sample in _histogram_samples(histogram, method=method, route=route)
+        ),
+    )
+    if service is None:
+        return "\n".join(lines) + "\n"
+
+    ingest_stats = service.get_ingest_stats()
+    if ingest_stats is not None:
+        _metric(
+            lines,
+            "contactlookup_ingest_duration_seconds",
+            "gauge",
+            "Duration of the stages of the last load of the contacts.",
+            (
+                (_labels(stage="read"), ingest_stats.read_seconds),
+                (_labels(stage="parse"), ingest_stats.parse_seconds),
+                (_labels(stage="index"), ingest_stats.index_seconds),
+            ),
+        )
+    reload_stats = service.get_reload_stats()
+    if reload_stats is not None:
+        _metric(
+            lines,
+            "contactlookup_reloads_total",
+            "counter",
+            "Reloads of the contacts file by result.",
+            (
+                (_labels(result="success"), reload_stats.reloads),
+                (_labels(result="failure"), reload_stats.failures),
+            ),
+        )
+        _metric(
+            lines,
+            "contactlookup_reload_seconds_total",
+            "counter",
+            "Total duration of the successful reloads of the contacts file.",
+            (("", reload_stats.total_duration_seconds),),
+        )
+        if reload_stats.last_duration_seconds is not None:
+            _metric(
+                lines,
+                "contactlookup_reload_duration_seconds",
+                "gauge",
+                "Duration of the last successful reload of the contacts file.",
+                (("", reload_stats.last_duration_seconds),),
+            )
+    index_stats = service.get_index_stats()
+    _metric(
+        lines,
+        "contactlookup_index_entries",
+        "gauge",
+        "Keys or contacts of each index.",
+        ((_labels(index=stats.name), stats.entries) for stats in index_stats),
+    )
+    _metric(
+        lines,
+        "contactlookup_index_memory_bytes",
+        "gauge",
+        "Approximate memory of each index, without the contacts.",
+        ((_labels(index=stats.name), stats.memory_bytes) for stats in index_stats),
+    )
+    if cache_stats is None:
+        cache_stats = service.get_cache_stats()
+    _metric(
+        lines,
+        "contactlookup_cache_requests_total",
+        "counter",
+        "Cache lookups by cache and result.",
+        (
+            sample
+            for stats in cache_stats
+            for sample in (
+                (_labels(cache=stats.name, result="hit"), stats.hits),
+                (_labels(cache=stats.name, result="miss"), stats.misses),
+            )
+        ),
+    )
+    _metric(
+        lines,
+        "contactlookup_cache_hit_ratio",
+        "gauge",
+        "Share of the cache lookups that were hits.",
+        (
+            (
+                _labels(cache=stats.name),
+                stats.hits / (stats.hits + stats.misses),
+            )
+            for stats in cache_stats
+            if stats.hits + stats.misses
+        ),
+    )
+    return "\n".join(lines) + "\n"
+
+
+def _histogram_samples(
+    histogram: Histogram,
+    **labels,
+) -> Iterator[tuple[str, float]]:
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        yield "_bucket" + _labels(**labels, le=bound), cumulative
+    count = cumulative + histogram.counts[-1]
+    yield "_bucket" + _labels(**labels, le="+Inf"), count
+    yield "_sum" + _labels(**labels), histogram.sum
+    yield "_count" + _labels(**labels), count
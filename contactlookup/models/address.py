@@ -1,7 +1,8 @@
+import sys
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class Address:
     id: int | None = field(init=False, default=None)
     street: str
@@ -14,12 +15,22 @@ class Address:
 
     def __post_init__(self):
         self.street = self.street.strip()
-        self.city = self.city.strip().upper() if self.city is not None else None
-        self.state = self.state.strip().upper() if self.state is not None else None
+        # Cities, states, countries and types repeat across many contacts, so a
+        # single interned copy of each value is shared by all the addresses.
+        self.city = (
+            sys.intern(self.city.strip().upper()) if self.city is not None else None
+        )
+        self.state = (
+            sys.intern(self.state.strip().upper()) if self.state is not None else None
+        )
         self.postal_code = (
             self.postal_code.strip() if self.postal_code is not None else None
         )
         self.country = (
-            self.country.strip().upper() if self.country is not None else None
+            sys.intern(self.country.strip().upper())
+            if self.country is not None
+            else None
+        )
+        self.type = (
+            sys.intern(self.type.strip().upper()) if self.type is not None else None
         )
-        self.type = self.type.strip().upper() if self.type is not None else None
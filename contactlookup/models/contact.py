@@ -1,4 +1,5 @@
 # A VCF contact model
+import sys
 from dataclasses import dataclass, field
 
 from contactlookup.models.address import Address
@@ -6,7 +7,7 @@ from contactlookup.models.email import Email
 from contactlookup.models.phone_number import PhoneNumber
 
 
-@dataclass
+@dataclass(slots=True)
 class Contact:
     id: int
     first_name: str
@@ -21,10 +22,16 @@ class Contact:
     emails: list[Email] = field(default_factory=list)
 
     def __post_init__(self):
-        self.first_name = self.first_name.strip().upper()
-        self.last_name = self.last_name.strip().upper()
-        self.company = self.company.strip() if self.company is not None else None
-        self.title = self.title.strip().upper() if self.title is not None else None
+        # Names, companies and titles are shared by many contacts, so they are
+        # interned to keep a single copy of each value.
+        self.first_name = sys.intern(self.first_name.strip().upper())
+        self.last_name = sys.intern(self.last_name.strip().upper())
+        self.company = (
+            sys.intern(self.company.strip()) if self.company is not None else None
+        )
+        self.title = (
+            sys.intern(self.title.strip().upper()) if self.title is not None else None
+        )
         self.other_names = (
             self.other_names.strip().upper() if self.other_names is not None else None
         )
@@ -57,6 +64,16 @@ class Contact:
     def add_email(self, email: Email):
         self.emails.append(email)
 
+    def set_id(self, contact_id: int):
+        # Update the contact ID, and the contact ID of all the child records
+        self.id = contact_id
+        for phone_number in self.phone_numbers:
+            phone_number.contact_id = contact_id
+        for address in self.addresses:
+            address.contact_id = contact_id
+        for email in self.emails:
+            email.contact_id = contact_id
+
     def refresh(self):
         # Run the post init method again to ensure all fields are properly
         # formatted
@@ -0,0 +1,66 @@
+from dataclasses import dataclass, fields
+
+from contactlookup.models.address import Address
+from contactlookup.models.contact import Contact
+
+
+@dataclass(slots=True)
+class ContactFilter:
+    """Conditions a contact must all match. Unset conditions match anything.
+
+    Values are compared case-insensitively. The `_contains` conditions match a
+    substring. The city, state and country conditions must all be matched by
+    the same address.
+    """
+
+    first_name: str | None = None
+    last_name: str | None = None
+    company: str | None = None
+    company_contains: str | None = None
+    title: str | None = None
+    title_contains: str | None = None
+    city: str | None = None
+    state: str | None = None
+    country: str | None = None
+
+    def __post_init__(self):
+        # Contacts and addresses store these fields in upper case
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value is not None:
+                setattr(self, field.name, value.strip().upper())
+
+    def has_conditions(self) -> bool:
+        return any(getattr(self, field.name) is not None for field in fields(self))
+
+    def has_address_conditions(self) -> bool:
+        return any(value is not None for value in (self.city, self.state, self.country))
+
+    def matches_address(self, address: Address) -> bool:
+        return (
+            (self.city is None or address.city == self.city)
+            and (self.state is None or address.state == self.state)
+            and (self.country is None or address.country == self.country)
+        )
+
+    def matches(self, contact: Contact) -> bool:
+        company = contact.company.upper() if contact.company is not None else None
+        title = contact.title
+        return (
+            (self.first_name is None or contact.first_name == self.first_name)
+            and (self.last_name is None or contact.last_name == self.last_name)
+            and (self.company is None or company == self.company)
+            and (
+                self.company_contains is None
+                or (company is not None and self.company_contains in company)
+            )
+            and (self.title is None or title == self.title)
+            and (
+                self.title_contains is None
+                or (title is not None and self.title_contains in title)
+            )
+            and (
+                not self.has_address_conditions()
+                or any(self.matches_address(address) for address in contact.addresses)
+            )
+        )
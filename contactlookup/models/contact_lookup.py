@@ -0,0 +1,44 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from contactlookup.models.contact import Contact
+
+
+@dataclass(slots=True)
+class ContactLookup:
+    """Phone numbers, emails and first names to look up contacts by, in a
+    single request. Each value is looked up like in the lookup of a single
+    value, e.g. `get_contacts_by_phone_number`."""
+
+    phone_numbers: list[str] = field(default_factory=list)
+    emails: list[str] = field(default_factory=list)
+    first_names: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.phone_numbers) + len(self.emails) + len(self.first_names)
+
+
+@dataclass(slots=True)
+class ContactLookupResult:
+    """The contacts of each value of a ContactLookup.
+
+    Each value, as it was given, is mapped to the IDs of its contacts. A
+    contact is kept once in `contacts`, even if it matches several values.
+    """
+
+    phone_numbers: dict[str, list[int]] = field(default_factory=dict)
+    emails: dict[str, list[int]] = field(default_factory=dict)
+    first_names: dict[str, list[int]] = field(default_factory=dict)
+    contacts: dict[int, Contact] = field(default_factory=dict)
+
+    def add(
+        self,
+        matches: dict[str, list[int]],
+        value: str,
+        contacts: Iterable[Contact],
+    ):
+        """Add the contacts of a value to one of the maps of the result."""
+        contact_ids = matches[value] = []
+        for contact in contacts:
+            contact_ids.append(contact.id)
+            self.contacts.setdefault(contact.id, contact)
@@ -1,7 +1,8 @@
+import sys
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class Email:
     id: int | None = field(init=False, default=None)
     email: str
@@ -10,4 +11,6 @@ class Email:
 
     def __post_init__(self):
         self.email = self.email.strip()
-        self.type = self.type.strip().lower() if self.type is not None else None
+        self.type = (
+            sys.intern(self.type.strip().lower()) if self.type is not None else None
+        )
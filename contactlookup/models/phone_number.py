@@ -1,7 +1,8 @@
+import sys
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class PhoneNumber:
     id: int | None = field(init=False, default=None)
     number: str
@@ -13,4 +14,6 @@ class PhoneNumber:
         self.number = "".join(
             [char for char in self.number if char.isnumeric()],
         )
-        self.type = self.type.strip().upper() if self.type is not None else None
+        self.type = (
+            sys.intern(self.type.strip().upper()) if self.type is not None else None
+        )
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class IngestStats:
+    """Durations of the stages of a load of the contacts, in seconds.
+
+    When stages overlap, e.g. the cards are read and parsed by worker
+    processes, their time is counted in the later stage.
+    """
+
+    read_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    index_seconds: float = 0.0
+
+
+@dataclass(slots=True)
+class IndexStats:
+    """Size of an index of a data store.
+
+    `memory_bytes` approximates the memory of the index itself, without the
+    contacts, which are shared by all the indexes.
+    """
+
+    name: str
+    entries: int
+    memory_bytes: int
+
+
+@dataclass(slots=True)
+class CacheStats:
+    """Hits and misses of a cache of a data store."""
+
+    name: str
+    hits: int
+    misses: int
+
+
+@dataclass(slots=True)
+class ReloadStats:
+    """Statistics about the reloads of the contacts file."""
+
+    reloads: int = 0
+    failures: int = 0
+    last_duration_seconds: float | None = None
+    total_duration_seconds: float = 0.0
+
+    def add(self, duration_seconds: float):
+        """Record a successful reload."""
+        self.reloads += 1
+        self.last_duration_seconds = duration_seconds
+        self.total_duration_seconds += duration_seconds
@@ -0,0 +1,138 @@
+"""Serving of the app by one or more uvicorn workers.
+
+With several workers, the data store is loaded once, in the parent process,
+which then forks the workers. The workers share the memory pages of the
+contacts and the indexes with the parent until they write to them
+(copy-on-write), so that the memory of the data store is not multiplied by
+the number of workers.
+"""
+
+import gc
+import logging
+import os
+import signal
+from collections.abc import Callable
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI
+
+from contactlookup.definitions import DEFAULT_HOST, DEFAULT_PORT
+
+
+def serve(
+    app: FastAPI,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    workers: int = 1,
+    loop: str = "auto",
+    http: str = "auto",
+    backlog: int = 2048,
+    timeout_keep_alive: int = 5,
+    on_worker_start: Callable[[], object] | None = None,
+):
+    """Serve an app until it is interrupted.
+
+    Args:
+        app (FastAPI): The app, with its data store loaded.
+        host (str): The host to bind.
+        port (int): The port to bind.
+        workers (int): The number of processes that serve the requests. With
+            more than 1, the workers are forked from this process.
+        loop (str): The event loop of uvicorn: auto, asyncio or uvloop.
+        http (str): The HTTP parser of uvicorn: auto, h11 or httptools.
+        backlog (int): The maximum number of connections waiting to be
+            accepted.
+        timeout_keep_alive (int): Close the idle keep-alive connections after
+            this many seconds.
+        on_worker_start (Callable | None): Called in each worker before it
+            serves, e.g. to start the threads of the worker.
+    """
+    logger = logging.getLogger(__name__)
+    options: dict[str, Any] = {
+        "host": host,
+        "port": port,
+        "loop": loop,
+        "http": http,
+        "backlog": backlog,
+        "timeout_keep_alive": timeout_keep_alive,
+    }
+    if workers > 1 and not hasattr(os, "fork"):
+        logger.warning("serve|Cannot fork workers on this platform. Using 1 worker.")
+        workers = 1
+    if workers <= 1:
+        if on_worker_start:
+            on_worker_start()
+        uvicorn.run(app, **options)
+        return
+
+    config = uvicorn.Config(app, **options)
+    # Bound before forking, so that all the workers accept the connections of
+    # the same socket.
+    sock = config.bind_socket()
+
+    def run_worker():
+        if on_worker_start:
+            on_worker_start()
+        uvicorn.Server(config).run(sockets=[sock])
+
+    logger.info("serve|Forking %s workers", workers)
+    pids = fork_workers(workers, run_worker)
+    sock.close()
+    wait_workers(pids)
+
+
+def fork_workers(workers: int, target: Callable[[], object]) -> list[int]:
+    """Fork processes that run a function and exit, and get their IDs.
+
+    The objects of this process are frozen before forking: the garbage
+    collections of the workers skip them, so that they never write to the
+    pages of the objects that the requests do not use.
+    """
+    gc.collect()
+    gc.freeze()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                target()
+            except KeyboardInterrupt:
+                pass
+            except BaseException as e:
+                logging.getLogger(__name__).error("fork_workers|Worker error: %s", e)
+                status = 1
+            finally:
+                os._exit(status)
+        pids.append(pid)
+    return pids
+
+
+def wait_workers(pids: list[int]):
+    """Wait for workers to exit.
+
+    The workers are terminated when this process is interrupted or
+    terminated. Only call this from the main thread.
+    """
+    logger = logging.getLogger(__name__)
+
+    def stop(signum, frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous_handlers = {
+        signum: signal.signal(signum, stop)
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        for pid in pids:
+            _, status = os.waitpid(pid, 0)
+            if os.waitstatus_to_exitcode(status) > 0:
+                logger.error("wait_workers|Worker %s failed", pid)
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
@@ -0,0 +1,184 @@
+"""Awaitable lookups on a data store service, for the async routes.
+
+The indexed lookups of the in-memory data stores take microseconds, so they
+are run directly on the event loop: handing them to a worker thread would
+cost more than the lookup itself. These are run in the thread pool of the
+event loop instead, so that they never stall the other requests:
+
+* all the lookups of the data stores that block on I/O, like the SQLite data
+  store,
+* the lookups that scan all the contacts, see DataStoreService.scan_methods,
+* the JSON of more than INLINE_JSON_CONTACTS contacts, which may have to be
+  encoded.
+"""
+
+from collections.abc import Callable
+from typing import TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from contactlookup.models.contact import Contact
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup, ContactLookupResult
+from contactlookup.services.data_store_service import DataStoreService
+
+T = TypeVar("T")
+# Encoding the JSON of a contact takes about 35us, and handing a call to a
+# worker thread about 140us.
+INLINE_JSON_CONTACTS = 100
+
+
+class AsyncDataStoreService:
+    """Async variant of a data store service."""
+
+    def __init__(self, service: DataStoreService):
+        self.service: DataStoreService = service
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        """Call a method of the service on the event loop, or in a worker
+        thread if it blocks or scans all the contacts."""
+        if self.service.blocking or function.__name__ in self.service.scan_methods:
+            return await run_in_threadpool(function, *args)
+        return function(*args)
+
+    async def get_contact(self, contact_id: int) -> Contact | None:
+        """Get contact by ID."""
+        return await self._run(self.service.get_contact, contact_id)
+
+    async def get_contacts(
+        self,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list[Contact]:
+        """Get all contacts, sorted by ID."""
+        return await self._run(self.service.get_contacts, after, limit)
+
+    async def get_contacts_by_fname(self, fname: str) -> list:
+        """Get contacts by first name."""
+        return await self._run(self.service.get_contacts_by_fname, fname)
+
+    async def get_contacts_by_fname_prefix(
+        self,
+        prefix: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name starts with a prefix."""
+        return await self._run(
+            self.service.get_contacts_by_fname_prefix,
+            prefix,
+            after,
+            limit,
+        )
+
+    async def get_contacts_by_fname_range(
+        self,
+        start: str,
+        end: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name is between start and end."""
+        return await self._run(
+            self.service.get_contacts_by_fname_range,
+            start,
+            end,
+            after,
+            limit,
+        )
+
+    async def get_contacts_by_lname(self, lname: str) -> list:
+        """Get contacts by last name."""
+        return await self._run(self.service.get_contacts_by_lname, lname)
+
+    async def get_contacts_by_lname_prefix(self, prefix: str) -> list:
+        """Get contacts whose last name starts with a prefix."""
+        return await self._run(self.service.get_contacts_by_lname_prefix, prefix)
+
+    async def get_contacts_by_full_name(self, fname: str, lname: str) -> list:
+        """Get contacts by first and last name."""
+        return await self._run(self.service.get_contacts_by_full_name, fname, lname)
+
+    async def get_contacts_by_phone_number(self, phone_number: str) -> list:
+        """Get contacts by phone number."""
+        return await self._run(self.service.get_contacts_by_phone_number, phone_number)
+
+    async def get_contacts_by_phone_number_suffix(self, suffix: str) -> list:
+        """Get contacts with a phone number that ends with some digits."""
+        return await self._run(
+            self.service.get_contacts_by_phone_number_suffix,
+            suffix,
+        )
+
+    async def get_contacts_by_phone_number_containing(self, digits: str) -> list:
+        """Get contacts with a phone number that contains some digits."""
+        return await self._run(
+            self.service.get_contacts_by_phone_number_containing,
+            digits,
+        )
+
+    async def get_contacts_by_email(self, email: str) -> list:
+        """Get contacts by email."""
+        return await self._run(self.service.get_contacts_by_email, email)
+
+    async def get_contacts_by_phonetic_name(self, name: str) -> list:
+        """Get the contacts whose names sound like a name."""
+        return await self._run(self.service.get_contacts_by_phonetic_name, name)
+
+    async def get_contacts_by_fuzzy_name(self, name: str, limit: int = 10) -> list:
+        """Get the contacts whose names best match a name with typos."""
+        return await self._run(self.service.get_contacts_by_fuzzy_name, name, limit)
+
+    async def search_contacts(self, query: str, limit: int = 10) -> list:
+        """Get the contacts that have all the words of a query."""
+        return await self._run(self.service.search_contacts, query, limit)
+
+    async def get_contacts_by_country(
+        self,
+        country: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by country, sorted by ID."""
+        return await self._run(
+            self.service.get_contacts_by_country,
+            country,
+            after,
+            limit,
+        )
+
+    async def get_contacts_by_state(
+        self,
+        state: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by state, sorted by ID."""
+        return await self._run(self.service.get_contacts_by_state, state, after, limit)
+
+    async def filter_contacts(
+        self,
+        contact_filter: ContactFilter,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get the contacts that match all the conditions of a filter."""
+        return await self._run(
+            self.service.filter_contacts,
+            contact_filter,
+            after,
+            limit,
+        )
+
+    async def lookup_contacts(self, lookup: ContactLookup) -> ContactLookupResult:
+        """Get the contacts of many phone numbers, emails and first names."""
+        return await self._run(self.service.lookup_contacts, lookup)
+
+    async def get_contacts_json(self, contacts: list[Contact]) -> list[bytes]:
+        """Get the JSON of some contacts, see DataStoreService.get_contact_json."""
+        if len(contacts) > INLINE_JSON_CONTACTS:
+            return await run_in_threadpool(self._get_contacts_json, contacts)
+        return await self._run(self._get_contacts_json, contacts)
+
+    def _get_contacts_json(self, contacts: list[Contact]) -> list[bytes]:
+        return [self.service.get_contact_json(contact) for contact in contacts]
@@ -0,0 +1,437 @@
+"""Columnar data store service.
+
+The contacts are read from a VCF file like in the file data store service, but
+are stored in a ContactTable: one dictionary-encoded NumPy column per field,
+instead of one Python object per contact. Every query, including the
+multi-field filters of `filter_contacts`, is a vectorized scan of the columns.
+This trades the O(1) lookups of the file data store indexes for a much smaller
+memory footprint and for fast ad hoc queries on any field.
+
+Contacts are returned in the order of their IDs, except for the first name
+prefix and range searches, sorted by first name and ID like in the other data
+stores, and for fuzzy name and full-text searches, which return the best
+matches first.
+"""
+
+import logging
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+from contactlookup.definitions import VCF_EXTENSION
+from contactlookup.indexes.contact_table import ContactTable, StringColumn
+from contactlookup.indexes.phonetic import phonetic_keys
+from contactlookup.models.contact import Contact
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup, ContactLookupResult
+from contactlookup.services.data_store_service import DataStoreService, dataset_version
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+
+class ColumnarDataStoreService(DataStoreService):
+    """Columnar data store service."""
+
+    # Every lookup is a vectorized scan of the columns, except the lookups by
+    # ID and the fuzzy name and full-text searches, which use indexes.
+    scan_methods = DataStoreService.scan_methods | frozenset(
+        [
+            "get_contacts_by_fname",
+            "get_contacts_by_fname_prefix",
+            "get_contacts_by_fname_range",
+            "get_contacts_by_lname",
+            "get_contacts_by_lname_prefix",
+            "get_contacts_by_full_name",
+            "get_contacts_by_phone_number",
+            "get_contacts_by_phone_number_suffix",
+            "get_contacts_by_phone_number_containing",
+            "get_contacts_by_email",
+            "get_contacts_by_country",
+            "get_contacts_by_state",
+            "lookup_contacts",
+        ],
+    )
+
+    def __init__(self, parse_workers: int = 1):
+        self._contacts_file_path: Path | None = None
+        self._validated_file_path: bool = False
+        # Number of processes used to parse the VCF file. 1 parses serially.
+        self._parse_workers: int = max(parse_workers, 1)
+        self._table: ContactTable = ContactTable()
+        self._table.freeze()
+        self._version: str | None = None
+
+    def set_contacts_file_path(self, file_path: Path):
+        """Set the contacts file path."""
+        if file_path.is_file() and file_path.suffix == VCF_EXTENSION:
+            self._contacts_file_path = file_path
+            self._validated_file_path = True
+
+    def initialize(self) -> bool:
+        """Initialize data store."""
+        logger = logging.getLogger(__name__)
+        logger.info("initialize|Initializing columnar data store.")
+        if not self._validated_file_path or not self._contacts_file_path:
+            logger.error("initialize|Contacts file path not validated.")
+            return False
+
+        try:
+            file_stat = self._contacts_file_path.stat()
+        except OSError as e:
+            logger.error("initialize|Error reading contacts file: %s", e)
+            return False
+        # Contact IDs are assigned in file order, starting from 1.
+        FileDataStoreService.contact_id = 0
+        contacts: Iterable[Contact]
+        if self._parse_workers > 1:
+            contacts = FileDataStoreService.read_vcf_file_parallel(
+                file_path=self._contacts_file_path,
+                logger=logger,
+                workers=self._parse_workers,
+            )
+        else:
+            contacts = FileDataStoreService.read_vcf_file(
+                file_path=self._contacts_file_path,
+                logger=logger,
+            )
+        table = ContactTable()
+        try:
+            # Only one Contact object is alive at a time while loading.
+            for contact in contacts:
+                table.append(contact)
+            table.freeze()
+        except Exception as e:
+            logger.error("initialize|Error building the contact table: %s", e)
+            return False
+        self._table = table
+        self._version = dataset_version(
+            type(self).__name__,
+            file_stat.st_size,
+            file_stat.st_mtime_ns,
+        )
+        logger.info(
+            "initialize|Columnar data store initialized with %d contacts.",
+            len(table),
+        )
+        return True
+
+    def get_dataset_version(self) -> str | None:
+        """Get the version of the loaded contacts."""
+        return self._version
+
+    def get_contact(self, contact_id: int) -> Contact | None:
+        """Get contact by ID."""
+        table = self._table
+        row = table.find_row(contact_id)
+        if row is None:
+            return None
+        return table.contact(row)
+
+    def get_contacts(self, after: int = 0, limit: int | None = None) -> list[Contact]:
+        """Get all contacts, sorted by ID."""
+        return self._table.contacts_after(after, limit)
+
+    def get_contacts_by_fname(self, fname: str) -> list:
+        """Get contacts by first name."""
+        table = self._table
+        return table.contacts(
+            table.columns["first_name"].equals(fname.strip().upper()),
+        )
+
+    def get_contacts_by_fname_prefix(
+        self,
+        prefix: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name starts with a prefix, sorted by first
+        name and ID."""
+        prefix = prefix.strip().upper()
+        return self._table.sorted_contacts(
+            "first_name",
+            lambda name: name.startswith(prefix),
+            after,
+            limit,
+        )
+
+    def get_contacts_by_fname_range(
+        self,
+        start: str,
+        end: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name is between start (inclusive) and end
+        (exclusive), sorted by first name and ID."""
+        start = start.strip().upper()
+        end = end.strip().upper()
+        return self._table.sorted_contacts(
+            "first_name",
+            lambda name: start <= name < end,
+            after,
+            limit,
+        )
+
+    def get_contacts_by_lname(self, lname: str) -> list:
+        """Get contacts by last name."""
+        table = self._table
+        return table.contacts(
+            table.columns["last_name"].equals(lname.strip().upper()),
+        )
+
+    def get_contacts_by_lname_prefix(self, prefix: str) -> list:
+        """Get contacts whose last name starts with a prefix."""
+        prefix = prefix.strip().upper()
+        table = self._table
+        return table.contacts(
+            table.columns["last_name"].matches(
+                lambda name: name is not None and name.startswith(prefix),
+            ),
+        )
+
+    def get_contacts_by_full_name(self, fname: str, lname: str) -> list:
+        """Get contacts by first and last name."""
+        table = self._table
+        return table.contacts(
+            table.columns["last_name"].equals(lname.strip().upper())
+            & table.columns["first_name"].equals(fname.strip().upper()),
+        )
+
+    def get_contacts_by_phone_number(self, phone_number: str) -> list:
+        """Get contacts by phone number."""
+        # Phone numbers are stored with their digits only
+        phone_number = "".join(char for char in phone_number if char.isnumeric())
+        if not phone_number:
+            return []
+        table = self._table
+        phone_numbers = table.phone_numbers
+        return table.contacts(
+            phone_numbers.contact_mask(
+                phone_numbers.columns["number"].equals(phone_number),
+                len(table),
+            ),
+        )
+
+    def get_contacts_by_phone_number_suffix(self, suffix: str) -> list:
+        """Get contacts with a phone number that ends with some digits."""
+        table = self._table
+        suffix = "".join(char for char in suffix if char.isnumeric())
+        return self._contacts_with_numbers(
+            table,
+            table.phone_number_index.ending_with(suffix),
+        )
+
+    def get_contacts_by_phone_number_containing(self, digits: str) -> list:
+        """Get contacts with a phone number that contains some digits."""
+        table = self._table
+        digits = "".join(char for char in digits if char.isnumeric())
+        return self._contacts_with_numbers(
+            table,
+            table.phone_number_index.containing(digits),
+        )
+
+    def _contacts_with_numbers(self, table: ContactTable, numbers: list[str]) -> list:
+        if not numbers:
+            return []
+        phone_numbers = table.phone_numbers
+        return table.contacts(
+            phone_numbers.contact_mask(
+                phone_numbers.columns["number"].equals_any(numbers),
+                len(table),
+            ),
+        )
+
+    def get_contacts_by_email(self, email: str) -> list:
+        """Get contacts by email."""
+        email = email.strip().lower()
+        table = self._table
+        emails = table.emails
+        # Emails are stored as they appear in the file, and matched in any case
+        return table.contacts(
+            emails.contact_mask(
+                emails.columns["email"].matches(
+                    lambda value: value is not None and value.lower() == email,
+                ),
+                len(table),
+            ),
+        )
+
+    def lookup_contacts(self, lookup: ContactLookup) -> ContactLookupResult:
+        """Get the contacts of many phone numbers, emails and first names at
+        once.
+
+        Each kind of value is matched in one vectorized pass over its column,
+        with the dictionary codes of all the values, and then each contact is
+        built once.
+        """
+        table = self._table
+        numbers = table.phone_numbers.columns["number"]
+        emails = table.emails.columns["email"]
+        first_names = table.columns["first_name"]
+        # Phone numbers are stored with their digits only
+        number_keys = {
+            phone_number: "".join(char for char in phone_number if char.isnumeric())
+            for phone_number in lookup.phone_numbers
+        }
+        email_keys = {email: email.strip().lower() for email in lookup.emails}
+        fname_keys = {fname: fname.strip().upper() for fname in lookup.first_names}
+
+        # Emails are stored as they appear in the file, and matched in any case
+        email_codes: dict[str, list[int]] = {}
+        wanted_emails = set(email_keys.values())
+        for code, value in enumerate(emails.values):
+            if value is not None and (email := value.lower()) in wanted_emails:
+                email_codes.setdefault(email, []).append(code)
+
+        result = ContactLookupResult()
+        # The rows of the contacts of all the values
+        mask = np.zeros(len(table), dtype=bool)
+        for matches, keys, rows_by_key in (
+            (
+                result.phone_numbers,
+                number_keys,
+                table.phone_numbers.contact_rows_by_key(
+                    "number",
+                    _codes_by_key(numbers, set(number_keys.values()) - {""}),
+                ),
+            ),
+            (
+                result.emails,
+                email_keys,
+                table.emails.contact_rows_by_key("email", email_codes),
+            ),
+            (
+                result.first_names,
+                fname_keys,
+                first_names.rows_by_key(
+                    _codes_by_key(first_names, set(fname_keys.values())),
+                ),
+            ),
+        ):
+            ids_by_key: dict[str, list[int]] = {}
+            for key, rows in rows_by_key.items():
+                mask[rows] = True
+                ids_by_key[key] = table.ids[rows].tolist()
+            for value, key in keys.items():
+                matches[value] = list(ids_by_key.get(key, []))
+
+        for contact in table.contacts(mask):
+            result.contacts[contact.id] = contact
+        return result
+
+    def get_contacts_by_phonetic_name(self, name: str) -> list:
+        """Get the contacts whose first or last name sounds like each word of
+        a name."""
+        keys = phonetic_keys(name)
+        if not keys:
+            return []
+        table = self._table
+        mask = table.all_rows()
+        for key in keys:
+
+            def sounds_like(value: str | None, key: str = key) -> bool:
+                return key in phonetic_keys(value)
+
+            mask &= table.columns["first_name"].matches(sounds_like) | table.columns[
+                "last_name"
+            ].matches(sounds_like)
+        return table.contacts(mask)
+
+    def get_contacts_by_fuzzy_name(self, name: str, limit: int = 10) -> list:
+        """Get the contacts whose names best match a name with typos, best
+        match first."""
+        table = self._table
+        ranked = table.name_trigram_index.search(name, limit)
+        return table.contacts_by_id(contact_id for contact_id, _ in ranked)
+
+    def search_contacts(self, query: str, limit: int = 10) -> list:
+        """Get the contacts that have all the words of a query in any of
+        their fields, best match first."""
+        table = self._table
+        ranked = table.text_index.search(query, limit)
+        return table.contacts_by_id(contact_id for contact_id, _ in ranked)
+
+    def get_contacts_by_country(
+        self,
+        country: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by country, sorted by ID."""
+        table = self._table
+        return table.contacts(
+            self._filter_mask(table, ContactFilter(country=country)),
+            after,
+            limit,
+        )
+
+    def get_contacts_by_state(
+        self,
+        state: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by state, sorted by ID."""
+        table = self._table
+        return table.contacts(
+            self._filter_mask(table, ContactFilter(state=state)),
+            after,
+            limit,
+        )
+
+    def filter_contacts(
+        self,
+        contact_filter: ContactFilter,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get the contacts that match all the conditions of a filter, sorted
+        by ID."""
+        table = self._table
+        return table.contacts(self._filter_mask(table, contact_filter), after, limit)
+
+    def _filter_mask(
+        self,
+        table: ContactTable,
+        contact_filter: ContactFilter,
+    ) -> np.ndarray:
+        """Get a mask of the rows that match all the conditions of a filter."""
+        columns = table.columns
+        mask = table.all_rows()
+        # These columns are stored in upper case, like the filter values
+        for name in ("first_name", "last_name", "title"):
+            value = getattr(contact_filter, name)
+            if value is not None:
+                mask &= columns[name].equals(value)
+
+        company = contact_filter.company
+        if company is not None:
+            mask &= columns["company"].matches(
+                lambda value: value is not None and value.upper() == company,
+            )
+        company_contains = contact_filter.company_contains
+        if company_contains is not None:
+            mask &= columns["company"].matches(
+                lambda value: value is not None and company_contains in value.upper(),
+            )
+        title_contains = contact_filter.title_contains
+        if title_contains is not None:
+            mask &= columns["title"].matches(
+                lambda value: value is not None and title_contains in value,
+            )
+
+        if contact_filter.has_address_conditions():
+            addresses = table.addresses
+            # The address conditions must be matched by the same address
+            address_mask = np.ones(len(addresses), dtype=bool)
+            for name in ("city", "state", "country"):
+                value = getattr(contact_filter, name)
+                if value is not None:
+                    address_mask &= addresses.columns[name].equals(value)
+            mask &= addresses.contact_mask(address_mask, len(table))
+        return mask
+
+
+def _codes_by_key(column: StringColumn, keys: Iterable[str]) -> dict[str, list[int]]:
+    """Get the code of each key that is a value of a column."""
+    return {key: [code] for key in keys if (code := column.code(key)) is not None}
@@ -1,13 +1,38 @@
 """Abstract class for data store service."""
 
+import hashlib
 from abc import ABC, abstractmethod
 
 from contactlookup.models.contact import Contact
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup, ContactLookupResult
+from contactlookup.models.stats import (
+    CacheStats,
+    IndexStats,
+    IngestStats,
+    ReloadStats,
+)
+from contactlookup.serialization import encode_contact
+
+
+def dataset_version(*parts: object) -> str:
+    """Get a short version string from the values that identify a dataset,
+    e.g. the size and modification time of its file."""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:16]
 
 
 class DataStoreService(ABC):
     """Abstract class for data store service."""
 
+    # True if the lookups block on I/O, so that the async routes run them in
+    # a worker thread instead of on the event loop.
+    blocking: bool = False
+    # The lookups that scan all the contacts. The async routes run them in a
+    # worker thread too, so that they do not stall the other requests.
+    scan_methods: frozenset[str] = frozenset(
+        ["filter_contacts", "get_contacts_by_phonetic_name"],
+    )
+
     @abstractmethod
     def initialize(self) -> bool:
         """Initialize data store."""
@@ -17,28 +42,166 @@ class DataStoreService(ABC):
         """Get contact by ID."""
 
     @abstractmethod
-    def get_contacts(self) -> list[Contact]:
-        """Get all contacts."""
+    def get_contacts(self, after: int = 0, limit: int | None = None) -> list[Contact]:
+        """Get all contacts, sorted by ID.
+
+        Only the contacts with an ID greater than `after` are returned, and at
+        most `limit` of them if it is not None.
+        """
 
     @abstractmethod
     def get_contacts_by_fname(self, fname: str) -> list:
         """Get contacts by first name."""
 
+    @abstractmethod
+    def get_contacts_by_fname_prefix(
+        self,
+        prefix: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name starts with a prefix, sorted by first
+        name and ID, like `get_contacts_by_fname_range`."""
+
+    @abstractmethod
+    def get_contacts_by_fname_range(
+        self,
+        start: str,
+        end: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name is between start (inclusive) and end
+        (exclusive), sorted by first name and ID.
+
+        Only the contacts after the (first name, ID) `after` are returned, and
+        at most `limit` of them, like `get_contacts`.
+        """
+
+    @abstractmethod
+    def get_contacts_by_lname(self, lname: str) -> list:
+        """Get contacts by last name."""
+
+    @abstractmethod
+    def get_contacts_by_lname_prefix(self, prefix: str) -> list:
+        """Get contacts whose last name starts with a prefix."""
+
+    @abstractmethod
+    def get_contacts_by_full_name(self, fname: str, lname: str) -> list:
+        """Get contacts by first and last name."""
+
     @abstractmethod
     def get_contacts_by_phone_number(self, phone_number: str) -> list:
         """Get contacts by phone number."""
 
+    @abstractmethod
+    def get_contacts_by_phone_number_suffix(self, suffix: str) -> list:
+        """Get contacts with a phone number that ends with some digits."""
+
+    @abstractmethod
+    def get_contacts_by_phone_number_containing(self, digits: str) -> list:
+        """Get contacts with a phone number that contains some digits."""
+
     @abstractmethod
     def get_contacts_by_email(self, email: str) -> list:
         """Get contacts by email."""
 
     @abstractmethod
-    def get_contacts_by_country(self, country: str) -> list:
-        """Get contacts by country."""
+    def get_contacts_by_phonetic_name(self, name: str) -> list:
+        """Get the contacts whose first or last name sounds like each word of
+        a name."""
 
     @abstractmethod
-    def get_contacts_by_state(self, state: str) -> list:
-        """Get contacts by state."""
+    def get_contacts_by_fuzzy_name(self, name: str, limit: int = 10) -> list:
+        """Get the contacts whose names best match a name with typos, best
+        match first."""
+
+    @abstractmethod
+    def search_contacts(self, query: str, limit: int = 10) -> list:
+        """Get the contacts that have all the words of a query in any of
+        their fields, best match first."""
+
+    @abstractmethod
+    def get_contacts_by_country(
+        self,
+        country: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by country, sorted by ID, like `get_contacts`."""
+
+    @abstractmethod
+    def get_contacts_by_state(
+        self,
+        state: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by state, sorted by ID, like `get_contacts`."""
+
+    @abstractmethod
+    def filter_contacts(
+        self,
+        contact_filter: ContactFilter,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get the contacts that match all the conditions of a filter, sorted
+        by ID, like `get_contacts`."""
+
+    def lookup_contacts(self, lookup: ContactLookup) -> ContactLookupResult:
+        """Get the contacts of many phone numbers, emails and first names at
+        once.
+
+        This runs one lookup per distinct value. Data stores override it to
+        look up all the values of a kind together.
+        """
+        result = ContactLookupResult()
+        for phone_number in dict.fromkeys(lookup.phone_numbers):
+            result.add(
+                result.phone_numbers,
+                phone_number,
+                self.get_contacts_by_phone_number(phone_number),
+            )
+        for email in dict.fromkeys(lookup.emails):
+            result.add(result.emails, email, self.get_contacts_by_email(email))
+        for fname in dict.fromkeys(lookup.first_names):
+            result.add(result.first_names, fname, self.get_contacts_by_fname(fname))
+        return result
+
+    def get_dataset_version(self) -> str | None:
+        """Get the version of the loaded contacts.
+
+        The version changes whenever the contacts or the order in which they
+        are returned may have changed. None if the data store cannot tell, and
+        then the responses are never cached.
+        """
+        return None
+
+    def get_contact_json(self, contact: Contact) -> bytes:
+        """Get the JSON of a contact returned by this data store.
+
+        Data stores that keep their contacts in memory can cache it.
+        """
+        return encode_contact(contact)
+
+    def get_ingest_stats(self) -> IngestStats | None:
+        """Get the durations of the stages of the last load of the contacts,
+        or None if the data store does not measure them."""
+        return None
+
+    def get_reload_stats(self) -> ReloadStats | None:
+        """Get the statistics of the reloads of the contacts file, or None if
+        the data store does not reload it."""
+        return None
+
+    def get_index_stats(self) -> list[IndexStats]:
+        """Get the size of each index of the loaded contacts."""
+        return []
+
+    def get_cache_stats(self) -> list[CacheStats]:
+        """Get the hits and misses of each cache of the data store."""
+        return []
 
     # Write operations are not needed for this project
     # @abstractmethod
@@ -0,0 +1,924 @@
+"""SQLite data store service.
+
+The contacts of a VCF file are ingested once into a SQLite database, and every
+lookup is a query against it, so the address book does not have to fit in
+memory. The database is kept next to the VCF file (contacts.vcf.sqlite) by
+default. On the next start it is opened as is, without reading the VCF file,
+if the file still has the size and modification time it had when the
+database was built.
+
+Database layout:
+* contacts: one row per contact, where the primary key is the contact ID.
+* phone_numbers, emails, addresses: the child records of the contacts, in
+    the order they appear in the VCF file.
+* name_terms, name_trigrams: the terms of the first, last, other and nick
+    names of the contacts, and the trigrams of each distinct term, for fuzzy
+    name searches.
+* phonetic_names: the Soundex keys of the first and last names of the
+    contacts, for sound-alike lookups.
+* contacts_text: an FTS5 table of the tokens of all the fields of each
+    contact, where the rowid is the contact ID, for full-text searches.
+* metadata: the schema version, and the size and modification time of the
+    VCF file the database was built from.
+
+Indexes are created on the first name, phone number, email, state and country,
+and on the contact ID of the child tables. Emails are indexed in lowercase,
+since they are matched in any case. The phone numbers are also stored
+with their digits reversed, so that the numbers ending with some digits are a
+range scan of an index. The numbers containing some digits are a full scan of
+the phone numbers.
+
+A fuzzy name search counts the shared trigrams of the candidate terms in SQL.
+The edit distances of the candidates and the ranking of their contacts are
+computed in Python, like in the trigram index of the file data store.
+Full-text searches are ranked by the BM25 function of FTS5, with the same
+parameters as the text index of the file data store.
+
+The database uses WAL mode, so readers never block each other. Each thread
+uses its own connection, since a SQLite connection must not be used by two
+threads at the same time.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+from contactlookup.definitions import VCF_EXTENSION
+from contactlookup.indexes.name_index import prefix_successor
+from contactlookup.indexes.phonetic import contact_phonetic_keys, phonetic_keys
+from contactlookup.indexes.text_index import contact_tokens, tokenize
+from contactlookup.indexes.trigram_index import (
+    contact_name_terms,
+    default_max_distance,
+    match_terms,
+    min_shared_trigrams,
+    name_terms,
+    rank_matches,
+    trigrams,
+)
+from contactlookup.models.address import Address
+from contactlookup.models.contact import Contact
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup, ContactLookupResult
+from contactlookup.models.email import Email
+from contactlookup.models.phone_number import PhoneNumber
+from contactlookup.services.data_store_service import DataStoreService, dataset_version
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+DATABASE_SUFFIX = ".sqlite"
+# Bump when the schema changes, so that databases built by an older version
+# are rebuilt instead of being opened.
+SCHEMA_VERSION = 9
+# Number of contacts inserted with each executemany call.
+INSERT_BATCH_SIZE = 10000
+# Number of values bound to each query of a bulk lookup, well below the
+# maximum number of parameters of a statement.
+LOOKUP_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE contacts (
+    id INTEGER PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    other_names TEXT,
+    company TEXT,
+    title TEXT,
+    nickname TEXT,
+    birthday TEXT
+);
+CREATE TABLE phone_numbers (
+    contact_id INTEGER NOT NULL,
+    number TEXT NOT NULL,
+    reversed_number TEXT NOT NULL,
+    type TEXT
+);
+CREATE TABLE emails (
+    contact_id INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    type TEXT
+);
+CREATE TABLE addresses (
+    contact_id INTEGER NOT NULL,
+    street TEXT NOT NULL,
+    city TEXT,
+    state TEXT,
+    postal_code TEXT,
+    type TEXT,
+    country TEXT
+);
+CREATE TABLE name_terms (
+    term TEXT NOT NULL,
+    contact_id INTEGER NOT NULL
+);
+CREATE TABLE name_trigrams (
+    trigram TEXT NOT NULL,
+    term TEXT NOT NULL
+);
+CREATE TABLE phonetic_names (
+    key TEXT NOT NULL,
+    contact_id INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE contacts_text USING fts5(
+    text,
+    tokenize = "unicode61 remove_diacritics 0"
+);
+"""
+
+# Created after the contacts are inserted, which is faster than updating the
+# indexes on every insert.
+_INDEXES = """
+CREATE INDEX contacts_by_name ON contacts (first_name, id);
+CREATE INDEX contacts_by_last_name ON contacts (last_name, first_name, id);
+CREATE INDEX phone_numbers_by_number ON phone_numbers (number);
+CREATE INDEX phone_numbers_by_reversed_number ON phone_numbers (reversed_number);
+CREATE INDEX phone_numbers_by_contact ON phone_numbers (contact_id);
+CREATE INDEX emails_by_email ON emails (lower(email));
+CREATE INDEX emails_by_contact ON emails (contact_id);
+CREATE INDEX addresses_by_state ON addresses (state, contact_id);
+CREATE INDEX addresses_by_country ON addresses (country, contact_id);
+CREATE INDEX addresses_by_contact ON addresses (contact_id);
+CREATE INDEX phonetic_names_by_key ON phonetic_names (key, contact_id);
+CREATE INDEX name_terms_by_term ON name_terms (term, contact_id);
+CREATE INDEX name_trigrams_by_trigram ON name_trigrams (trigram, term);
+"""
+
+_CONTACT_COLUMNS = (
+    "id, first_name, last_name, other_names, company, title, nickname, birthday"
+)
+_ORDER_BY_ID = "id"
+_ORDER_BY_NAME = "first_name, id"
+_ORDER_BY_LAST_NAME = "last_name, first_name, id"
+
+
+def get_database_path(file_path: Path) -> Path:
+    """Get the default database path of a VCF file, e.g. contacts.vcf.sqlite."""
+    return file_path.with_name(file_path.name + DATABASE_SUFFIX)
+
+
+def _connect_read_only(database_path: Path, **kwargs) -> sqlite3.Connection:
+    return sqlite3.connect(
+        database_path.resolve().as_uri() + "?mode=ro",
+        uri=True,
+        **kwargs,
+    )
+
+
+class DatabaseDataStoreService(DataStoreService):
+    """SQLite data store service."""
+
+    # Lookups read the database file
+    blocking = True
+
+    def __init__(self, database_path: Path | None = None, parse_workers: int = 1):
+        self._contacts_file_path: Path | None = None
+        self._validated_file_path: bool = False
+        # Defaults to the path of the contacts file with a .sqlite suffix.
+        self._database_path: Path | None = database_path
+        # Number of processes used to parse the VCF file. 1 parses serially.
+        self._parse_workers: int = max(parse_workers, 1)
+        # One connection per thread. The generation is incremented when the
+        # database is rebuilt, so that threads reopen their connection.
+        self._local = threading.local()
+        self._initialized: bool = False
+        self._generation: int = 0
+        self._version: str | None = None
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+    @property
+    def database_path(self) -> Path | None:
+        """The path of the SQLite database."""
+        if self._database_path is None and self._contacts_file_path is not None:
+            return get_database_path(self._contacts_file_path)
+        return self._database_path
+
+    def set_contacts_file_path(self, file_path: Path):
+        """Set the contacts file path."""
+        if file_path.is_file() and file_path.suffix == VCF_EXTENSION:
+            self._contacts_file_path = file_path
+            self._validated_file_path = True
+
+    def initialize(self) -> bool:
+        """Initialize data store.
+
+        The existing database is used if it was built from the current
+        contacts file. Otherwise, the contacts file is ingested into a new
+        database, which then replaces the existing one.
+        """
+        logger = logging.getLogger(__name__)
+        logger.info("initialize|Initializing database data store.")
+        database_path = self.database_path
+        if (
+            not self._validated_file_path
+            or not self._contacts_file_path
+            or not database_path
+        ):
+            logger.error("initialize|Contacts file path not validated.")
+            return False
+
+        try:
+            file_stat = self._contacts_file_path.stat()
+            expected_metadata = {
+                "schema_version": str(SCHEMA_VERSION),
+                "file_size": str(file_stat.st_size),
+                "file_mtime_ns": str(file_stat.st_mtime_ns),
+            }
+            if self._read_metadata(database_path) == expected_metadata:
+                logger.info("initialize|Using existing database %s", database_path)
+            else:
+                self._build_database(
+                    self._contacts_file_path,
+                    database_path,
+                    expected_metadata,
+                    logger,
+                )
+        except (OSError, sqlite3.Error) as e:
+            logger.error("initialize|Error building database: %s", e)
+            return False
+
+        # Connections to the previous database are reopened on their next use
+        self._generation += 1
+        self._version = dataset_version(
+            type(self).__name__,
+            *expected_metadata.values(),
+        )
+        self._initialized = True
+        logger.info("initialize|Database data store initialized successfully.")
+        return True
+
+    def _read_metadata(self, database_path: Path) -> dict[str, str] | None:
+        """Read the metadata of a database, or None if it is not usable."""
+        if not database_path.is_file():
+            return None
+        try:
+            connection = _connect_read_only(database_path)
+            try:
+                return dict(connection.execute("SELECT key, value FROM metadata"))
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            return None
+
+    def _build_database(
+        self,
+        file_path: Path,
+        database_path: Path,
+        metadata: dict[str, str],
+        logger: logging.Logger,
+    ):
+        """Ingest a VCF file into a new database at `database_path`.
+
+        The database is built in a temporary file, which replaces the
+        existing database once it is complete.
+        """
+        logger.info("_build_database|Building database %s", database_path)
+        tmp_path = database_path.with_name(database_path.name + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+        connection = sqlite3.connect(tmp_path)
+        try:
+            # Nothing to recover if the build is interrupted, so the journal
+            # is not needed while the contacts are inserted.
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.executescript(_SCHEMA)
+            count = self._insert_contacts(connection, self._read_contacts(file_path))
+            connection.executescript(_INDEXES)
+            connection.executemany(
+                "INSERT INTO metadata (key, value) VALUES (?, ?)",
+                metadata.items(),
+            )
+            connection.commit()
+            connection.execute("PRAGMA journal_mode = WAL")
+        finally:
+            connection.close()
+        os.replace(tmp_path, database_path)
+        logger.info("_build_database|Inserted %d contacts.", count)
+
+    def _read_contacts(self, file_path: Path) -> Iterable[Contact]:
+        logger = logging.getLogger(__name__)
+        # Contact IDs are assigned in file order, starting from 1.
+        FileDataStoreService.contact_id = 0
+        if self._parse_workers > 1:
+            return FileDataStoreService.read_vcf_file_parallel(
+                file_path=file_path,
+                logger=logger,
+                workers=self._parse_workers,
+            )
+        return FileDataStoreService.read_vcf_file(file_path=file_path, logger=logger)
+
+    def _insert_contacts(
+        self,
+        connection: sqlite3.Connection,
+        contacts: Iterable[Contact],
+    ) -> int:
+        """Insert contacts in batches. Returns the number of contacts."""
+        count = 0
+        contact_rows: list[tuple] = []
+        phone_number_rows: list[tuple] = []
+        email_rows: list[tuple] = []
+        address_rows: list[tuple] = []
+        name_term_rows: list[tuple] = []
+        name_trigram_rows: list[tuple] = []
+        text_rows: list[tuple] = []
+        phonetic_rows: list[tuple] = []
+        # The terms whose trigrams were inserted
+        seen_terms: set[str] = set()
+
+        def flush():
+            connection.executemany(
+                f"INSERT INTO contacts ({_CONTACT_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                contact_rows,
+            )
+            connection.executemany(
+                "INSERT INTO phone_numbers "
+                "(contact_id, number, reversed_number, type) VALUES (?, ?, ?, ?)",
+                phone_number_rows,
+            )
+            connection.executemany(
+                "INSERT INTO emails (contact_id, email, type) VALUES (?, ?, ?)",
+                email_rows,
+            )
+            connection.executemany(
+                "INSERT INTO addresses "
+                "(contact_id, street, city, state, postal_code, type, country) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                address_rows,
+            )
+            connection.executemany(
+                "INSERT INTO name_terms (term, contact_id) VALUES (?, ?)",
+                name_term_rows,
+            )
+            connection.executemany(
+                "INSERT INTO name_trigrams (trigram, term) VALUES (?, ?)",
+                name_trigram_rows,
+            )
+            connection.executemany(
+                "INSERT INTO contacts_text (rowid, text) VALUES (?, ?)",
+                text_rows,
+            )
+            connection.executemany(
+                "INSERT INTO phonetic_names (key, contact_id) VALUES (?, ?)",
+                phonetic_rows,
+            )
+            contact_rows.clear()
+            phone_number_rows.clear()
+            email_rows.clear()
+            address_rows.clear()
+            name_term_rows.clear()
+            name_trigram_rows.clear()
+            text_rows.clear()
+            phonetic_rows.clear()
+
+        for contact in contacts:
+            contact_rows.append(
+                (
+                    contact.id,
+                    contact.first_name,
+                    contact.last_name,
+                    contact.other_names,
+                    contact.company,
+                    contact.title,
+                    contact.nickname,
+                    contact.birthday,
+                ),
+            )
+            phone_number_rows.extend(
+                (
+                    contact.id,
+                    phone_number.number,
+                    phone_number.number[::-1],
+                    phone_number.type,
+                )
+                for phone_number in contact.phone_numbers
+            )
+            email_rows.extend(
+                (contact.id, email.email, email.type) for email in contact.emails
+            )
+            address_rows.extend(
+                (
+                    contact.id,
+                    address.street,
+                    address.city,
+                    address.state,
+                    address.postal_code,
+                    address.type,
+                    address.country,
+                )
+                for address in contact.addresses
+            )
+            for term in contact_name_terms(contact):
+                name_term_rows.append((term, contact.id))
+                if term not in seen_terms:
+                    seen_terms.add(term)
+                    name_trigram_rows.extend(
+                        (trigram, term) for trigram in trigrams(term)
+                    )
+            text_rows.append((contact.id, " ".join(contact_tokens(contact))))
+            phonetic_rows.extend(
+                (key, contact.id) for key in contact_phonetic_keys(contact)
+            )
+            count += 1
+            if len(contact_rows) >= INSERT_BATCH_SIZE:
+                flush()
+        flush()
+        return count
+
+    def _connection(self) -> sqlite3.Connection | None:
+        """Get the connection of the current thread."""
+        local = self._local
+        if getattr(local, "generation", None) == self._generation:
+            return local.connection
+        database_path = self.database_path
+        if not self._initialized or database_path is None:
+            return None
+        connection = _connect_read_only(
+            database_path,
+            # Only used by this thread, but closed by `close`.
+            check_same_thread=False,
+        )
+        with self._connections_lock:
+            self._connections.append(connection)
+        local.connection = connection
+        local.generation = self._generation
+        return connection
+
+    def close(self):
+        """Close the connections of all the threads."""
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        # Every thread opens a new connection on its next query
+        self._generation += 1
+
+    def _query_contacts(
+        self,
+        where: str = "",
+        params: tuple = (),
+        order_by: str = _ORDER_BY_ID,
+        limit: int | None = None,
+    ) -> list[Contact]:
+        """Get the contacts matching a WHERE clause on the contacts table,
+        with their phone numbers, emails and addresses.
+
+        Only the first `limit` contacts are returned if it is not None.
+        """
+        connection = self._connection()
+        if connection is None:
+            return []
+        ids_query = f"SELECT id FROM contacts {where}"
+        if limit is not None:
+            # Only the rows of the returned contacts are read from the other
+            # tables.
+            where = f"{where} ORDER BY {order_by} LIMIT ?"
+            params = (*params, limit)
+            ids_query = f"SELECT id FROM contacts {where}"
+        else:
+            where = f"{where} ORDER BY {order_by}"
+        contacts: dict[int, Contact] = {
+            row[0]: Contact(*row)
+            for row in connection.execute(
+                f"SELECT {_CONTACT_COLUMNS} FROM contacts {where}",
+                params,
+            )
+        }
+        if not contacts:
+            return []
+
+        for contact_id, number, number_type in connection.execute(
+            "SELECT contact_id, number, type FROM phone_numbers "
+            f"WHERE contact_id IN ({ids_query}) ORDER BY rowid",
+            params,
+        ):
+            contacts[contact_id].add_phone_number(
+                PhoneNumber(number=number, contact_id=contact_id, type=number_type),
+            )
+        for contact_id, email, email_type in connection.execute(
+            "SELECT contact_id, email, type FROM emails "
+            f"WHERE contact_id IN ({ids_query}) ORDER BY rowid",
+            params,
+        ):
+            contacts[contact_id].add_email(
+                Email(email=email, type=email_type, contact_id=contact_id),
+            )
+        for (
+            contact_id,
+            street,
+            city,
+            state,
+            postal_code,
+            address_type,
+            country,
+        ) in connection.execute(
+            "SELECT contact_id, street, city, state, postal_code, type, country "
+            f"FROM addresses WHERE contact_id IN ({ids_query}) ORDER BY rowid",
+            params,
+        ):
+            contacts[contact_id].add_address(
+                Address(
+                    street=street,
+                    city=city,
+                    state=state,
+                    postal_code=postal_code,
+                    contact_id=contact_id,
+                    type=address_type,
+                    country=country,
+                ),
+            )
+        return list(contacts.values())
+
+    def get_dataset_version(self) -> str | None:
+        """Get the version of the loaded contacts."""
+        return self._version
+
+    def get_contact(self, contact_id: int) -> Contact | None:
+        """Get contact by ID."""
+        contacts = self._query_contacts("WHERE id = ?", (contact_id,))
+        return contacts[0] if contacts else None
+
+    def get_contacts(self, after: int = 0, limit: int | None = None) -> list[Contact]:
+        """Get all contacts, sorted by ID."""
+        return self._query_contacts("WHERE id > ?", (after,), limit=limit)
+
+    def get_contacts_by_fname(self, fname: str) -> list:
+        """Get contacts by first name."""
+        return self._query_contacts(
+            "WHERE first_name = ?",
+            (fname.strip().upper(),),
+            order_by=_ORDER_BY_NAME,
+        )
+
+    def get_contacts_by_fname_prefix(
+        self,
+        prefix: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name starts with a prefix, sorted by first
+        name and ID."""
+        prefix = prefix.strip().upper()
+        return self._query_contacts_by_fname(
+            prefix,
+            prefix_successor(prefix),
+            after,
+            limit,
+        )
+
+    def get_contacts_by_fname_range(
+        self,
+        start: str,
+        end: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name is between start (inclusive) and end
+        (exclusive), sorted by first name and ID."""
+        return self._query_contacts_by_fname(
+            start.strip().upper(),
+            end.strip().upper(),
+            after,
+            limit,
+        )
+
+    def _query_contacts_by_fname(
+        self,
+        start: str,
+        end: str | None,
+        after: tuple[str, int] | None,
+        limit: int | None,
+    ) -> list[Contact]:
+        """Get the contacts whose first name is in [start, end), or starts
+        from `start` if `end` is None.
+
+        The page is read from the (first name, ID) index of the contacts, so
+        its cost does not depend on the number of matching contacts.
+        """
+        conditions = ["first_name >= ?"]
+        params: list[str | int] = [start]
+        if end is not None:
+            conditions.append("first_name < ?")
+            params.append(end)
+        if after is not None:
+            conditions.append("(first_name, id) > (?, ?)")
+            params.extend(after)
+        return self._query_contacts(
+            "WHERE " + " AND ".join(conditions),
+            tuple(params),
+            order_by=_ORDER_BY_NAME,
+            limit=limit,
+        )
+
+    def get_contacts_by_lname(self, lname: str) -> list:
+        """Get contacts by last name."""
+        return self._query_contacts(
+            "WHERE last_name = ?",
+            (lname.strip().upper(),),
+            order_by=_ORDER_BY_LAST_NAME,
+        )
+
+    def get_contacts_by_lname_prefix(self, prefix: str) -> list:
+        """Get contacts whose last name starts with a prefix."""
+        prefix = prefix.strip().upper()
+        end = prefix_successor(prefix)
+        if end is None:
+            return self._query_contacts(order_by=_ORDER_BY_LAST_NAME)
+        return self._query_contacts(
+            "WHERE last_name >= ? AND last_name < ?",
+            (prefix, end),
+            order_by=_ORDER_BY_LAST_NAME,
+        )
+
+    def get_contacts_by_full_name(self, fname: str, lname: str) -> list:
+        """Get contacts by first and last name."""
+        return self._query_contacts(
+            "WHERE last_name = ? AND first_name = ?",
+            (lname.strip().upper(), fname.strip().upper()),
+            order_by=_ORDER_BY_LAST_NAME,
+        )
+
+    def get_contacts_by_phone_number(self, phone_number: str) -> list:
+        """Get contacts by phone number."""
+        # Phone numbers are stored with their digits only
+        phone_number = "".join(char for char in phone_number if char.isnumeric())
+        if not phone_number:
+            return []
+        return self._query_contacts(
+            "WHERE id IN (SELECT contact_id FROM phone_numbers WHERE number = ?)",
+            (phone_number,),
+        )
+
+    def get_contacts_by_phone_number_suffix(self, suffix: str) -> list:
+        """Get contacts with a phone number that ends with some digits."""
+        suffix = "".join(char for char in suffix if char.isnumeric())
+        if not suffix:
+            return []
+        # The numbers that end with the suffix start with the reversed suffix
+        # once reversed.
+        start = suffix[::-1]
+        return self._query_contacts(
+            "WHERE id IN (SELECT contact_id FROM phone_numbers "
+            "WHERE reversed_number >= ? AND reversed_number < ?)",
+            (start, prefix_successor(start)),
+        )
+
+    def get_contacts_by_phone_number_containing(self, digits: str) -> list:
+        """Get contacts with a phone number that contains some digits."""
+        digits = "".join(char for char in digits if char.isnumeric())
+        if not digits:
+            return []
+        return self._query_contacts(
+            "WHERE id IN (SELECT contact_id FROM phone_numbers "
+            "WHERE instr(number, ?) > 0)",
+            (digits,),
+        )
+
+    def get_contacts_by_email(self, email: str) -> list:
+        """Get contacts by email."""
+        return self._query_contacts(
+            "WHERE id IN (SELECT contact_id FROM emails WHERE lower(email) = ?)",
+            (email.strip().lower(),),
+        )
+
+    def lookup_contacts(self, lookup: ContactLookup) -> ContactLookupResult:
+        """Get the contacts of many phone numbers, emails and first names at
+        once.
+
+        Each kind of value is looked up with one query per batch of values,
+        and then each contact is fetched once.
+        """
+        result = ContactLookupResult()
+        connection = self._connection()
+        phone_number_keys = {
+            phone_number: "".join(char for char in phone_number if char.isnumeric())
+            for phone_number in lookup.phone_numbers
+        }
+        email_keys = {email: email.strip().lower() for email in lookup.emails}
+        fname_keys = {fname: fname.strip().upper() for fname in lookup.first_names}
+        for matches, keys, query in (
+            (
+                result.phone_numbers,
+                phone_number_keys,
+                "SELECT DISTINCT number, contact_id FROM phone_numbers "
+                "WHERE number IN ({}) ORDER BY contact_id",
+            ),
+            (
+                result.emails,
+                email_keys,
+                "SELECT DISTINCT lower(email), contact_id FROM emails "
+                "WHERE lower(email) IN ({}) ORDER BY contact_id",
+            ),
+            (
+                result.first_names,
+                fname_keys,
+                "SELECT first_name, id FROM contacts "
+                f"WHERE first_name IN ({{}}) ORDER BY {_ORDER_BY_NAME}",
+            ),
+        ):
+            contact_ids: dict[str, list[int]] = {}
+            if connection is not None:
+                for batch in _batches(list(set(keys.values()) - {""})):
+                    for key, contact_id in connection.execute(
+                        query.format(", ".join("?" * len(batch))),
+                        batch,
+                    ):
+                        contact_ids.setdefault(key, []).append(contact_id)
+            for value, key in keys.items():
+                matches[value] = list(contact_ids.get(key, []))
+
+        all_ids = sorted(
+            {
+                contact_id
+                for matches in (result.phone_numbers, result.emails, result.first_names)
+                for ids in matches.values()
+                for contact_id in ids
+            },
+        )
+        for batch in _batches(all_ids):
+            for contact in self._query_contacts(
+                f"WHERE id IN ({', '.join('?' * len(batch))})",
+                tuple(batch),
+            ):
+                result.contacts[contact.id] = contact
+        return result
+
+    def get_contacts_by_phonetic_name(self, name: str) -> list:
+        """Get the contacts whose first or last name sounds like each word of
+        a name."""
+        keys = phonetic_keys(name)
+        if not keys:
+            return []
+        return self._query_contacts(
+            "WHERE "
+            + " AND ".join(
+                ["id IN (SELECT contact_id FROM phonetic_names WHERE key = ?)"]
+                * len(keys),
+            ),
+            tuple(keys),
+        )
+
+    def get_contacts_by_fuzzy_name(self, name: str, limit: int = 10) -> list:
+        """Get the contacts whose names best match a name with typos, best
+        match first."""
+        connection = self._connection()
+        if connection is None:
+            return []
+        matches = []
+        for term in name_terms(name):
+            max_distance = default_max_distance(term)
+            term_trigrams = sorted(trigrams(term))
+            placeholders = ", ".join("?" * len(term_trigrams))
+            candidates = connection.execute(
+                "SELECT term FROM name_trigrams "
+                f"WHERE trigram IN ({placeholders}) "
+                "GROUP BY term HAVING count(*) >= ?",
+                (*term_trigrams, min_shared_trigrams(term, max_distance)),
+            )
+            matches.append(
+                match_terms(term, (row[0] for row in candidates), max_distance),
+            )
+
+        def contact_ids(term: str) -> list[int]:
+            return [
+                row[0]
+                for row in connection.execute(
+                    "SELECT contact_id FROM name_terms WHERE term = ?",
+                    (term,),
+                )
+            ]
+
+        return self._query_ranked_contacts(
+            [contact_id for contact_id, _ in rank_matches(matches, contact_ids, limit)],
+        )
+
+    def search_contacts(self, query: str, limit: int = 10) -> list:
+        """Get the contacts that have all the words of a query in any of
+        their fields, best match first."""
+        connection = self._connection()
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if connection is None or not tokens or limit < 1:
+            return []
+        # Quoted, so that the tokens are never read as FTS5 operators
+        match = " ".join(f'"{token}"' for token in tokens)
+        return self._query_ranked_contacts(
+            [
+                row[0]
+                for row in connection.execute(
+                    "SELECT rowid FROM contacts_text WHERE contacts_text MATCH ? "
+                    "ORDER BY rank, rowid LIMIT ?",
+                    (match, limit),
+                )
+            ],
+        )
+
+    def _query_ranked_contacts(self, contact_ids: list[int]) -> list[Contact]:
+        """Get contacts by ID, in the order of the IDs."""
+        if not contact_ids:
+            return []
+        contacts = {
+            contact.id: contact
+            for contact in self._query_contacts(
+                f"WHERE id IN ({', '.join('?' * len(contact_ids))})",
+                tuple(contact_ids),
+            )
+        }
+        return [
+            contacts[contact_id] for contact_id in contact_ids if contact_id in contacts
+        ]
+
+    def get_contacts_by_country(
+        self,
+        country: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by country, sorted by ID."""
+        return self._query_contacts_by_address("country", country, after, limit)
+
+    def get_contacts_by_state(
+        self,
+        state: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by state, sorted by ID."""
+        return self._query_contacts_by_address("state", state, after, limit)
+
+    def _query_contacts_by_address(
+        self,
+        column: str,
+        value: str,
+        after: int,
+        limit: int | None,
+    ) -> list[Contact]:
+        """Get the contacts with an address field equal to a value.
+
+        The page is read from the (field, contact ID) index of the addresses,
+        so its cost does not depend on the number of matching contacts.
+        """
+        # A negative LIMIT is no limit
+        return self._query_contacts(
+            f"WHERE id IN (SELECT DISTINCT contact_id FROM addresses "
+            f"WHERE {column} = ? AND contact_id > ? ORDER BY contact_id LIMIT ?)",
+            (value.strip().upper(), after, -1 if limit is None else limit),
+        )
+
+    def filter_contacts(
+        self,
+        contact_filter: ContactFilter,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get the contacts that match all the conditions of a filter, sorted
+        by ID."""
+        # The page starts from the primary key, even without any condition
+        conditions = ["id > ?"]
+        params: list[str | int] = [after]
+        # These columns are stored in upper case, like the filter values
+        for column in ("first_name", "last_name", "title"):
+            value = getattr(contact_filter, column)
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if contact_filter.company is not None:
+            conditions.append("upper(company) = ?")
+            params.append(contact_filter.company)
+        if contact_filter.company_contains is not None:
+            conditions.append("instr(upper(company), ?) > 0")
+            params.append(contact_filter.company_contains)
+        if contact_filter.title_contains is not None:
+            conditions.append("instr(title, ?) > 0")
+            params.append(contact_filter.title_contains)
+
+        # The address conditions must be matched by the same address
+        address_conditions: list[str] = []
+        for column in ("city", "state", "country"):
+            value = getattr(contact_filter, column)
+            if value is not None:
+                address_conditions.append(f"{column} = ?")
+                params.append(value)
+        if address_conditions:
+            conditions.append(
+                "id IN (SELECT contact_id FROM addresses WHERE "
+                + " AND ".join(address_conditions)
+                + ")",
+            )
+
+        return self._query_contacts(
+            "WHERE " + " AND ".join(conditions),
+            tuple(params),
+            limit=limit,
+        )
+
+
+def _batches(values: list, size: int = LOOKUP_BATCH_SIZE) -> Iterable[list]:
+    """Split a list into consecutive batches of at most `size` values."""
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
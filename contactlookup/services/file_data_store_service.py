@@ -11,11 +11,24 @@ We want to be able to search by the following criteria:
 Data structures:
 We will save the contacts in different data structures to allow for efficient
 searching by the different criteria. This will be done in the initialize method.
+The data structures are held together by a ContactIndexes object.
 
-* all_contacts: list[Contact] where the index is the contact ID.
-* contacts_by_name: BST where the key is the first name.
-* contacts_by_phone_number: dict where the key is the phone number.
-* contacts_by_email: dict where the key is the email.
+In incremental mode, the fingerprint of each card is kept as well. A reload
+then only parses the cards whose fingerprint is new, and updates the entries
+of the added and removed contacts in a copy of the data structures.
+
+* all_contacts: list[Contact] sorted by contact ID. The index is the contact ID
+    - 1, unless contacts were removed by an incremental reload.
+* contacts_by_name: contacts sorted by first name and ID, and searched with
+    binary search. Supports exact, prefix and range lookups.
+* contacts_by_last_name: contacts sorted by last name, then by first name.
+    Supports last name, full name and last name prefix lookups.
+* contacts_by_phone_number: postings where the key is the phone number, and
+    the value is the IDs of the contacts with that number.
+* phone_number_index: suffix array of the phone numbers, for the lookups of
+    the numbers that end with or contain some digits.
+* contacts_by_email: postings where the key is the lowercase email, and the
+    value is the IDs of the contacts with that email.
 * contacts_by_state: dict where the key is the state, and the value is a list of
     contacts.
 * contacts_by_country: dict where the key is the country, and the value is a list
@@ -23,107 +36,137 @@ searching by the different criteria. This will be done in the initialize method.
 """
 
 import logging
-from collections.abc import Generator
+import threading
+import time
+import weakref
+from bisect import bisect_right
+from collections.abc import Generator, Iterable, Sized
+from itertools import islice, repeat
 from pathlib import Path
 
-import vobject
-
 from contactlookup.definitions import VCF_EXTENSION
+from contactlookup.indexes.contact_indexes import ContactIndexes
+from contactlookup.indexes.name_index import NameIndex
+from contactlookup.indexes.phone_index import PhoneNumberIndex
+from contactlookup.indexes.phonetic import contact_phonetic_keys, phonetic_keys
+from contactlookup.indexes.postings import Postings
 from contactlookup.models.address import Address
 from contactlookup.models.contact import Contact
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup, ContactLookupResult
 from contactlookup.models.email import Email
 from contactlookup.models.phone_number import PhoneNumber
-from contactlookup.services.data_store_service import DataStoreService
-
+from contactlookup.models.stats import (
+    CacheStats,
+    IndexStats,
+    IngestStats,
+    ReloadStats,
+)
+from contactlookup.services.data_store_service import DataStoreService, dataset_version
+from contactlookup.snapshot import (
+    SNAPSHOT_VERSION,
+    FileKey,
+    get_file_key,
+    read_snapshot,
+    write_snapshot,
+)
+from contactlookup.utils import TimedIterator, approximate_size
+from contactlookup.vcf import (
+    extract_vcard_properties,
+    iter_vcard_blocks,
+    split_vcard_ranges,
+    vcard_fingerprint,
+)
 
-class ContactNode:
-    """Contact node for the BST, allowing for multiple contacts with the same key.
 
-    Using a BST allows for O(log n) search time. The key is the first name of
-    the contact. The contacts list contains all the contacts with the same first
-    name. The contacts are sorted by last name. The decision to use the first
-    name as the key is because it is the most common search criteria. Therefore,
-    the height of the tree will be minimized.
-    """
+def _get_type_param(content_line) -> str | None:
+    """Get the TYPE parameter of a vCard property as a comma separated string."""
+    types: list[str] = content_line.params.get("TYPE", [])
+    return ",".join(types) if types else None
 
-    def __init__(self, key: str):
-        self.key = key
-        self.contacts: list[Contact] = []
-        self.left: ContactNode | None = None
-        self.right: ContactNode | None = None
 
-    def add_contact(self, contact: Contact):
-        if contact not in self.contacts:
-            self.contacts.append(contact)
-            self.contacts.sort(key=lambda x: x.last_name)
+class FileDataStoreService(DataStoreService):
+    """File data store service."""
 
+    # Default contact ID. This will be incremented for each contact.
+    contact_id: int = 0
 
-class ContactBST:
-    """Contact Binary Search Tree."""
+    def __init__(
+        self,
+        parse_workers: int = 1,
+        snapshot: bool = False,
+        incremental: bool = False,
+        phonetic: bool = False,
+    ):
+        self._contacts_file_path: Path | None = None
+        self._validated_file_path: bool = False
+        # Number of processes used to parse the VCF file. 1 parses serially.
+        self._parse_workers: int = max(parse_workers, 1)
+        # Load the indexes from a snapshot of the VCF file when it is valid,
+        # and save a new snapshot after parsing the file otherwise.
+        self._use_snapshot: bool = snapshot
+        # Only parse the new and changed cards when the file is reloaded.
+        self._incremental: bool = incremental
+        # Index the Soundex keys of the names. Sound-alike lookups scan all
+        # the contacts otherwise.
+        self._phonetic: bool = phonetic
+        if phonetic:
+            # The sound-alike lookups use the index instead of a scan.
+            self.scan_methods = DataStoreService.scan_methods - {
+                "get_contacts_by_phonetic_name",
+            }
+        # All the indexes are replaced at once when the file is reloaded.
+        self._indexes: ContactIndexes = ContactIndexes()
+        self._reload_lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._stop_watching = threading.Event()
+        # Size and modification time of the contacts file when it was loaded.
+        self._loaded_file_stat: tuple[int, int] | None = None
+        self.reload_stats = ReloadStats()
+        # Durations of the stages of the last successful load
+        self.ingest_stats: IngestStats | None = None
+        # The index stats of a set of indexes, which are measured only once
+        self._index_stats: tuple[weakref.ref, list[IndexStats]] | None = None
 
-    def __init__(self):
-        self.root: ContactNode | None = None
+    @property
+    def all_contacts(self) -> list[Contact]:
+        """All contacts, sorted by contact ID."""
+        return self._indexes.all_contacts
 
-    def insert(self, contact: Contact):
-        if self.root is None:
-            self.root = ContactNode(contact.first_name)
-            self.root.add_contact(contact)
-        else:
-            self._insert(self.root, contact)
-
-    def _insert(self, node: ContactNode, contact: Contact):
-        if node.key == contact.first_name:
-            node.add_contact(contact)
-        elif contact.first_name < node.key:
-            if node.left is None:
-                node.left = ContactNode(contact.first_name)
-                node.left.add_contact(contact)
-            else:
-                self._insert(node.left, contact)
-        else:
-            if node.right is None:
-                node.right = ContactNode(contact.first_name)
-                node.right.add_contact(contact)
-            else:
-                self._insert(node.right, contact)
-
-    def get_contacts_with_fname(self, first_name: str) -> list:
-        if self.root is None:
-            return []
+    @property
+    def contacts_by_name(self) -> NameIndex:
+        """Contacts sorted by first name, then by ID."""
+        return self._indexes.contacts_by_name
 
-        return self._get_contacts_with_fname(self.root, first_name)
+    @property
+    def contacts_by_last_name(self) -> NameIndex:
+        """Contacts sorted by last name, then by first name."""
+        return self._indexes.contacts_by_last_name
 
-    def _get_contacts_with_fname(
-        self,
-        node: ContactNode | None,
-        first_name: str,
-    ) -> list:
-        if node is None:
-            return []
+    @property
+    def contacts_by_phone_number(self) -> Postings:
+        """Contacts by phone number."""
+        return self._indexes.contacts_by_phone_number
 
-        if first_name == node.key:
-            return node.contacts
-        elif first_name < node.key:
-            return self._get_contacts_with_fname(node.left, first_name)
-        else:
-            return self._get_contacts_with_fname(node.right, first_name)
+    @property
+    def phone_number_index(self) -> PhoneNumberIndex:
+        """Phone numbers searchable by suffix and by substring."""
+        return self._indexes.phone_number_index
 
+    @property
+    def contacts_by_email(self) -> Postings:
+        """Contacts by email."""
+        return self._indexes.contacts_by_email
 
-class FileDataStoreService(DataStoreService):
-    """File data store service."""
+    @property
+    def contacts_by_state(self) -> dict[str, list[Contact]]:
+        """Contacts by state."""
+        return self._indexes.contacts_by_state
 
-    # Default contact ID. This will be incremented for each contact.
-    contact_id: int = 0
-
-    def __init__(self):
-        self._contacts_file_path: Path | None = None
-        self._validated_file_path: bool = False
-        self.all_contacts: list[Contact] = []
-        self.contacts_by_name: ContactBST = ContactBST()
-        self.contacts_by_phone_number: dict[str, Contact] = {}
-        self.contacts_by_email: dict[str, Contact] = {}
-        self.contacts_by_state: dict[str, list[Contact]] = {}
-        self.contacts_by_country: dict[str, list[Contact]] = {}
+    @property
+    def contacts_by_country(self) -> dict[str, list[Contact]]:
+        """Contacts by country."""
+        return self._indexes.contacts_by_country
 
     @classmethod
     def parse_contact_dict(cls, contact_dict: dict[str, list]) -> Contact | None:
@@ -196,7 +239,7 @@ class FileDataStoreService(DataStoreService):
                     # Multiple phone numbers can be present
                     for phone in contact_dict[field]:
                         phone_number: str = phone.value
-                        phone_type: str | None = phone.params.get("type")
+                        phone_type: str | None = _get_type_param(phone)
                         phone_numbers.append(
                             PhoneNumber(
                                 number=phone_number,
@@ -208,7 +251,7 @@ class FileDataStoreService(DataStoreService):
                     # Multiple emails can be present
                     for email in contact_dict[field]:
                         email_address: str = email.value
-                        email_type: str | None = email.params.get("type")
+                        email_type: str | None = _get_type_param(email)
                         emails.append(
                             Email(
                                 email=email_address,
@@ -242,7 +285,7 @@ class FileDataStoreService(DataStoreService):
                             if country and country.strip() != "None"
                             else None
                         )
-                        address_type: str | None = address.params.get("type")
+                        address_type: str | None = _get_type_param(address)
                         address_type = address_type.strip() if address_type else None
 
                         addresses.append(
@@ -274,40 +317,140 @@ class FileDataStoreService(DataStoreService):
             cls.contact_id -= 1
             return None
 
+    @classmethod
+    def parse_vcard_block(
+        cls,
+        block: bytes,
+        logger: logging.Logger,
+        fast_path: bool = True,
+    ) -> Contact | None:
+        """Parse the raw bytes of a single vCard.
+
+        The card is read with the fast path extractor, and parsed with vobject
+        only when the fast path rejects it or `fast_path` is False. Returns
+        None if the card is malformed.
+        """
+        try:
+            component_dict: dict[str, list] | None = None
+            if fast_path:
+                component_dict = extract_vcard_properties(block)
+            if component_dict is None:
+                component_dict = _parse_with_vobject(block, logger)
+            if component_dict is None:
+                return None
+            return cls.parse_contact_dict(component_dict)
+        except AttributeError as e:
+            logger.error("parse_vcard_block|AttributeError: %s", e)
+        return None
+
     @classmethod
     def read_vcf_file(
         cls,
         file_path: Path,
         logger: logging.Logger,
+        start: int = 0,
+        end: int | None = None,
+        fast_path: bool = True,
     ) -> Generator[Contact, None, None]:
-        """Read a VCF file and yield contacts."""
-        try:
-            obj = vobject.readComponents(
-                file_path.read_text(encoding="utf-8", errors="ignore"),
-            )
-        except OSError as e:
-            logger.error("read_vcf_file|IOError: %s", e)
-            return
+        """Read a VCF file and yield contacts.
+
+        The file is streamed one vCard at a time, so only a single card is
+        held in memory while it is being parsed. `start` and `end` restrict
+        reading to the cards that begin in that byte range.
 
+        Cards are read with the fast path extractor, and parsed with vobject
+        only when the fast path rejects them or `fast_path` is False.
+        """
+        for _, contact in cls._read_vcf_cards(file_path, logger, start, end, fast_path):
+            yield contact
+
+    @classmethod
+    def _read_vcf_cards(
+        cls,
+        file_path: Path,
+        logger: logging.Logger,
+        start: int = 0,
+        end: int | None = None,
+        fast_path: bool = True,
+        stats: IngestStats | None = None,
+    ) -> Generator[tuple[bytes, Contact], None, None]:
+        """Read a VCF file and yield each contact with its card fingerprint.
+
+        The time spent reading the cards is added to `stats`.
+        """
         logger.info("read_vcf_file|Parsing contacts.")
 
+        blocks = TimedIterator(iter_vcard_blocks(file_path, start=start, end=end))
         try:
-            for component in obj:
-                try:
-                    component_dict: dict[str, list] = dict(component.contents)
-                    contact = cls.parse_contact_dict(component_dict)
-                    if not contact:
-                        continue
-                    yield contact
-                except AttributeError as e:
-                    logger.error("read_vcf_file|AttributeError: %s", e)
+            for block in blocks:
+                contact = cls.parse_vcard_block(block, logger, fast_path=fast_path)
+                if not contact:
                     continue
-        except vobject.base.ParseError as e:
-            logger.error("read_vcf_file|ParseError: %s", e)
+                yield vcard_fingerprint(block), contact
+        except OSError as e:
+            logger.error("read_vcf_file|IOError: %s", e)
             return
         except Exception as e:
             logger.error("read_vcf_file|Error: %s", e)
             return
+        finally:
+            if stats is not None:
+                stats.read_seconds += blocks.seconds
+
+    @classmethod
+    def read_vcf_file_parallel(
+        cls,
+        file_path: Path,
+        logger: logging.Logger,
+        workers: int,
+    ) -> Generator[Contact, None, None]:
+        """Read a VCF file using a pool of processes and yield contacts.
+
+        The file is split into card-aligned byte ranges that are parsed in
+        parallel. Results are consumed in file order, and the contact IDs are
+        reassigned so that they match the IDs assigned by `read_vcf_file`.
+        """
+        for _, contact in cls._read_vcf_cards_parallel(file_path, logger, workers):
+            yield contact
+
+    @classmethod
+    def _read_vcf_cards_parallel(
+        cls,
+        file_path: Path,
+        logger: logging.Logger,
+        workers: int,
+    ) -> Generator[tuple[bytes, Contact], None, None]:
+        """Read a VCF file using a pool of processes and yield each contact
+        with its card fingerprint."""
+        # Use more ranges than workers so that a slow range does not leave
+        # the other workers idle.
+        ranges = split_vcard_ranges(file_path, workers * 4)
+        logger.info(
+            "read_vcf_file_parallel|Parsing %d ranges with %d workers.",
+            len(ranges),
+            workers,
+        )
+        starts = [start for start, _ in ranges]
+        ends = [end for _, end in ranges]
+        # Imported here, because it is slow to import and only used by
+        # parallel parsing.
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for cards in executor.map(
+                    _parse_vcf_range,
+                    repeat(file_path),
+                    starts,
+                    ends,
+                ):
+                    for fingerprint, contact in cards:
+                        cls.contact_id += 1
+                        contact.set_id(cls.contact_id)
+                        yield fingerprint, contact
+        except OSError as e:
+            logger.error("read_vcf_file_parallel|IOError: %s", e)
+            return
 
     def set_contacts_file_path(self, file_path: Path):
         """Set the contacts file path."""
@@ -342,88 +485,625 @@ class FileDataStoreService(DataStoreService):
         except AssertionError as e:
             logger.error("initialize|Error: %s", e)
             return success
-        contacts = self.read_vcf_file(file_path=self._contacts_file_path, logger=logger)
-        if not contacts:
-            logger.error("initialize|No contacts read.")
+        file_stat = self._stat_contacts_file()
+        stats = IngestStats()
+        indexes = self._load_indexes(
+            self._contacts_file_path,
+            logger,
+            file_stat,
+            stats,
+        )
+        if indexes is None:
             return success
+        self._indexes = indexes
+        self._loaded_file_stat = file_stat
+        self.ingest_stats = stats
+
+        success = True
+        logger.info("initialize|File data store initialized successfully.")
+        return success
+
+    def _load_indexes(
+        self,
+        file_path: Path,
+        logger: logging.Logger,
+        file_stat: tuple[int, int] | None,
+        stats: IngestStats,
+        previous: ContactIndexes | None = None,
+    ) -> ContactIndexes | None:
+        """Build a new set of indexes from the contacts file.
+
+        The indexes are loaded from the snapshot of the file instead, if
+        snapshots are enabled and the snapshot is valid. In incremental mode,
+        the `previous` indexes are updated with the cards that changed since
+        they were built. Returns None if the file could not be read or indexed.
+
+        The version of the indexes is derived from `file_stat`, the size and
+        modification time of the file before it was read. Updated indexes
+        derive it from the previous version too, since their contact IDs
+        depend on the previous indexes.
+
+        The durations of the stages of the load are recorded in `stats`. A
+        snapshot is only read.
+        """
+        file_key: FileKey | None = None
+        if self._use_snapshot:
+            try:
+                file_key = get_file_key(file_path)
+            except OSError as e:
+                logger.error("_load_indexes|Error reading contacts file: %s", e)
+                return None
+            start = time.perf_counter()
+            snapshot = read_snapshot(file_path, file_key)
+            snapshot_seconds = time.perf_counter() - start
+            if (
+                isinstance(snapshot, ContactIndexes)
+                and (not self._incremental or snapshot.card_fingerprints is not None)
+                and (
+                    not self._phonetic or snapshot.contacts_by_phonetic_name is not None
+                )
+            ):
+                logger.info("_load_indexes|Contacts loaded from snapshot.")
+                stats.read_seconds = snapshot_seconds
+                return snapshot
+
+        indexes: ContactIndexes | None
+        if (
+            self._incremental
+            and previous is not None
+            and previous.card_fingerprints is not None
+        ):
+            indexes = self._update_indexes(file_path, logger, previous, stats)
+            if indexes is not None and file_stat and previous.version:
+                indexes.version = dataset_version(previous.version, file_stat)
+        else:
+            indexes = self._build_indexes(file_path, logger, stats)
+            if indexes is not None and file_stat:
+                indexes.version = dataset_version(
+                    type(self).__name__,
+                    SNAPSHOT_VERSION,
+                    file_stat,
+                )
+        if indexes is not None and file_key:
+            write_snapshot(file_path, file_key, indexes)
+        return indexes
+
+    def _build_indexes(
+        self,
+        file_path: Path,
+        logger: logging.Logger,
+        stats: IngestStats,
+    ) -> ContactIndexes | None:
+        """Parse the whole contacts file and index all the contacts."""
+        # Contact IDs are assigned in file order, starting from 1.
+        type(self).contact_id = 0
+        cards: Iterable[tuple[bytes, Contact]]
+        if self._parse_workers > 1:
+            cards = self._read_vcf_cards_parallel(
+                file_path=file_path,
+                logger=logger,
+                workers=self._parse_workers,
+            )
+        else:
+            cards = self._read_vcf_cards(
+                file_path=file_path,
+                logger=logger,
+                stats=stats,
+            )
+        if not cards:
+            logger.error("_build_indexes|No contacts read.")
+            return None
         # Index contacts
+        indexes = ContactIndexes(
+            track_fingerprints=self._incremental,
+            phonetic=self._phonetic,
+        )
+        # The cards are read and parsed while they are iterated.
+        timed_cards = TimedIterator(cards)
+        start = time.perf_counter()
         try:
 
-            for contact in contacts:
-                self.all_contacts.append(contact)
-                self.contacts_by_name.insert(contact)
-                for phone_number in contact.phone_numbers:
-                    self.contacts_by_phone_number[phone_number.number] = contact
-                for email in contact.emails:
-                    self.contacts_by_email[email.email] = contact
-                for address in contact.addresses:
-                    if address.state:
-                        if address.state not in self.contacts_by_state:
-                            self.contacts_by_state[address.state] = []
-                        self.contacts_by_state[address.state].append(contact)
-                    if address.country:
-                        if address.country not in self.contacts_by_country:
-                            self.contacts_by_country[address.country] = []
-                        self.contacts_by_country[address.country].append(contact)
+            for fingerprint, contact in timed_cards:
+                indexes.add_contact(contact, fingerprint)
+            # The name index is sorted once, after all the contacts are read.
+            indexes.build()
         except Exception as e:
-            logger.error("initialize|Error indexing contacts: %s", e)
-            return success
+            logger.error("_build_indexes|Error indexing contacts: %s", e)
+            return None
+        stats.parse_seconds = timed_cards.seconds - stats.read_seconds
+        stats.index_seconds = time.perf_counter() - start - timed_cards.seconds
+        return indexes
 
-        success = True
-        logger.info("initialize|File data store initialized successfully.")
-        return success
+    def _update_indexes(
+        self,
+        file_path: Path,
+        logger: logging.Logger,
+        previous: ContactIndexes,
+        stats: IngestStats,
+    ) -> ContactIndexes | None:
+        """Update a copy of the previous indexes with the changed cards.
+
+        Every card of the file is still read and hashed, but only the cards
+        whose fingerprint is not in the previous indexes are parsed. Contacts
+        of unchanged cards are reused as is and keep their IDs, new contacts
+        get new IDs, and contacts whose card is gone are removed.
+        """
+        assert previous.card_fingerprints is not None
+        previous_fingerprints = previous.card_fingerprints
+        # Number of cards seen in the file for each fingerprint. Identical
+        # cards are matched to the previous contacts one to one.
+        seen: dict[bytes, int] = {}
+        new_blocks: list[tuple[bytes, bytes]] = []
+        start = time.perf_counter()
+        try:
+            for block in iter_vcard_blocks(file_path):
+                fingerprint = vcard_fingerprint(block)
+                count = seen.get(fingerprint, 0) + 1
+                seen[fingerprint] = count
+                if count > len(previous_fingerprints.get(fingerprint, ())):
+                    new_blocks.append((fingerprint, block))
+        except OSError as e:
+            logger.error("_update_indexes|IOError: %s", e)
+            return None
+
+        parse_start = time.perf_counter()
+        stats.read_seconds = parse_start - start
+        removed = [
+            (fingerprint, contact)
+            for fingerprint, contacts in previous_fingerprints.items()
+            for contact in contacts[seen.get(fingerprint, 0) :]
+        ]
+        type(self).contact_id = previous.last_contact_id
+        added: list[tuple[bytes, Contact]] = []
+        for fingerprint, block in new_blocks:
+            contact = self.parse_vcard_block(block, logger)
+            if contact:
+                added.append((fingerprint, contact))
+
+        index_start = time.perf_counter()
+        stats.parse_seconds = index_start - parse_start
+        try:
+            indexes = previous.updated(removed, added)
+        except Exception as e:
+            logger.error("_update_indexes|Error indexing contacts: %s", e)
+            return None
+        stats.index_seconds = time.perf_counter() - index_start
+        logger.info(
+            "_update_indexes|Parsed %d changed cards, removed %d contacts.",
+            len(new_blocks),
+            len(removed),
+        )
+        return indexes
+
+    def reload(self) -> bool:
+        """Rebuild the indexes from the contacts file.
+
+        The new indexes are built while the current ones keep serving
+        lookups, and then replace them in a single assignment. A lookup
+        therefore sees either the old or the new contacts, never a mix of both.
+        If the file cannot be read, the current indexes are kept.
+
+        Returns:
+            bool: True if the indexes were rebuilt.
+        """
+        logger = logging.getLogger(__name__)
+        if not self._contacts_file_path:
+            logger.error("reload|Contacts file path not set.")
+            return False
+        with self._reload_lock:
+            start = time.perf_counter()
+            file_stat = self._stat_contacts_file()
+            stats = IngestStats()
+            indexes = self._load_indexes(
+                self._contacts_file_path,
+                logger,
+                file_stat,
+                stats,
+                previous=self._indexes,
+            )
+            duration = time.perf_counter() - start
+            if indexes is None:
+                self.reload_stats.failures += 1
+                logger.error("reload|Reload failed after %.3f seconds.", duration)
+                return False
+            self._indexes = indexes
+            self._loaded_file_stat = file_stat
+            self.ingest_stats = stats
+            self.reload_stats.add(duration)
+        logger.info(
+            "reload|Reloaded %d contacts in %.3f seconds.",
+            len(indexes.all_contacts),
+            duration,
+        )
+        return True
+
+    def _stat_contacts_file(self) -> tuple[int, int] | None:
+        """Get the size and modification time of the contacts file."""
+        if not self._contacts_file_path:
+            return None
+        try:
+            stat = self._contacts_file_path.stat()
+        except OSError:
+            # The file may be in the middle of being replaced
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def start_watching(self, interval: float = 5.0):
+        """Reload the contacts file in the background whenever it changes.
+
+        The file is polled every `interval` seconds. A change is only picked up
+        once the file has stopped changing for one interval, so that a file
+        that is still being written is not loaded.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch,
+            args=(interval,),
+            name="contacts-file-watcher",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop watching the contacts file."""
+        if self._watcher is None:
+            return
+        self._stop_watching.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def _watch(self, interval: float):
+        logger = logging.getLogger(__name__)
+        logger.info("_watch|Watching %s for changes.", self._contacts_file_path)
+        previous = self._stat_contacts_file()
+        while not self._stop_watching.wait(interval):
+            current = self._stat_contacts_file()
+            if (
+                current is not None
+                and current != self._loaded_file_stat
+                and current == previous
+            ):
+                logger.info("_watch|%s changed.", self._contacts_file_path)
+                if not self.reload():
+                    # Do not retry until the file changes again.
+                    self._loaded_file_stat = current
+            previous = current
 
     def get_contact(self, contact_id: int) -> Contact | None:
         """Get contact by ID."""
-        size = len(self.all_contacts)
+        return self._indexes.get_contact(contact_id)
 
-        if (size > 0 and contact_id > 0) and contact_id <= size:
-            return self.all_contacts[contact_id - 1]
-        return None
+    def get_dataset_version(self) -> str | None:
+        """Get the version of the loaded contacts."""
+        return self._indexes.version
+
+    def get_contact_json(self, contact: Contact) -> bytes:
+        """Get the JSON of a contact, encoded once and then cached."""
+        return self._indexes.contact_json.get(contact)
+
+    def get_ingest_stats(self) -> IngestStats | None:
+        """Get the durations of the stages of the last load of the contacts."""
+        return self.ingest_stats
 
-    def get_contacts(self) -> list[Contact]:
-        """Get all contacts."""
-        return self.all_contacts
+    def get_reload_stats(self) -> ReloadStats:
+        """Get the statistics of the reloads of the contacts file."""
+        return self.reload_stats
+
+    def get_index_stats(self) -> list[IndexStats]:
+        """Get the size of each index.
+
+        Measuring the memory walks the whole index, so it is only done once
+        for each set of indexes.
+        """
+        indexes = self._indexes
+        if self._index_stats is not None and self._index_stats[0]() is indexes:
+            return self._index_stats[1]
+        named_indexes: dict[str, Sized | None] = {
+            "all_contacts": indexes.all_contacts,
+            "contacts_by_name": indexes.contacts_by_name,
+            "contacts_by_last_name": indexes.contacts_by_last_name,
+            "contacts_by_phonetic_name": indexes.contacts_by_phonetic_name,
+            "contacts_by_phone_number": indexes.contacts_by_phone_number,
+            "phone_number_index": indexes.phone_number_index,
+            "contacts_by_email": indexes.contacts_by_email,
+            "name_trigram_index": indexes.name_trigram_index,
+            "text_index": indexes.text_index,
+            "contacts_by_state": indexes.contacts_by_state,
+            "contacts_by_country": indexes.contacts_by_country,
+            "card_fingerprints": indexes.card_fingerprints,
+        }
+        stats = [
+            IndexStats(
+                name=name,
+                entries=len(index),
+                memory_bytes=approximate_size(index, exclude=(Contact,)),
+            )
+            for name, index in named_indexes.items()
+            if index is not None
+        ]
+        self._index_stats = (weakref.ref(indexes), stats)
+        return stats
+
+    def get_cache_stats(self) -> list[CacheStats]:
+        """Get the hits and misses of the cache of the JSON of the contacts."""
+        contact_json = self._indexes.contact_json
+        return [CacheStats("contact_json", contact_json.hits, contact_json.misses)]
+
+    def get_contacts(self, after: int = 0, limit: int | None = None) -> list[Contact]:
+        """Get all contacts, sorted by ID."""
+        return _page(self.all_contacts, after, limit)
 
     def get_contacts_by_fname(self, fname: str) -> list:
         """Get contacts by first name."""
-        return self.contacts_by_name.get_contacts_with_fname(fname.upper())
+        return self.contacts_by_name.get(fname.strip().upper())
+
+    def get_contacts_by_fname_prefix(
+        self,
+        prefix: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name starts with a prefix, sorted by first
+        name and ID."""
+        return self.contacts_by_name.prefix(prefix.strip().upper(), after, limit)
+
+    def get_contacts_by_fname_range(
+        self,
+        start: str,
+        end: str,
+        after: tuple[str, int] | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts whose first name is between start (inclusive) and end
+        (exclusive), sorted by first name and ID."""
+        return self.contacts_by_name.range(
+            start.strip().upper(),
+            end.strip().upper(),
+            after,
+            limit,
+        )
+
+    def get_contacts_by_lname(self, lname: str) -> list:
+        """Get contacts by last name."""
+        return self.contacts_by_last_name.get(lname.strip().upper())
+
+    def get_contacts_by_lname_prefix(self, prefix: str) -> list:
+        """Get contacts whose last name starts with a prefix."""
+        return self.contacts_by_last_name.prefix(prefix.strip().upper())
+
+    def get_contacts_by_full_name(self, fname: str, lname: str) -> list:
+        """Get contacts by first and last name."""
+        return self.contacts_by_last_name.get(
+            lname.strip().upper(),
+            fname.strip().upper(),
+        )
 
     def get_contacts_by_phone_number(self, phone_number: str) -> list:
         """Get contacts by phone number."""
-        # Clean up the phone number
-        phone_number = (
-            phone_number.strip()
-            .replace("-", "")
-            .replace(" ", "")
-            .replace("(", "")
-            .replace(")", "")
-            .replace("+", "")
-            .replace(".", "")
+        indexes = self._indexes
+        return indexes.get_contacts(
+            indexes.contacts_by_phone_number.get(_clean_phone_number(phone_number)),
         )
-        # TODO: At some point, we may want to allow for partial matches.
-        contact = self.contacts_by_phone_number.get(phone_number)
-        if contact:
-            return [contact]
-        return []
+
+    def get_contacts_by_phone_number_suffix(self, suffix: str) -> list:
+        """Get contacts with a phone number that ends with some digits."""
+        indexes = self._indexes
+        numbers = indexes.phone_number_index.ending_with(_digits(suffix))
+        return _contacts_of_numbers(indexes, numbers)
+
+    def get_contacts_by_phone_number_containing(self, digits: str) -> list:
+        """Get contacts with a phone number that contains some digits."""
+        indexes = self._indexes
+        numbers = indexes.phone_number_index.containing(_digits(digits))
+        return _contacts_of_numbers(indexes, numbers)
 
     def get_contacts_by_email(self, email: str) -> list:
         """Get contacts by email."""
-        contact = self.contacts_by_email.get(email.strip().lower())
-        if contact:
-            return [contact]
-        return []
+        indexes = self._indexes
+        return indexes.get_contacts(
+            indexes.contacts_by_email.get(email.strip().lower()),
+        )
+
+    def lookup_contacts(self, lookup: ContactLookup) -> ContactLookupResult:
+        """Get the contacts of many phone numbers, emails and first names at
+        once.
+
+        All the values are looked up in the same indexes, even if the file is
+        reloaded meanwhile, and each contact is fetched once.
+        """
+        indexes = self._indexes
+        result = ContactLookupResult()
+        for phone_number in lookup.phone_numbers:
+            result.phone_numbers[phone_number] = list(
+                indexes.contacts_by_phone_number.get(_clean_phone_number(phone_number)),
+            )
+        for email in lookup.emails:
+            result.emails[email] = list(
+                indexes.contacts_by_email.get(email.strip().lower()),
+            )
+        for fname in dict.fromkeys(lookup.first_names):
+            result.add(
+                result.first_names,
+                fname,
+                indexes.contacts_by_name.get(fname.strip().upper()),
+            )
+        contact_ids = {
+            contact_id
+            for matches in (result.phone_numbers, result.emails)
+            for ids in matches.values()
+            for contact_id in ids
+            if contact_id not in result.contacts
+        }
+        for contact in indexes.get_contacts(sorted(contact_ids)):
+            result.contacts[contact.id] = contact
+        return result
 
-    def get_contacts_by_country(self, country: str) -> list:
-        """Get contacts by country."""
+    def get_contacts_by_phonetic_name(self, name: str) -> list:
+        """Get the contacts whose first or last name sounds like each word of
+        a name."""
+        keys = phonetic_keys(name)
+        if not keys:
+            return []
+        indexes = self._indexes
+        postings = indexes.contacts_by_phonetic_name
+        if postings is None:
+            return [
+                contact
+                for contact in indexes.all_contacts
+                if set(keys) <= set(contact_phonetic_keys(contact))
+            ]
+        contact_ids = set(postings.get(keys[0]))
+        for key in keys[1:]:
+            contact_ids.intersection_update(postings.get(key))
+        return indexes.get_contacts(sorted(contact_ids))
+
+    def get_contacts_by_fuzzy_name(self, name: str, limit: int = 10) -> list:
+        """Get the contacts whose names best match a name with typos, best
+        match first."""
+        indexes = self._indexes
+        ranked = indexes.name_trigram_index.search(name, limit)
+        return indexes.get_contacts(contact_id for contact_id, _ in ranked)
+
+    def search_contacts(self, query: str, limit: int = 10) -> list:
+        """Get the contacts that have all the words of a query in any of
+        their fields, best match first."""
+        indexes = self._indexes
+        ranked = indexes.text_index.search(query, limit)
+        return indexes.get_contacts(contact_id for contact_id, _ in ranked)
+
+    def get_contacts_by_country(
+        self,
+        country: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by country, sorted by ID."""
         contacts = self.contacts_by_country.get(country.strip().upper())
         if contacts:
-            return contacts
+            return _page(contacts, after, limit)
         return []
 
-    def get_contacts_by_state(self, state: str) -> list:
-        """Get contacts by state."""
+    def get_contacts_by_state(
+        self,
+        state: str,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get contacts by state, sorted by ID."""
         contacts = self.contacts_by_state.get(state.strip().upper())
         if contacts:
-            return contacts
+            return _page(contacts, after, limit)
         return []
+
+    def filter_contacts(
+        self,
+        contact_filter: ContactFilter,
+        after: int = 0,
+        limit: int | None = None,
+    ) -> list:
+        """Get the contacts that match all the conditions of a filter, sorted
+        by ID.
+
+        This is a scan over the contacts after `after`, which stops once the
+        page is full. The columnar data store service runs the same filters as
+        vectorized scans.
+        """
+        contacts = self.all_contacts
+        matches = (
+            contacts[index]
+            for index in range(_start(contacts, after), len(contacts))
+            if contact_filter.matches(contacts[index])
+        )
+        return list(islice(matches, limit))
+
+
+def _page(contacts: list[Contact], after: int, limit: int | None) -> list[Contact]:
+    """Get the contacts of a list sorted by ID that have an ID greater than
+    `after`, at most `limit` of them.
+
+    The start of the page is found by binary search, so the cost only depends
+    on the size of the page. The whole list is returned without a copy when
+    there is nothing to skip.
+    """
+    start = _start(contacts, after)
+    if limit is None:
+        return contacts[start:] if start else contacts
+    return contacts[start : start + limit]
+
+
+def _start(contacts: list[Contact], after: int) -> int:
+    """Get the index of the first contact of a list sorted by ID that has an ID
+    greater than `after`."""
+    if not after:
+        return 0
+    return bisect_right(contacts, after, key=lambda contact: contact.id)
+
+
+def _clean_phone_number(phone_number: str) -> str:
+    """Remove the separators of a phone number, like the stored phone numbers."""
+    return (
+        phone_number.strip()
+        .replace("-", "")
+        .replace(" ", "")
+        .replace("(", "")
+        .replace(")", "")
+        .replace("+", "")
+        .replace(".", "")
+    )
+
+
+def _digits(phone_number: str) -> str:
+    """Keep the digits of a phone number, like the stored phone numbers."""
+    return "".join(char for char in phone_number if char.isnumeric())
+
+
+def _contacts_of_numbers(indexes: ContactIndexes, numbers: list[str]) -> list:
+    """Get the contacts of some phone numbers, sorted by contact ID."""
+    contact_ids = {
+        contact_id
+        for number in numbers
+        for contact_id in indexes.contacts_by_phone_number.get(number)
+    }
+    return indexes.get_contacts(sorted(contact_ids))
+
+
+def _parse_with_vobject(
+    block: bytes,
+    logger: logging.Logger,
+) -> dict[str, list] | None:
+    """Parse a vCard with vobject, or get None if it is malformed."""
+    # Imported here, because it is slow to import and only parses the cards
+    # that the fast path rejects.
+    import vobject
+
+    try:
+        component = vobject.readOne(block.decode(encoding="utf-8", errors="ignore"))
+    except vobject.base.ParseError as e:
+        # Skip the malformed card, the rest of the file is still usable.
+        logger.error("parse_vcard_block|ParseError: %s", e)
+        return None
+    return dict(component.contents)
+
+
+def _parse_vcf_range(
+    file_path: Path,
+    start: int,
+    end: int,
+) -> list[tuple[bytes, Contact]]:
+    """Parse the cards in a byte range of a VCF file in a worker process.
+
+    The contact IDs are local to the range, and are reassigned by the parent
+    process once the results of all the ranges are merged.
+    """
+    FileDataStoreService.contact_id = 0
+    logger = logging.getLogger(__name__)
+    return list(
+        FileDataStoreService._read_vcf_cards(
+            file_path=file_path,
+            logger=logger,
+            start=start,
+            end=end,
+        ),
+    )
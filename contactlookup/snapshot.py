@@ -0,0 +1,153 @@
+"""Persisted snapshots of the contact indexes.
+
+Parsing a large VCF file takes minutes. A snapshot saves the parsed contacts
+and their indexes next to the VCF file, so that the next start can load them
+instead of parsing the file again. A snapshot is only used if the VCF file
+still has the size, modification time and content hash that it had when the
+snapshot was written.
+
+Snapshot file layout:
+    magic (6 bytes) | version (2 bytes) | header length (4 bytes) |
+    JSON header (file key) | pickled payload
+
+Snapshots are pickled, so they must only be read from a trusted directory,
+which is also where the contacts file itself comes from.
+"""
+
+import gc
+import hashlib
+import json
+import logging
+import os
+import pickle
+import struct
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+SNAPSHOT_SUFFIX = ".snapshot"
+# Bump when the layout of the pickled payload changes, so that snapshots
+# written by an older version are rebuilt instead of being loaded.
+SNAPSHOT_VERSION = 11
+
+_MAGIC = b"CLSNAP"
+_PREAMBLE = struct.Struct(">HI")
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileKey:
+    """Identifies the exact content of a file."""
+
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+def get_file_key(file_path: Path) -> FileKey:
+    """Get the key of a file. The whole file is read to compute its hash."""
+    stat = file_path.stat()
+    digest = hashlib.sha256()
+    with file_path.open("rb") as file:
+        while chunk := file.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return FileKey(
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha256=digest.hexdigest(),
+    )
+
+
+def get_snapshot_path(file_path: Path) -> Path:
+    """Get the path of the snapshot of a file, e.g. contacts.vcf.snapshot."""
+    return file_path.with_name(file_path.name + SNAPSHOT_SUFFIX)
+
+
+def write_snapshot(file_path: Path, key: FileKey, payload: Any) -> bool:
+    """Write the snapshot of a file.
+
+    The snapshot is written to a temporary file first and then renamed, so a
+    reader never sees a partially written snapshot.
+
+    Args:
+        file_path (Path): The path of the file the payload was built from.
+        key (FileKey): The key of the file when the payload was built.
+        payload (Any): The picklable payload.
+
+    Returns:
+        bool: True if the snapshot was written.
+    """
+    logger = logging.getLogger(__name__)
+    snapshot_path = get_snapshot_path(file_path)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    header = json.dumps(asdict(key)).encode("utf-8")
+    try:
+        with tmp_path.open("wb") as snapshot_file:
+            snapshot_file.write(_MAGIC)
+            snapshot_file.write(_PREAMBLE.pack(SNAPSHOT_VERSION, len(header)))
+            snapshot_file.write(header)
+            pickle.dump(payload, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except (OSError, pickle.PicklingError) as e:
+        logger.error("write_snapshot|Error writing snapshot %s: %s", snapshot_path, e)
+        tmp_path.unlink(missing_ok=True)
+        return False
+    logger.info("write_snapshot|Snapshot written to %s", snapshot_path)
+    return True
+
+
+def read_snapshot(file_path: Path, key: FileKey) -> Any | None:
+    """Read the snapshot of a file.
+
+    Args:
+        file_path (Path): The path of the file the snapshot was built from.
+        key (FileKey): The current key of the file.
+
+    Returns:
+        Any | None: The payload, or None if there is no snapshot, or if the
+            snapshot was built from a different version of the file.
+    """
+    logger = logging.getLogger(__name__)
+    snapshot_path = get_snapshot_path(file_path)
+    if not snapshot_path.is_file():
+        return None
+
+    try:
+        with snapshot_path.open("rb") as snapshot_file:
+            if snapshot_file.read(len(_MAGIC)) != _MAGIC:
+                logger.warning("read_snapshot|%s is not a snapshot.", snapshot_path)
+                return None
+            version, header_length = _PREAMBLE.unpack(
+                snapshot_file.read(_PREAMBLE.size),
+            )
+            if version != SNAPSHOT_VERSION:
+                logger.info("read_snapshot|Snapshot version %d is outdated.", version)
+                return None
+            snapshot_key = FileKey(**json.loads(snapshot_file.read(header_length)))
+            if snapshot_key != key:
+                logger.info("read_snapshot|Snapshot is stale, the file has changed.")
+                return None
+
+            # Loading millions of objects is much faster without the cyclic
+            # garbage collector running in the middle of it.
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                payload = pickle.load(snapshot_file)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+    except (
+        OSError,
+        EOFError,
+        ValueError,
+        TypeError,
+        AttributeError,
+        ImportError,
+        struct.error,
+        pickle.UnpicklingError,
+    ) as e:
+        logger.error("read_snapshot|Error reading snapshot %s: %s", snapshot_path, e)
+        return None
+    logger.info("read_snapshot|Snapshot loaded from %s", snapshot_path)
+    return payload
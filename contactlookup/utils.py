@@ -1,10 +1,19 @@
 """Utility functions for the Contact Lookup application."""
 
-import logging.config
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from itertools import islice
 from pathlib import Path
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import TypeVar
 
 from contactlookup.definitions import APP_LOG_FILENAME, LOGGING_CONFIG_PATH
 
+T = TypeVar("T")
+# Shared by the whole app, so not counted in the size of an object
+_NOT_WALKED = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
 
 def split_unix_path_string(path_string: str) -> list[str]:
     """Breaks a Unix path string into a list of path components.
@@ -21,8 +30,77 @@ def split_unix_path_string(path_string: str) -> list[str]:
     return path_string.split("/")
 
 
+class TimedIterator(Iterator[T]):
+    """Iterate over an iterable, and sum the time spent getting its items."""
+
+    def __init__(self, iterable: Iterable[T]):
+        self._iterator: Iterator[T] = iter(iterable)
+        self.seconds: float = 0.0
+
+    def __next__(self) -> T:
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def approximate_size(
+    value,
+    exclude: tuple[type, ...] = (),
+    sample: int = 5000,
+) -> int:
+    """Get the approximate memory of an object and of all the objects that it
+    references, in bytes.
+
+    Each object is counted once. The objects of the `exclude` types are not
+    counted nor walked, nor are classes, modules and functions. Only about
+    `sample` items of a large container are walked, and their size is scaled
+    to all the items of the container.
+    """
+    size = 0.0
+    seen: set[int] = set()
+    stack: list[tuple[object, float]] = [(value, 1.0)]
+    while stack:
+        value, weight = stack.pop()
+        if id(value) in seen or isinstance(value, exclude + _NOT_WALKED):
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value) * weight
+        if isinstance(value, (str, bytes, int, float)):
+            continue
+        items: Iterable
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = value
+        else:
+            if hasattr(value, "__dict__"):
+                stack.append((vars(value), weight))
+            for cls in type(value).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(value, slot):
+                        stack.append((getattr(value, slot), weight))
+            continue
+        if not items:
+            continue
+        step = max(len(items) // sample, 1)
+        item_weight = weight * len(items) / -(-len(items) // step)
+        for item in islice(items, 0, None, step):
+            if isinstance(value, dict):
+                stack.append((item[0], item_weight))
+                stack.append((item[1], item_weight))
+            else:
+                stack.append((item, item_weight))
+    return round(size)
+
+
 def initialize_application_logger():
     """Initializes the application logger."""
+    # Imported here, because logging.config imports the modules of all the
+    # handlers.
+    import logging.config
+
     # If an /app directory is not present, we use $HOME as the log directory.
     # If an /app directory is present, we use /app as the log directory.
     _default_log_dir = Path("/app")
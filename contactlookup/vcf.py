@@ -0,0 +1,318 @@
+"""Streaming helpers for reading VCF files.
+
+A VCF export is a sequence of BEGIN:VCARD ... END:VCARD blocks. Instead of
+reading the whole file into a single string, the helpers in this module read
+the file line by line through a buffered reader and yield one card at a time.
+Memory use is therefore bound by the largest card and not by the file size.
+
+`extract_vcard_properties` is a fast path for parsing a card. It only reads
+the properties used to build a `Contact`, and is much cheaper than building a
+full `vobject` component. Cards it cannot handle are left to `vobject`.
+
+`vcard_fingerprint` identifies the raw content of a card, so that a card that
+did not change between two versions of a file does not have to be parsed again.
+"""
+
+import hashlib
+import quopri
+import re
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any, NamedTuple
+
+BEGIN_VCARD = b"BEGIN:VCARD"
+END_VCARD = b"END:VCARD"
+
+
+def iter_vcard_blocks(
+    file_path: Path,
+    start: int = 0,
+    end: int | None = None,
+) -> Generator[bytes, None, None]:
+    """Yield the raw bytes of each vCard in a VCF file.
+
+    Each yielded block starts with its BEGIN:VCARD line and ends with its
+    END:VCARD line. Text outside of a card is skipped. Nested cards (e.g. the
+    vCard 2.1 AGENT property) are kept inside their parent card.
+
+    Args:
+        file_path (Path): The path to the VCF file.
+        start (int, optional): Byte offset to start reading from. Defaults to 0.
+        end (int | None, optional): Only cards that begin before this byte
+            offset are yielded. A card that begins before `end` is always read
+            to completion. Defaults to None (read to the end of the file).
+
+    Yields:
+        bytes: The raw bytes of a single vCard.
+    """
+    with file_path.open("rb") as vcf_file:
+        if start:
+            vcf_file.seek(start)
+        position = start
+        depth = 0
+        card_lines: list[bytes] = []
+        for line in vcf_file:
+            line_start = position
+            position += len(line)
+            marker = line.strip().upper()
+            if depth == 0:
+                if marker != BEGIN_VCARD:
+                    # Text between cards is ignored.
+                    continue
+                if end is not None and line_start >= end:
+                    return
+            card_lines.append(line)
+            if marker == BEGIN_VCARD:
+                depth += 1
+            elif marker == END_VCARD:
+                depth -= 1
+                if depth == 0:
+                    yield b"".join(card_lines)
+                    card_lines = []
+
+
+def split_vcard_ranges(file_path: Path, parts: int) -> list[tuple[int, int]]:
+    """Split a VCF file into byte ranges that start on a BEGIN:VCARD line.
+
+    The file is cut into `parts` roughly equal pieces, and each cut is moved
+    forward to the next BEGIN:VCARD line of a top-level card, so that no card
+    straddles two ranges. Each range can then be read with
+    `iter_vcard_blocks(file_path, start, end)`, which gives the same cards as
+    reading the whole file.
+
+    The lines of the file are scanned to track the nesting of the cards
+    (vCard 2.1 AGENT), but not parsed.
+
+    Args:
+        file_path (Path): The path to the VCF file.
+        parts (int): The desired number of ranges.
+
+    Returns:
+        list[tuple[int, int]]: Non-empty (start, end) byte ranges in file order.
+    """
+    size = file_path.stat().st_size
+    if parts <= 1 or size == 0:
+        return [(0, size)]
+
+    cuts = [size * part // parts for part in range(1, parts)]
+    boundaries = [0]
+    with file_path.open("rb") as vcf_file:
+        position = 0
+        depth = 0
+        for line in vcf_file:
+            line_start = position
+            position += len(line)
+            marker = line.strip().upper()
+            if marker == BEGIN_VCARD:
+                if depth == 0 and line_start >= cuts[0] and line_start > 0:
+                    boundaries.append(line_start)
+                    # Drop the cuts that this boundary already covers
+                    cuts = [cut for cut in cuts if cut > line_start]
+                    if not cuts:
+                        break
+                depth += 1
+            elif marker == END_VCARD and depth > 0:
+                depth -= 1
+    boundaries.append(size)
+
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start
+    ]
+
+
+def vcard_fingerprint(block: bytes) -> bytes:
+    """Get a hash of the raw bytes of a vCard.
+
+    The content is hashed rather than using the UID property, since an edited
+    card usually keeps its UID, and many exports do not include a UID at all.
+    """
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+class VCardProperty(NamedTuple):
+    """A property read by the fast path extractor.
+
+    Mirrors the attributes of `vobject.base.ContentLine` that are used when
+    parsing a contact, so both can be handled by the same code.
+    """
+
+    value: Any
+    params: dict[str, list[str]]
+
+
+class VCardAddress(NamedTuple):
+    """The structured value of an ADR property, as in `vobject.vcard.Address`."""
+
+    box: str = ""
+    extended: str = ""
+    street: str = ""
+    city: str = ""
+    region: str = ""
+    code: str = ""
+    country: str = ""
+
+
+# The properties that are read when parsing a contact. Anything else is skipped
+# without being parsed.
+FAST_PATH_PROPERTIES = frozenset(
+    ["FN", "ORG", "TITLE", "NICKNAME", "BDAY", "TEL", "EMAIL", "ADR"],
+)
+
+_ESCAPED_CHAR_RE = re.compile(r"\\(.)")
+_ESCAPED_CHARS = {"n": "\n", "N": "\n"}
+_QUOTED_PARAM_RE = re.compile(r';([^;=]+)(?:=((?:"[^"]*"|[^;"])*))?')
+_QUOTED_HEAD_RE = re.compile(r'(?:[^:"]|"[^"]*")*')
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return _ESCAPED_CHAR_RE.sub(
+        lambda match: _ESCAPED_CHARS.get(match.group(1), match.group(1)),
+        value,
+    )
+
+
+def _split_escaped(value: str, separator: str) -> list[str]:
+    """Split a structured value on unescaped separators and unescape the parts."""
+    if "\\" not in value:
+        return value.split(separator)
+    parts: list[str] = []
+    current: list[str] = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            current.append(char + next(chars, ""))
+        elif char == separator:
+            parts.append(_unescape("".join(current)))
+            current = []
+        else:
+            current.append(char)
+    parts.append(_unescape("".join(current)))
+    return parts
+
+
+def _unfold_lines(text: str) -> Generator[str, None, None]:
+    """Yield the logical lines of a card.
+
+    Folded lines (continuation lines starting with a space or a tab) are joined
+    to the previous line, as are quoted-printable soft line breaks.
+    """
+    logical_line: str | None = None
+    for line in text.splitlines():
+        if logical_line is not None:
+            if line[:1] in (" ", "\t"):
+                logical_line += line[1:]
+                continue
+            if logical_line.endswith("=") and (
+                "QUOTED-PRINTABLE" in logical_line.upper()
+            ):
+                logical_line = logical_line[:-1] + line
+                continue
+            yield logical_line
+        logical_line = line
+    if logical_line is not None:
+        yield logical_line
+
+
+def _parse_params(raw_params: str) -> tuple[dict[str, list[str]], list[str]]:
+    """Parse ";KEY=VALUE,VALUE;SINGLETON" into params and singleton params."""
+    params: dict[str, list[str]] = {}
+    singletonparams: list[str] = []
+    pairs: list[tuple[str, str]]
+    if '"' in raw_params:
+        pairs = _QUOTED_PARAM_RE.findall(raw_params)
+    else:
+        pairs = [
+            (key, values)
+            for key, _, values in (
+                param.partition("=") for param in raw_params.split(";")[1:]
+            )
+        ]
+    for key, values in pairs:
+        if not values:
+            singletonparams.append(key)
+            continue
+        param_list = params.setdefault(key.upper(), [])
+        if values.startswith('"') and values.endswith('"'):
+            param_list.append(values[1:-1])
+        else:
+            param_list.extend(values.split(","))
+    return params, singletonparams
+
+
+def extract_vcard_properties(block: bytes) -> dict[str, list[VCardProperty]] | None:
+    """Read the properties of interest from a single vCard.
+
+    This is a lightweight alternative to `vobject.readOne` that only reads the
+    properties in `FAST_PATH_PROPERTIES`. It handles line unfolding,
+    quoted-printable values, backslash escapes and property parameters.
+
+    Args:
+        block (bytes): The raw bytes of a single vCard.
+
+    Returns:
+        dict[str, list[VCardProperty]] | None: The properties keyed by their
+            lower case name, like `vobject`'s component contents. None if the
+            card uses a feature the fast path does not support, in which case
+            the card should be parsed by `vobject` instead.
+    """
+    text = block.decode(encoding="utf-8", errors="ignore")
+    properties: dict[str, list[VCardProperty]] = {}
+    begin_lines = 0
+    for line in _unfold_lines(text):
+        if not line.strip():
+            continue
+        colon = line.find(":")
+        if colon == -1:
+            return None
+        if '"' in line[:colon]:
+            # A quoted parameter value may contain a colon
+            match = _QUOTED_HEAD_RE.match(line)
+            if match is None or match.end() >= len(line):
+                return None
+            colon = match.end()
+        head, value = line[:colon], line[colon + 1 :]
+        semicolon = head.find(";")
+        name = head if semicolon == -1 else head[:semicolon]
+        # Drop the group prefix, e.g. "item1.TEL"
+        name = name.rpartition(".")[2].strip().upper()
+        if name == "BEGIN":
+            begin_lines += 1
+            if begin_lines > 1:
+                # Nested cards are left to vobject
+                return None
+            continue
+        if name not in FAST_PATH_PROPERTIES:
+            continue
+
+        params: dict[str, list[str]] = {}
+        singletonparams: list[str] = []
+        if semicolon != -1:
+            params, singletonparams = _parse_params(head[semicolon:])
+        encodings = [encoding.upper() for encoding in params.get("ENCODING", [])]
+        if "QUOTED-PRINTABLE" in singletonparams:
+            # vCard 2.1 allows the encoding without the ENCODING= prefix
+            encodings.append("QUOTED-PRINTABLE")
+        if encodings:
+            if any(e not in ("QUOTED-PRINTABLE", "8BIT") for e in encodings):
+                return None
+            params.pop("ENCODING", None)
+            if "QUOTED-PRINTABLE" in encodings:
+                charset = params.get("CHARSET", ["utf-8"])[0]
+                try:
+                    value = quopri.decodestring(value.encode("utf-8")).decode(charset)
+                except (LookupError, UnicodeDecodeError):
+                    return None
+
+        parsed_value: Any
+        if name == "ADR":
+            parsed_value = VCardAddress(*_split_escaped(value, ";")[:7])
+        elif name == "ORG":
+            parsed_value = _split_escaped(value, ";")
+        else:
+            parsed_value = _unescape(value)
+        properties.setdefault(name.lower(), []).append(
+            VCardProperty(parsed_value, params),
+        )
+    return properties
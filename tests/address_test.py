@@ -27,3 +27,16 @@ def test_address(addressfixture):
     assert address.type == TYPE.upper()
     assert address.country == COUNTRY.upper()
     assert address.id is None
+
+
+def test_address_compact_storage():
+    # Build the values at runtime, so they are distinct string objects
+    state = "".join(["c", "a"])
+    other_state = "".join(["C", "A "])
+    address = Address(STREET, CITY, state, ZIP, CONTACT_ID, TYPE, COUNTRY)
+    other_address = Address(STREET, CITY, other_state, ZIP, CONTACT_ID, TYPE, COUNTRY)
+
+    assert not hasattr(address, "__dict__")
+    assert address.state is other_address.state
+    assert address.country is other_address.country
+    assert address.type is other_address.type
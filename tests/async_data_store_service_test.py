@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from functools import wraps
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from contactlookup.definitions import SAMPLE_CONTACTS_DIR, SAMPLE_CONTACTS_FILE
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup
+from contactlookup.services.async_data_store_service import AsyncDataStoreService
+from contactlookup.services.database_data_store_service import (
+    DatabaseDataStoreService,
+)
+from contactlookup.services.file_data_store_service import FileDataStoreService
+from contactlookup.utils import split_unix_path_string
+
+
+def _contacts_file_path(datafiles) -> Path:
+    dir_paths = split_unix_path_string(str(datafiles))
+    return Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+
+
+def _lookup_thread(service, method: str, *args) -> int:
+    """Get the thread that ran a lookup of an async service."""
+    threads = []
+    lookup = getattr(service.service, method)
+
+    @wraps(lookup)
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        return lookup(*args)
+
+    with patch.object(service.service, method, new=record_thread):
+        asyncio.run(getattr(service, method)(*args))
+    return threads[0]
+
+
+def _json_thread(service, contacts: list) -> int:
+    """Get the thread that got the JSON of contacts for an async service."""
+    threads = []
+    get_contact_json = service.service.get_contact_json
+
+    def record_thread(contact):
+        threads.append(threading.get_ident())
+        return get_contact_json(contact)
+
+    with patch.object(service.service, "get_contact_json", new=record_thread):
+        asyncio.run(service.get_contacts_json(contacts))
+    return threads[0]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_async_data_store_service(datafiles):
+    file_service = FileDataStoreService()
+    file_service.set_contacts_file_path(_contacts_file_path(datafiles))
+    assert file_service.initialize() is True
+    database_service = DatabaseDataStoreService()
+    database_service.set_contacts_file_path(_contacts_file_path(datafiles))
+    assert database_service.initialize() is True
+
+    for service in (file_service, database_service):
+        async_service = AsyncDataStoreService(service)
+        contacts = asyncio.run(async_service.get_contacts_by_fname("jeff"))
+        assert contacts == service.get_contacts_by_fname("jeff")
+        assert asyncio.run(async_service.get_contacts_json(contacts)) == [
+            service.get_contact_json(contact) for contact in contacts
+        ]
+        page = asyncio.run(async_service.get_contacts_by_country("usa", 1, 1))
+        assert page == service.get_contacts_by_country("usa", after=1, limit=1)
+        lookup = ContactLookup(emails=["jeffnewman@example.net"])
+        assert asyncio.run(async_service.lookup_contacts(lookup)).emails == {
+            "jeffnewman@example.net": [4],
+        }
+
+    # The in-memory lookups run on the event loop, the database lookups in a
+    # worker thread.
+    main_thread = threading.get_ident()
+    file_async_service = AsyncDataStoreService(file_service)
+    assert (
+        _lookup_thread(file_async_service, "get_contacts_by_fname", "jeff")
+        == main_thread
+    )
+    database_async_service = AsyncDataStoreService(database_service)
+    assert (
+        _lookup_thread(database_async_service, "get_contacts_by_fname", "jeff")
+        != main_thread
+    )
+    database_service.close()
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_async_data_store_service_scans(datafiles):
+    file_service = FileDataStoreService()
+    file_service.set_contacts_file_path(_contacts_file_path(datafiles))
+    assert file_service.initialize() is True
+    phonetic_service = FileDataStoreService(phonetic=True)
+    phonetic_service.set_contacts_file_path(_contacts_file_path(datafiles))
+    assert phonetic_service.initialize() is True
+
+    # The lookups that scan all the contacts run in a worker thread
+    main_thread = threading.get_ident()
+    async_service = AsyncDataStoreService(file_service)
+    contact_filter = ContactFilter(state="CA")
+    assert _lookup_thread(async_service, "filter_contacts", contact_filter) != (
+        main_thread
+    )
+    assert _lookup_thread(async_service, "get_contacts_by_phonetic_name", "jef") != (
+        main_thread
+    )
+    # Unless the phonetic keys are indexed
+    phonetic_async_service = AsyncDataStoreService(phonetic_service)
+    assert (
+        _lookup_thread(phonetic_async_service, "get_contacts_by_phonetic_name", "jef")
+        == main_thread
+    )
+
+    # Only the JSON of many contacts is encoded in a worker thread
+    contacts = file_service.get_contacts()
+    assert _json_thread(async_service, contacts) == main_thread
+    assert _json_thread(async_service, contacts * 100) != main_thread
@@ -0,0 +1,179 @@
+import asyncio
+from dataclasses import asdict
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from starlette.concurrency import run_in_threadpool
+
+from contactlookup.definitions import SAMPLE_CONTACTS_DIR, SAMPLE_CONTACTS_FILE
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup
+from contactlookup.services.async_data_store_service import AsyncDataStoreService
+from contactlookup.services.data_store_service import DataStoreService
+from contactlookup.services.file_data_store_service import FileDataStoreService
+from contactlookup.utils import split_unix_path_string
+
+# NumPy is an optional dependency
+pytest.importorskip("numpy")
+
+from contactlookup.services.columnar_data_store_service import (  # noqa: E402
+    ColumnarDataStoreService,
+)
+
+
+def _services(datafiles) -> tuple[FileDataStoreService, ColumnarDataStoreService]:
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    file_service = FileDataStoreService()
+    file_service.set_contacts_file_path(contacts_file_path)
+    assert file_service.initialize() is True
+    columnar_service = ColumnarDataStoreService()
+    columnar_service.set_contacts_file_path(contacts_file_path)
+    assert columnar_service.initialize() is True
+    return file_service, columnar_service
+
+
+def _ids(contacts) -> list[int]:
+    return [contact.id for contact in contacts]
+
+
+def test_columnar_data_store_service_not_initialized():
+    service = ColumnarDataStoreService()
+
+    assert service.initialize() is False
+    assert service.get_contacts() == []
+    assert service.get_contact(1) is None
+    assert service.get_dataset_version() is None
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_columnar_data_store_service_matches_file_service(datafiles):
+    file_service, service = _services(datafiles)
+    assert service.get_dataset_version() is not None
+    assert service.get_dataset_version() != file_service.get_dataset_version()
+
+    # Contacts are rebuilt from the columns exactly as they were parsed
+    assert [asdict(contact) for contact in service.get_contacts()] == [
+        asdict(contact) for contact in file_service.get_contacts()
+    ]
+    assert asdict(service.get_contact(3)) == asdict(file_service.get_contact(3))
+    assert service.get_contact(0) is None
+    assert service.get_contact(5) is None
+
+    assert _ids(service.get_contacts_by_fname(" jeff ")) == [3, 4]
+    assert _ids(service.get_contacts_by_fname("John")) == []
+    # Sorted by first name and ID, like the file data store service
+    assert _ids(service.get_contacts_by_fname_prefix("k")) == [2, 1]
+    assert _ids(service.get_contacts_by_fname_range("J", "KAZ")) == [3, 4, 2]
+    for paged_service in (service, file_service):
+        prefix = paged_service.get_contacts_by_fname_prefix
+        assert _ids(prefix("", None, 2)) == [3, 4]
+        assert _ids(prefix("", ("JEFF", 3))) == [4, 2, 1]
+        assert _ids(prefix("k", ("JEFF", 3))) == [2, 1]
+        fname_range = paged_service.get_contacts_by_fname_range
+        assert _ids(fname_range("J", "KAZ", ("JEFF", 4), 1)) == [2]
+    assert _ids(service.get_contacts_by_lname("newman")) == [4]
+    assert _ids(service.get_contacts_by_lname_prefix("")) == [1, 2, 3, 4]
+    assert _ids(service.get_contacts_by_lname_prefix("K")) == [2]
+    assert _ids(service.get_contacts_by_full_name(" jeff ", "newman")) == [4]
+    assert _ids(service.get_contacts_by_full_name("karla", "newman")) == []
+    assert _ids(service.get_contacts_by_phone_number("+363-214-4414254")) == [3]
+    assert _ids(service.get_contacts_by_phone_number("---")) == []
+    assert _ids(service.get_contacts_by_phone_number_suffix("414254")) == [3]
+    assert _ids(service.get_contacts_by_phone_number_suffix("8")) == [2]
+    assert _ids(service.get_contacts_by_phone_number_suffix("")) == []
+    assert _ids(service.get_contacts_by_phone_number_containing("88")) == [1, 2]
+    assert _ids(service.get_contacts_by_phone_number_containing("12")) == [2, 4]
+    assert _ids(service.get_contacts_by_phone_number_containing("000")) == []
+    assert _ids(service.get_contacts_by_email("allentaylor@example.net")) == [3]
+    assert _ids(service.get_contacts_by_fuzzy_name("kalra kaufmann")) == [2]
+    assert _ids(service.get_contacts_by_fuzzy_name("jeff newmann")) == [4]
+    assert _ids(service.get_contacts_by_fuzzy_name("jef", limit=1)) == [3]
+    assert _ids(service.get_contacts_by_fuzzy_name("xyz")) == []
+    assert _ids(service.get_contacts_by_phonetic_name("Jeph")) == [3, 4]
+    assert _ids(service.get_contacts_by_phonetic_name("jeff numan")) == [4]
+    assert _ids(service.get_contacts_by_phonetic_name("Karla Newman")) == []
+    assert _ids(service.get_contacts_by_phonetic_name("--")) == []
+    assert _ids(service.search_contacts("usa")) == [4, 1]
+    assert _ids(service.search_contacts("jeff 22957")) == [4, 3]
+    assert _ids(service.search_contacts("south", limit=1)) == [3]
+    assert _ids(service.search_contacts("jeff winnipeg")) == []
+    assert _ids(service.search_contacts("")) == []
+    assert _ids(service.get_contacts_by_state("ca")) == [1, 4]
+    assert _ids(service.get_contacts_by_country("USA")) == [1, 4]
+    assert _ids(service.get_contacts_by_country("Atlantis")) == []
+    assert _ids(service.get_contacts(after=1, limit=2)) == [2, 3]
+    lookup = ContactLookup(
+        phone_numbers=["+363-214-4414254", "---"],
+        emails=["JeffNewman@example.net", "nobody@example.net"],
+        first_names=["jeff", "Karla", "Zed"],
+    )
+    result = service.lookup_contacts(lookup)
+    file_result = file_service.lookup_contacts(lookup)
+    assert result.phone_numbers == file_result.phone_numbers
+    assert result.emails == file_result.emails
+    assert result.first_names == file_result.first_names
+    assert {
+        contact_id: asdict(contact) for contact_id, contact in result.contacts.items()
+    } == {
+        contact_id: asdict(contact)
+        for contact_id, contact in file_result.contacts.items()
+    }
+    # The same matches as the lookups of each value
+    per_value_result = DataStoreService.lookup_contacts(service, lookup)
+    assert result.phone_numbers == per_value_result.phone_numbers
+    assert result.emails == per_value_result.emails
+    assert result.first_names == per_value_result.first_names
+    assert sorted(result.contacts) == sorted(per_value_result.contacts)
+    assert service.lookup_contacts(ContactLookup()).contacts == {}
+    assert _ids(service.get_contacts(after=4)) == []
+    assert _ids(service.get_contacts_by_state("CA", limit=1)) == [1]
+    assert _ids(service.get_contacts_by_country("USA", after=1, limit=1)) == [4]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_columnar_data_store_service_filter_contacts(datafiles):
+    file_service, service = _services(datafiles)
+    filters = [
+        ContactFilter(),
+        ContactFilter(state="CA", company_contains="crescendo"),
+        ContactFilter(first_name="jeff", country="usa"),
+        ContactFilter(company="viagenie"),
+        ContactFilter(title_contains="CEO"),
+        # The state and country must be on the same address
+        ContactFilter(state="MB", country="USA"),
+        ContactFilter(state="MB", country="CA"),
+        ContactFilter(city="Debraview", last_name=""),
+    ]
+
+    expected = [[1, 2, 3, 4], [1], [4], [3], [], [], [1], [3]]
+    assert [_ids(service.filter_contacts(f)) for f in filters] == expected
+    assert [_ids(file_service.filter_contacts(f)) for f in filters] == expected
+    for paged_service in (service, file_service):
+        assert _ids(paged_service.filter_contacts(ContactFilter(), 1, 2)) == [2, 3]
+        assert _ids(paged_service.filter_contacts(ContactFilter(), 3)) == [4]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_columnar_data_store_service_threadpool(datafiles):
+    _, service = _services(datafiles)
+    async_service = AsyncDataStoreService(service)
+
+    # The scans of the columns run in a worker thread
+    with patch(
+        "contactlookup.services.async_data_store_service.run_in_threadpool",
+        wraps=run_in_threadpool,
+    ) as threadpool:
+        contacts = asyncio.run(async_service.get_contacts_by_fname("jeff"))
+    assert _ids(contacts) == [3, 4]
+    threadpool.assert_called_once_with(service.get_contacts_by_fname, "jeff")
+
+    # The lookups by ID do not scan
+    with patch(
+        "contactlookup.services.async_data_store_service.run_in_threadpool",
+        wraps=run_in_threadpool,
+    ) as threadpool:
+        contact = asyncio.run(async_service.get_contact(3))
+    assert contact is not None and contact.id == 3
+    threadpool.assert_not_called()
@@ -1,10 +1,34 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
 
+import contactlookup.controller as app_controller
 from contactlookup.controller import app
+from contactlookup.definitions import SAMPLE_CONTACTS_DIR, SAMPLE_CONTACTS_FILE
+from contactlookup.metrics import RequestMetrics, write_metrics_file
+from contactlookup.models.stats import CacheStats
+from contactlookup.services.file_data_store_service import FileDataStoreService
+from contactlookup.utils import split_unix_path_string
 
 test_api_client = TestClient(app)
 
 
+@pytest.fixture
+def sample_service(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    service = FileDataStoreService()
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+    app_controller.set_data_store_service(service)
+    yield service
+    app_controller.set_data_store_service(None)
+
+
 def test_read_root():
     response = test_api_client.get("/")
     assert response.status_code == 200
@@ -13,4 +37,365 @@ def test_read_root():
     }
 
 
+def test_service_not_set():
+    response = test_api_client.get("/contacts/fname/jeff")
+    assert response.status_code == 200
+    assert response.json() == {"Error": "Data store service not set"}
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_json(sample_service):
+    # The cached JSON of the contacts is the same as FastAPI's encoding
+    response = test_api_client.get("/contacts/state/ca")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {
+        "contacts": jsonable_encoder(sample_service.get_contacts_by_state("ca")),
+        "next_cursor": None,
+    }
+    response = test_api_client.get("/contacts/3")
+    assert response.json() == {
+        "contact": jsonable_encoder(sample_service.get_contact(3)),
+    }
+    assert test_api_client.get("/contacts/9").json() == {"contact": None}
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_conditional_get(sample_service):
+    response = test_api_client.get("/contacts/country/usa")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == f'"{sample_service.get_dataset_version()}"'
+    assert response.headers["cache-control"] == "no-cache"
+    assert "etag" not in test_api_client.get("/").headers
+
+    # The contacts are not read when the client has the current version
+    with patch.object(
+        sample_service,
+        "get_contacts_by_country",
+        side_effect=AssertionError,
+    ):
+        for if_none_match in [etag, f'"other", W/{etag}', "*"]:
+            response = test_api_client.get(
+                "/contacts/country/usa",
+                headers={"If-None-Match": if_none_match},
+            )
+            assert response.status_code == 304
+            assert response.content == b""
+            assert response.headers["etag"] == etag
+
+    response = test_api_client.get(
+        "/contacts/country/usa",
+        headers={"If-None-Match": '"other"'},
+    )
+    assert response.status_code == 200
+    assert len(response.json()["contacts"]) == 2
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_lookup_contacts(sample_service):
+    response = test_api_client.post(
+        "/contacts/lookup",
+        json={
+            "phone_numbers": ["+363-214-4414254"],
+            "emails": ["jeffnewman@example.net", "nobody@example.net"],
+            "first_names": ["Jeff"],
+        },
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["phone_numbers"] == {"+363-214-4414254": [3]}
+    assert result["emails"] == {
+        "jeffnewman@example.net": [4],
+        "nobody@example.net": [],
+    }
+    assert result["first_names"] == {"Jeff": [3, 4]}
+    assert result["contacts"] == {
+        "3": jsonable_encoder(sample_service.get_contact(3)),
+        "4": jsonable_encoder(sample_service.get_contact(4)),
+    }
+
+    response = test_api_client.post(
+        "/contacts/lookup",
+        json={"phone_numbers": ["5550100"] * (app_controller.MAX_LOOKUP_VALUES + 1)},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_pages(sample_service):
+    response = test_api_client.get("/contacts?limit=3")
+    assert response.status_code == 200
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [1, 2, 3]
+    assert page["next_cursor"] == 3
+
+    response = test_api_client.get(f"/contacts?limit=3&cursor={page['next_cursor']}")
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [4]
+    assert page["next_cursor"] is None
+
+    response = test_api_client.get("/contacts/state/ca?limit=1")
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [1]
+    assert page["next_cursor"] == 1
+    response = test_api_client.get("/contacts/state/ca?limit=1&cursor=1")
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [4]
+    assert page["next_cursor"] is None
+
+    assert test_api_client.get("/contacts?limit=0").status_code == 422
+    assert test_api_client.get("/contacts?limit=1001").status_code == 422
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_fname_prefix(sample_service):
+    response = test_api_client.get("/contacts/fname/prefix/k")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["first_name"] for contact in contacts] == ["KARLA", "KRISTEN"]
+
+    # Paged by first name and ID
+    response = test_api_client.get("/contacts/fname/prefix/k?limit=1")
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [2]
+    assert page["next_cursor"] == "KARLA:2"
+    response = test_api_client.get(
+        "/contacts/fname/prefix/k",
+        params={"limit": 1, "cursor": page["next_cursor"]},
+    )
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [1]
+    assert page["next_cursor"] is None
+
+    response = test_api_client.get("/contacts/fname/prefix/k?cursor=KARLA")
+    assert response.status_code == 422
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_fname_range(sample_service):
+    response = test_api_client.get("/contacts/fname/range/jeff/karla")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [3, 4]
+
+    response = test_api_client.get(
+        "/contacts/fname/range/jeff/karla",
+        params={"limit": 1, "cursor": "JEFF:3"},
+    )
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [4]
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_lname_prefix(sample_service):
+    response = test_api_client.get("/contacts/lname/prefix/n")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["last_name"] for contact in contacts] == ["NEWMAN"]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_full_name(sample_service):
+    response = test_api_client.get("/contacts/fullname/jeff/newman")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [4]
+
+
 # TODO: Add more tests for the remaining endpoints
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_phone_number_suffix(sample_service):
+    response = test_api_client.get("/contacts/phone/suffix/4414254")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [3]
+
+    response = test_api_client.get("/contacts/phone/contains/88")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [1, 2]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_fuzzy_name(sample_service):
+    response = test_api_client.get("/contacts/name/fuzzy/krsiten")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [1]
+
+    response = test_api_client.get("/contacts/name/fuzzy/jef", params={"limit": 1})
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [3]
+
+    response = test_api_client.get("/contacts/name/fuzzy/jef", params={"limit": 0})
+    assert response.status_code == 422
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_phonetic_name(sample_service):
+    response = test_api_client.get("/contacts/name/phonetic/kaufmann")
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [2]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_search_contacts(sample_service):
+    response = test_api_client.get("/search", params={"q": "jeff usa"})
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [4]
+
+    response = test_api_client.get("/search", params={"q": "jeff", "limit": 1})
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [4]
+
+    response = test_api_client.get("/search")
+    assert response.status_code == 422
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_contacts_by_filter(sample_service):
+    response = test_api_client.get(
+        "/contacts/filter",
+        params={"state": "ca", "company_contains": "hollywood"},
+    )
+    assert response.status_code == 200
+    contacts = response.json()["contacts"]
+    assert [contact["id"] for contact in contacts] == [4]
+
+    response = test_api_client.get("/contacts/filter?state=ca&limit=1")
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [1]
+    assert page["next_cursor"] == 1
+    response = test_api_client.get("/contacts/filter?state=ca&limit=1&cursor=1")
+    page = response.json()
+    assert [contact["id"] for contact in page["contacts"]] == [4]
+    assert page["next_cursor"] is None
+
+    assert test_api_client.get("/contacts/filter").status_code == 400
+    assert test_api_client.get("/contacts/filter?limit=0&state=ca").status_code == 422
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_metrics(sample_service):
+    app_controller.request_metrics.requests.clear()
+    app_controller.request_metrics.durations.clear()
+    etag = test_api_client.get("/contacts/country/usa").headers["etag"]
+    test_api_client.get("/contacts/country/usa", headers={"If-None-Match": etag})
+    test_api_client.get("/contacts/country/usa")
+    test_api_client.get("/unknown")
+
+    # The metrics are rendered in a worker thread, off the event loop
+    with patch.object(
+        app_controller,
+        "run_in_threadpool",
+        wraps=app_controller.run_in_threadpool,
+    ) as threadpool:
+        response = test_api_client.get("/metrics")
+    threadpool.assert_called_once_with(app_controller._render_metrics)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    # Requests are labeled by route, including the 304 of the middleware
+    route = 'route="/contacts/country/{country}"'
+    assert (
+        f'contactlookup_http_requests_total{{method="GET",{route},status="200"}} 2'
+        in lines
+    )
+    assert (
+        f'contactlookup_http_requests_total{{method="GET",{route},status="304"}} 1'
+        in lines
+    )
+    assert (
+        'contactlookup_http_requests_total{method="GET",route="unmatched",status="404"} 1'
+        in lines
+    )
+    assert (
+        f'contactlookup_http_request_duration_seconds_bucket{{method="GET",{route},le="+Inf"}} 3'
+        in lines
+    )
+    assert (
+        f'contactlookup_http_request_duration_seconds_count{{method="GET",{route}}} 3'
+        in lines
+    )
+    # The statistics of the data store
+    for stage in ("read", "parse", "index"):
+        assert f'contactlookup_ingest_duration_seconds{{stage="{stage}"}}' in (
+            response.text
+        )
+    assert 'contactlookup_index_entries{index="contacts_by_name"} 4' in lines
+    assert 'contactlookup_index_memory_bytes{index="contacts_by_phone_number"}' in (
+        response.text
+    )
+    # The contacts of the second 200 were served from the cache
+    assert (
+        'contactlookup_cache_requests_total{cache="contact_json",result="hit"} 2'
+        in lines
+    )
+    assert (
+        'contactlookup_cache_requests_total{cache="contact_json",result="miss"} 2'
+        in lines
+    )
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_reload_metrics(sample_service):
+    lines = test_api_client.get("/metrics").text.splitlines()
+    assert 'contactlookup_reloads_total{result="success"} 0' in lines
+    assert not any(
+        line.startswith("contactlookup_reload_duration_seconds ") for line in lines
+    )
+
+    assert sample_service.reload() is True
+    with patch.object(sample_service, "_load_indexes", return_value=None):
+        assert sample_service.reload() is False
+
+    lines = test_api_client.get("/metrics").text.splitlines()
+    assert 'contactlookup_reloads_total{result="success"} 1' in lines
+    assert 'contactlookup_reloads_total{result="failure"} 1' in lines
+    duration = sample_service.reload_stats.last_duration_seconds
+    assert f"contactlookup_reload_duration_seconds {duration}" in lines
+    assert f"contactlookup_reload_seconds_total {duration}" in lines
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_read_shared_metrics(sample_service, tmp_path):
+    # The counters written by another worker
+    other_metrics = RequestMetrics()
+    other_metrics.observe("GET", "/contacts/{contact_id}", 200, 0.001)
+    write_metrics_file(tmp_path, other_metrics, [CacheStats("contact_json", 5, 1)])
+    (tmp_path / f"{os.getpid()}.json").rename(tmp_path / "1.json")
+
+    app_controller.request_metrics.requests.clear()
+    app_controller.request_metrics.durations.clear()
+    with patch.object(app_controller, "metrics_dir", tmp_path):
+        test_api_client.get("/contacts/1")
+        response = test_api_client.get("/metrics")
+
+    lines = response.text.splitlines()
+    route = 'route="/contacts/{contact_id}"'
+    assert (
+        f'contactlookup_http_requests_total{{method="GET",{route},status="200"}} 2'
+        in lines
+    )
+    assert (
+        f'contactlookup_http_request_duration_seconds_count{{method="GET",{route}}} 2'
+        in lines
+    )
+    assert (
+        'contactlookup_cache_requests_total{cache="contact_json",result="miss"} 2'
+        in lines
+    )
+    assert (
+        'contactlookup_cache_requests_total{cache="contact_json",result="hit"} 5'
+        in lines
+    )
+    # This worker wrote its counters for the other workers
+    assert (tmp_path / f"{os.getpid()}.json").exists()
@@ -0,0 +1,197 @@
+import sqlite3
+import threading
+from dataclasses import asdict
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from contactlookup.definitions import SAMPLE_CONTACTS_DIR, SAMPLE_CONTACTS_FILE
+from contactlookup.models.contact_filter import ContactFilter
+from contactlookup.models.contact_lookup import ContactLookup
+from contactlookup.services.database_data_store_service import (
+    DatabaseDataStoreService,
+    get_database_path,
+)
+from contactlookup.services.file_data_store_service import FileDataStoreService
+from contactlookup.utils import split_unix_path_string
+
+
+def _contacts_file_path(datafiles) -> Path:
+    dir_paths = split_unix_path_string(str(datafiles))
+    return Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+
+
+def _ids(contacts) -> list[int]:
+    return [contact.id for contact in contacts]
+
+
+@pytest.fixture
+def database_service(datafiles):
+    service = DatabaseDataStoreService()
+    service.set_contacts_file_path(_contacts_file_path(datafiles))
+    assert service.initialize() is True
+    yield service
+    service.close()
+
+
+def test_database_data_store_service_not_initialized():
+    service = DatabaseDataStoreService()
+
+    assert service.initialize() is False
+    assert service.get_contacts() == []
+    assert service.get_contact(1) is None
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_database_data_store_service_matches_file_service(
+    datafiles,
+    database_service,
+):
+    file_service = FileDataStoreService()
+    file_service.set_contacts_file_path(_contacts_file_path(datafiles))
+    assert file_service.initialize() is True
+    service = database_service
+
+    assert [asdict(contact) for contact in service.get_contacts()] == [
+        asdict(contact) for contact in file_service.get_contacts()
+    ]
+    assert asdict(service.get_contact(3)) == asdict(file_service.get_contact(3))
+    assert service.get_contact(0) is None
+    assert service.get_contact(5) is None
+
+    # First name lookups are sorted by first name and ID, and last name lookups
+    # by last name, first name and ID
+    assert _ids(service.get_contacts_by_fname(" jeff ")) == [3, 4]
+    assert _ids(service.get_contacts_by_fname("John")) == []
+    assert _ids(service.get_contacts_by_fname_prefix("k")) == [2, 1]
+    assert _ids(service.get_contacts_by_fname_range("J", "KAZ")) == [3, 4, 2]
+    assert _ids(service.get_contacts_by_fname_prefix("", None, 2)) == [3, 4]
+    assert _ids(service.get_contacts_by_fname_prefix("", ("JEFF", 3))) == [4, 2, 1]
+    assert _ids(service.get_contacts_by_fname_prefix("", ("JEFF", 5), 1)) == [2]
+    assert _ids(service.get_contacts_by_fname_range("J", "KAZ", ("JEFF", 4))) == [2]
+    assert _ids(service.get_contacts_by_lname("newman")) == [4]
+    assert _ids(service.get_contacts_by_lname_prefix("")) == [3, 2, 4, 1]
+    assert _ids(service.get_contacts_by_lname_prefix("K")) == [2]
+    assert _ids(service.get_contacts_by_full_name(" jeff ", "newman")) == [4]
+    assert _ids(service.get_contacts_by_full_name("karla", "newman")) == []
+    assert _ids(service.get_contacts_by_phone_number("+363-214-4414254")) == [3]
+    assert _ids(service.get_contacts_by_phone_number("---")) == []
+    assert _ids(service.get_contacts_by_phone_number_suffix("414254")) == [3]
+    assert _ids(service.get_contacts_by_phone_number_suffix("8")) == [2]
+    assert _ids(service.get_contacts_by_phone_number_suffix("")) == []
+    assert _ids(service.get_contacts_by_phone_number_containing("88")) == [1, 2]
+    assert _ids(service.get_contacts_by_phone_number_containing("12")) == [2, 4]
+    assert _ids(service.get_contacts_by_phone_number_containing("000")) == []
+    assert _ids(service.get_contacts_by_email("allentaylor@example.net")) == [3]
+    assert _ids(service.get_contacts_by_fuzzy_name("kalra kaufmann")) == [2]
+    assert _ids(service.get_contacts_by_fuzzy_name("jeff newmann")) == [4]
+    assert _ids(service.get_contacts_by_fuzzy_name("jef", limit=1)) == [3]
+    assert _ids(service.get_contacts_by_fuzzy_name("xyz")) == []
+    assert _ids(service.get_contacts_by_phonetic_name("Jeph")) == [3, 4]
+    assert _ids(service.get_contacts_by_phonetic_name("jeff numan")) == [4]
+    assert _ids(service.get_contacts_by_phonetic_name("Karla Newman")) == []
+    assert _ids(service.get_contacts_by_phonetic_name("--")) == []
+    assert _ids(service.search_contacts("usa")) == [4, 1]
+    assert _ids(service.search_contacts("jeff 22957")) == [4, 3]
+    assert _ids(service.search_contacts("south", limit=1)) == [3]
+    assert _ids(service.search_contacts("jeff winnipeg")) == []
+    assert _ids(service.search_contacts("")) == []
+    assert _ids(service.get_contacts_by_state("ca")) == [1, 4]
+    assert _ids(service.get_contacts_by_country("USA")) == [1, 4]
+    assert _ids(service.get_contacts_by_country("Atlantis")) == []
+    assert _ids(service.get_contacts(after=1, limit=2)) == [2, 3]
+    lookup = ContactLookup(
+        phone_numbers=["+363-214-4414254", "---"],
+        emails=["JeffNewman@example.net", "nobody@example.net"],
+        first_names=["jeff", "Karla", "Zed"],
+    )
+    result = service.lookup_contacts(lookup)
+    file_result = file_service.lookup_contacts(lookup)
+    assert result.phone_numbers == file_result.phone_numbers
+    assert result.emails == file_result.emails
+    assert result.first_names == file_result.first_names
+    assert {
+        contact_id: asdict(contact) for contact_id, contact in result.contacts.items()
+    } == {
+        contact_id: asdict(contact)
+        for contact_id, contact in file_result.contacts.items()
+    }
+    assert _ids(service.get_contacts(after=4)) == []
+    assert _ids(service.get_contacts_by_state("CA", limit=1)) == [1]
+    assert _ids(service.get_contacts_by_country("USA", after=1, limit=1)) == [4]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_database_data_store_service_filter_contacts(database_service):
+    filters = [
+        ContactFilter(),
+        ContactFilter(state="CA", company_contains="crescendo"),
+        ContactFilter(first_name="jeff", country="usa"),
+        ContactFilter(company="viagenie"),
+        ContactFilter(title_contains="CEO"),
+        # The state and country must be on the same address
+        ContactFilter(state="MB", country="USA"),
+        ContactFilter(state="MB", country="CA"),
+        ContactFilter(city="Debraview", last_name=""),
+    ]
+
+    assert [_ids(database_service.filter_contacts(f)) for f in filters] == [
+        [1, 2, 3, 4],
+        [1],
+        [4],
+        [3],
+        [],
+        [],
+        [1],
+        [3],
+    ]
+    assert _ids(database_service.filter_contacts(ContactFilter(), 1, 2)) == [2, 3]
+    assert _ids(database_service.filter_contacts(ContactFilter(), 3)) == [4]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_database_data_store_service_reuses_database(datafiles, database_service):
+    contacts_file_path = _contacts_file_path(datafiles)
+    database_path = get_database_path(contacts_file_path)
+    assert database_service.database_path == database_path
+    with sqlite3.connect(database_path) as connection:
+        (journal_mode,) = connection.execute("PRAGMA journal_mode").fetchone()
+    assert journal_mode == "wal"
+
+    # The database is opened as is while the contacts file is unchanged
+    service = DatabaseDataStoreService()
+    service.set_contacts_file_path(contacts_file_path)
+    with patch.object(service, "_build_database") as mock_build_database:
+        assert service.initialize() is True
+        mock_build_database.assert_not_called()
+    assert len(service.get_contacts()) == 4
+    version = database_service.get_dataset_version()
+    assert service.get_dataset_version() == version is not None
+
+    # A modified file is ingested again
+    with contacts_file_path.open("ab") as contacts_file:
+        contacts_file.write(b"BEGIN:VCARD\r\nFN:John Doe\r\nEND:VCARD\r\n")
+    assert service.initialize() is True
+    assert len(service.get_contacts()) == 5
+    assert service.get_contact(5).first_name == "JOHN"
+    assert service.get_dataset_version() != version
+    service.close()
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_database_data_store_service_connection_per_thread(database_service):
+    connections = []
+
+    def lookup():
+        assert len(database_service.get_contacts_by_fname("Jeff")) == 2
+        connections.append(database_service._connection())
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(connections) == 4
+    assert len({id(connection) for connection in connections}) == 4
@@ -1,168 +1,18 @@
+import logging
+import time
+from dataclasses import asdict
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
 from contactlookup.definitions import SAMPLE_CONTACTS_DIR, SAMPLE_CONTACTS_FILE
-from contactlookup.models.contact import Contact
-from contactlookup.services.file_data_store_service import (
-    ContactBST,
-    ContactNode,
-    FileDataStoreService,
-)
+from contactlookup.models.contact_lookup import ContactLookup
+from contactlookup.services.file_data_store_service import FileDataStoreService
+from contactlookup.snapshot import get_snapshot_path
 from contactlookup.utils import split_unix_path_string
 
 
-def test_contact_node_one_contact():
-    contact = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    node = ContactNode(contact.first_name)
-
-    assert node.key == "John".upper()
-    assert not node.contacts
-
-    node.add_contact(contact)
-
-    assert node.contacts == [contact]
-    assert node.left is None
-    assert node.right is None
-
-
-def test_contact_node_multiple_contacts_sorted():
-    contact1 = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    contact2 = Contact(2, "John", "Deux", None, "ACME", "CEO")
-    node = ContactNode(contact1.first_name)
-
-    node.add_contact(contact1)
-    node.add_contact(contact2)
-
-    # Sort order is maintained
-    assert node.contacts == [contact2, contact1]
-    assert node.left is None
-    assert node.right is None
-
-
-def test_contact_node_with_left_child():
-    contact1 = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    contact2 = Contact(2, "Jane", "Doe", None, "ACME", "CEO")
-    john_node = ContactNode(contact1.first_name)
-    jane_node = ContactNode(contact2.first_name)
-
-    john_node.add_contact(contact1)
-    jane_node.add_contact(contact2)
-
-    john_node.left = jane_node
-
-    assert john_node.contacts == [contact1]
-    assert john_node.left.contacts == [contact2]
-    assert john_node.right is None
-
-
-def test_contact_bst_insert_root():
-    contact = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    bst = ContactBST()
-
-    bst.insert(contact)
-
-    assert bst.root.contacts == [contact]
-    assert bst.root.left is None
-    assert bst.root.right is None
-
-
-def test_contact_bst_insert_left():
-    contact1 = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    contact2 = Contact(2, "Jane", "Doe", None, "ACME", "CEO")
-    bst = ContactBST()
-
-    bst.insert(contact1)
-    bst.insert(contact2)
-
-    assert bst.root.contacts == [contact1]
-    assert bst.root.left.contacts == [contact2]
-    assert bst.root.right is None
-
-
-def test_contact_bst_insert_right():
-    contact1 = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    contact2 = Contact(1, "Jane", "Doe", None, "ACME", "CEO")
-    bst = ContactBST()
-
-    bst.insert(contact2)
-    bst.insert(contact1)
-
-    assert bst.root.contacts == [contact2]
-    assert bst.root.left is None
-    assert bst.root.right.contacts == [contact1]
-
-
-def test_contact_bst_insert_left_right():
-    contact1 = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    contact2 = Contact(2, "Jane", "Doe", None, "ACME", "CEO")
-    contact3 = Contact(3, "Jill", "Doe", None, "ACME", "CEO")
-    bst = ContactBST()
-
-    bst.insert(contact2)
-    bst.insert(contact1)
-    bst.insert(contact3)
-
-    # Jane is the root, John is the right child, Jill is the left child of John
-    #         Jane
-    #             \
-    #             John
-    #            /
-    #         Jill
-    assert bst.root.contacts == [contact2]
-    assert bst.root.right.contacts == [contact1]
-    assert bst.root.right.left.contacts == [contact3]
-
-
-def test_contact_bst_insert_same_level():
-    contact1 = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    contact2 = Contact(2, "Jane", "Doe", None, "ACME", "CEO")
-    contact3 = Contact(3, "Jill", "Doe", None, "ACME", "CEO")
-    contact4 = Contact(4, "Jack", "Doe", None, "ACME", "CEO")
-    bst = ContactBST()
-
-    bst.insert(contact2)
-    bst.insert(contact1)
-    bst.insert(contact3)
-    bst.insert(contact4)
-
-    # Jane is the root, John is the right child, Jill is the left child of John
-    #         Jane
-    #        /     \
-    #      Jack     John
-    #            /
-    #         Jill
-    assert bst.root.contacts == [contact2]
-    assert bst.root.right.contacts == [contact1]
-    assert bst.root.right.left.contacts == [contact3]
-    assert bst.root.left.contacts == [contact4]
-
-
-def test_contact_bst_insert_same_fname():
-    contact1 = Contact(1, "John", "Doe", None, "ACME", "CEO")
-    contact2 = Contact(2, "John", "Deux", None, "ACME", "CEO")
-    contact3 = Contact(3, "John", "Drei", None, "ACME", "CEO")
-    contact4 = Contact(4, "Jane", "Doe", None, "ACME", "CEO")
-    contact5 = Contact(5, "Jane", "Deux", None, "ACME", "CEO")
-    bst = ContactBST()
-
-    # Johns are stored in the root, Janes are stored in the left child
-    #              John
-    #  (John Deux, John Doe, John Drei) - order is maintained by last name
-    #           /
-    #       Jane
-    # (Jane Deux, Jane Doe)
-    # Inserting in non-ascending order to test sorting
-    bst.insert(contact1)
-    bst.insert(contact2)
-    bst.insert(contact4)
-    bst.insert(contact3)
-    bst.insert(contact5)
-
-    assert bst.root.contacts == [contact2, contact1, contact3]
-    assert bst.root.left.contacts == [contact5, contact4]
-
-
 @pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
 def test_file_data_store_service_load_contacts(datafiles):
     dir_paths = split_unix_path_string(str(datafiles))
@@ -207,6 +57,28 @@ def test_file_data_store_service_load_contacts(datafiles):
     contacts = service.get_contacts_by_fname("Jeff")
     assert len(contacts) == 2
 
+    # Test that get_contacts_by_fname_prefix works
+    contacts = service.get_contacts_by_fname_prefix("k")
+    assert [contact.first_name for contact in contacts] == ["KARLA", "KRISTEN"]
+
+    # Test that get_contacts_by_fname_range works
+    contacts = service.get_contacts_by_fname_range("JEFF", "KRISTEN")
+    assert [contact.id for contact in contacts] == [3, 4, 2]
+
+    # Test the last name lookups, sorted by last name and then by first name
+    contacts = service.get_contacts_by_lname(" newman ")
+    assert [contact.id for contact in contacts] == [4]
+    assert service.get_contacts_by_lname("Jeff") == []
+    contacts = service.get_contacts_by_lname_prefix("")
+    assert [contact.id for contact in contacts] == [3, 2, 4, 1]
+    contacts = service.get_contacts_by_lname_prefix("ne")
+    assert [contact.id for contact in contacts] == [4]
+    contacts = service.get_contacts_by_full_name("jeff", "Newman")
+    assert [contact.id for contact in contacts] == [4]
+    contacts = service.get_contacts_by_full_name("Jeff", "")
+    assert [contact.id for contact in contacts] == [3]
+    assert service.get_contacts_by_full_name("Karla", "Newman") == []
+
     # Test that get_contacts_by_phone_number works
     contacts = service.get_contacts_by_phone_number("+363-214-4414254")
     assert len(contacts) == 1
@@ -215,6 +87,16 @@ def test_file_data_store_service_load_contacts(datafiles):
     contacts = service.get_contacts_by_phone_number("555-555-5555")
     assert len(contacts) == 0
 
+    # Test partial phone number matches, sorted by contact ID
+    contacts = service.get_contacts_by_phone_number_suffix("441-4254")
+    assert [contact.id for contact in contacts] == [3]
+    contacts = service.get_contacts_by_phone_number_suffix("8")
+    assert [contact.id for contact in contacts] == [2]
+    contacts = service.get_contacts_by_phone_number_containing("88")
+    assert [contact.id for contact in contacts] == [1, 2]
+    contacts = service.get_contacts_by_phone_number_containing("555-555")
+    assert len(contacts) == 0
+
     # Test that get_contacts_by_email works
     contacts = service.get_contacts_by_email("allentaylor@example.net")
     assert len(contacts) == 1
@@ -227,6 +109,48 @@ def test_file_data_store_service_load_contacts(datafiles):
     contacts = service.get_contacts_by_email("test@example.net")
     assert len(contacts) == 0
 
+    # Test fuzzy name searches, best match first
+    contacts = service.get_contacts_by_fuzzy_name("krsiten perz")
+    assert [contact.id for contact in contacts] == [1]
+    contacts = service.get_contacts_by_fuzzy_name("jeff newmann")
+    assert [contact.id for contact in contacts] == [4]
+    contacts = service.get_contacts_by_fuzzy_name("jef", limit=1)
+    assert [contact.id for contact in contacts] == [3]
+    assert service.get_contacts_by_fuzzy_name("xyz") == []
+
+    # Test bulk lookups, with each contact returned once
+    result = service.lookup_contacts(
+        ContactLookup(
+            phone_numbers=["+363-214-4414254", "555-555-5555"],
+            emails=["JeffNewman@example.net "],
+            first_names=["jeff", "Zed"],
+        ),
+    )
+    assert result.phone_numbers == {"+363-214-4414254": [3], "555-555-5555": []}
+    assert result.emails == {"JeffNewman@example.net ": [4]}
+    assert result.first_names == {"jeff": [3, 4], "Zed": []}
+    assert sorted(result.contacts) == [3, 4]
+    assert result.contacts[3] is service.get_contact(3)
+
+    # Test sound-alike lookups, sorted by contact ID
+    contacts = service.get_contacts_by_phonetic_name("Jeph")
+    assert [contact.id for contact in contacts] == [3, 4]
+    contacts = service.get_contacts_by_phonetic_name("jeff numan")
+    assert [contact.id for contact in contacts] == [4]
+    contacts = service.get_contacts_by_phonetic_name("Kristin Pires")
+    assert [contact.id for contact in contacts] == [1]
+    assert service.get_contacts_by_phonetic_name("Karla Newman") == []
+    assert service.get_contacts_by_phonetic_name("--") == []
+
+    # Test full-text searches across all the fields, best match first
+    contacts = service.search_contacts("hollywood")
+    assert [contact.id for contact in contacts] == [4]
+    contacts = service.search_contacts("Crescendo, Winnipeg")
+    assert [contact.id for contact in contacts] == [1]
+    contacts = service.search_contacts("jeff 22957")
+    assert [contact.id for contact in contacts] == [4, 3]
+    assert service.search_contacts("jeff winnipeg") == []
+
     # Check that get_contacts_by_country works
     contacts = service.get_contacts_by_country("USA")
     # There are 2 contacts with the country "USA"
@@ -248,3 +172,352 @@ def test_file_data_store_service_load_contacts(datafiles):
     # Test for a state that doesn't exist
     contacts = service.get_contacts_by_state("NY")
     assert len(contacts) == 0
+
+    # Test pages of contacts, sorted by ID after a cursor
+    contacts = service.get_contacts(after=1, limit=2)
+    assert [contact.id for contact in contacts] == [2, 3]
+    contacts = service.get_contacts(after=3)
+    assert [contact.id for contact in contacts] == [4]
+    assert service.get_contacts(after=4, limit=2) == []
+    contacts = service.get_contacts_by_state("CA", limit=1)
+    assert [contact.id for contact in contacts] == [1]
+    contacts = service.get_contacts_by_country("USA", after=1, limit=1)
+    assert [contact.id for contact in contacts] == [4]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_parallel_parsing(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+
+    serial_service = FileDataStoreService()
+    serial_service.set_contacts_file_path(contacts_file_path)
+    assert serial_service.initialize() is True
+
+    parallel_service = FileDataStoreService(parse_workers=2)
+    parallel_service.set_contacts_file_path(contacts_file_path)
+    assert parallel_service.initialize() is True
+
+    # Contact IDs are assigned in file order by both paths
+    assert parallel_service.get_contacts() == serial_service.get_contacts()
+    for contact_id in range(1, 5):
+        parallel_contact = parallel_service.get_contact(contact_id)
+        assert parallel_contact.id == contact_id
+        assert parallel_contact == serial_service.get_contact(contact_id)
+        for phone_number in parallel_contact.phone_numbers:
+            assert phone_number.contact_id == contact_id
+    assert len(parallel_service.get_contacts_by_fname("Jeff")) == 2
+    assert len(parallel_service.get_contacts_by_state("CA")) == 2
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_fast_path_matches_vobject(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    logger = logging.getLogger(__name__)
+
+    FileDataStoreService.contact_id = 0
+    vobject_contacts = list(
+        FileDataStoreService.read_vcf_file(contacts_file_path, logger, fast_path=False),
+    )
+    FileDataStoreService.contact_id = 0
+    fast_path_contacts = list(
+        FileDataStoreService.read_vcf_file(contacts_file_path, logger),
+    )
+
+    assert len(fast_path_contacts) == 4
+    assert [asdict(contact) for contact in fast_path_contacts] == [
+        asdict(contact) for contact in vobject_contacts
+    ]
+    # The TYPE parameter is read from the properties
+    assert [address.type for address in fast_path_contacts[0].addresses] == [
+        "WORK",
+        "HOME",
+    ]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_snapshot(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+
+    service = FileDataStoreService(snapshot=True)
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+    assert get_snapshot_path(contacts_file_path).exists()
+
+    # The second service loads the snapshot instead of parsing the file
+    snapshot_service = FileDataStoreService(snapshot=True)
+    snapshot_service.set_contacts_file_path(contacts_file_path)
+    with patch.object(FileDataStoreService, "_read_vcf_cards") as mock_read_vcf_cards:
+        assert snapshot_service.initialize() is True
+        mock_read_vcf_cards.assert_not_called()
+
+    assert [asdict(contact) for contact in snapshot_service.get_contacts()] == [
+        asdict(contact) for contact in service.get_contacts()
+    ]
+    assert len(snapshot_service.get_contacts_by_fname("Jeff")) == 2
+    assert len(snapshot_service.get_contacts_by_phone_number("+363-214-4414254")) == 1
+    assert len(snapshot_service.get_contacts_by_email("allentaylor@example.net")) == 1
+    assert len(snapshot_service.get_contacts_by_state("CA")) == 2
+    assert len(snapshot_service.get_contacts_by_country("USA")) == 2
+    assert snapshot_service.get_dataset_version() == service.get_dataset_version()
+
+    # A modified file is parsed again
+    with contacts_file_path.open("ab") as contacts_file:
+        contacts_file.write(b"BEGIN:VCARD\r\nFN:John Doe\r\nEND:VCARD\r\n")
+    modified_service = FileDataStoreService(snapshot=True)
+    modified_service.set_contacts_file_path(contacts_file_path)
+    assert modified_service.initialize() is True
+    assert len(modified_service.get_contacts()) == 5
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_reload(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    service = FileDataStoreService()
+    assert service.get_dataset_version() is None
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+    old_contacts = service.get_contacts()
+    old_version = service.get_dataset_version()
+    # The version only depends on the file
+    other_service = FileDataStoreService()
+    other_service.set_contacts_file_path(contacts_file_path)
+    assert other_service.initialize() is True
+    assert other_service.get_dataset_version() == old_version
+
+    with contacts_file_path.open("ab") as contacts_file:
+        contacts_file.write(b"BEGIN:VCARD\r\nFN:John Doe\r\nEND:VCARD\r\n")
+    assert service.reload() is True
+    assert service.get_dataset_version() not in (None, old_version)
+
+    assert len(service.get_contacts()) == 5
+    assert service.get_contact(5).first_name == "JOHN"
+    assert len(service.get_contacts_by_fname("John")) == 1
+    # The previous indexes are left untouched for the readers still using them
+    assert len(old_contacts) == 4
+    assert service.reload_stats.reloads == 1
+    assert service.reload_stats.last_duration_seconds > 0
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_incremental_reload(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    service = FileDataStoreService(incremental=True)
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+    kristen, karla, jeff, jeff_newman = service.get_contacts()
+
+    # Remove Karla, change the email of Jeff Newman, and add John Doe
+    cards = contacts_file_path.read_bytes().split(b"END:VCARD\n")
+    cards[3] = cards[3].replace(b"jeffnewman@", b"jeff.newman@")
+    del cards[1]
+    contacts_file_path.write_bytes(
+        b"END:VCARD\n".join(cards) + b"BEGIN:VCARD\r\nFN:John Doe\r\nEND:VCARD\r\n",
+    )
+    with patch.object(
+        FileDataStoreService,
+        "parse_vcard_block",
+        wraps=FileDataStoreService.parse_vcard_block,
+    ) as mock_parse_vcard_block:
+        assert service.reload() is True
+    # Only the changed and the new cards are parsed
+    assert mock_parse_vcard_block.call_count == 2
+    # The contact IDs differ from a full load of the file, and so does the
+    # version
+    full_service = FileDataStoreService(incremental=True)
+    full_service.set_contacts_file_path(contacts_file_path)
+    assert full_service.initialize() is True
+    assert service.get_dataset_version() != full_service.get_dataset_version()
+
+    contacts = service.get_contacts()
+    assert [contact.id for contact in contacts] == [1, 3, 5, 6]
+    # Unchanged contacts are reused and keep their IDs
+    assert contacts[0] is kristen
+    assert contacts[1] is jeff
+    assert service.get_contact(1) is kristen
+    assert service.get_contact(2) is None
+    assert service.get_contact(3) is jeff
+    assert service.get_contact(4) is None
+    assert service.get_contact(5).emails[0].email == "jeff.newman@example.net"
+    assert service.get_contact(6).first_name == "JOHN"
+    assert service.get_contact(7) is None
+
+    assert service.get_contacts_by_fname("Karla") == []
+    assert [contact.id for contact in service.get_contacts_by_fname("Jeff")] == [3, 5]
+    assert service.get_contacts_by_phone_number("+51-882-1251128") == []
+    assert service.get_contacts_by_phone_number_suffix("1251128") == []
+    contacts = service.get_contacts_by_phone_number_suffix("531122")
+    assert [contact.id for contact in contacts] == [5]
+    assert service.get_contacts_by_email("smithsteve@example.org") == []
+    assert service.get_contacts_by_fuzzy_name("kalra") == []
+    contacts = service.get_contacts_by_fuzzy_name("jon doe")
+    assert [contact.id for contact in contacts] == [6]
+    assert service.search_contacts("workerholic") == []
+    assert [contact.id for contact in service.search_contacts("john")] == [6]
+    assert service.get_contacts_by_email("jeffnewman@example.net") == []
+    assert len(service.get_contacts_by_email("jeff.newman@example.net")) == 1
+    assert [contact.id for contact in service.get_contacts_by_state("CA")] == [1, 5]
+    assert service.get_contacts_by_country("Israel") == []
+
+    # The result matches a full parse of the file, apart from the IDs
+    full_service = FileDataStoreService()
+    full_service.set_contacts_file_path(contacts_file_path)
+    assert full_service.initialize() is True
+    assert [
+        (contact.first_name, contact.last_name, [e.email for e in contact.emails])
+        for contact in service.get_contacts()
+    ] == [
+        (contact.first_name, contact.last_name, [e.email for e in contact.emails])
+        for contact in full_service.get_contacts()
+    ]
+
+    # The previous indexes are left untouched for the readers still using them
+    assert karla.id == 2
+    assert jeff_newman.emails[0].email == "jeffnewman@example.net"
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_shared_phone_numbers_and_emails(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    original = contacts_file_path.read_bytes()
+    # John Doe shares the phone number and the email of Jeff
+    shared_card = (
+        b"BEGIN:VCARD\r\nFN:John Doe\r\nTEL:+363 214 4414254\r\n"
+        b"EMAIL:AllenTaylor@Example.NET\r\nEND:VCARD\r\n"
+    )
+    contacts_file_path.write_bytes(original + shared_card)
+    service = FileDataStoreService(incremental=True)
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+
+    contacts = service.get_contacts_by_phone_number("+363-214-4414254")
+    assert [contact.id for contact in contacts] == [3, 5]
+    contacts = service.get_contacts_by_email("allentaylor@example.net")
+    assert [contact.id for contact in contacts] == [3, 5]
+    contacts = service.get_contacts_by_phone_number_suffix("4414254")
+    assert [contact.id for contact in contacts] == [3, 5]
+
+    # Removing John Doe keeps Jeff
+    contacts_file_path.write_bytes(original)
+    assert service.reload() is True
+    contacts = service.get_contacts_by_phone_number("+363-214-4414254")
+    assert [contact.id for contact in contacts] == [3]
+    contacts = service.get_contacts_by_email("ALLENTAYLOR@example.net")
+    assert [contact.id for contact in contacts] == [3]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_reload_failure(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    service = FileDataStoreService()
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+
+    # The current contacts are kept if the file cannot be indexed
+    with patch.object(service, "_load_indexes", return_value=None):
+        assert service.reload() is False
+
+    assert len(service.get_contacts()) == 4
+    assert service.reload_stats.reloads == 0
+    assert service.reload_stats.failures == 1
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_watch(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    service = FileDataStoreService()
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+
+    service.start_watching(interval=0.01)
+    try:
+        with contacts_file_path.open("ab") as contacts_file:
+            contacts_file.write(b"BEGIN:VCARD\r\nFN:John Doe\r\nEND:VCARD\r\n")
+        deadline = time.monotonic() + 5
+        while service.reload_stats.reloads == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        service.stop_watching()
+
+    assert service.reload_stats.reloads == 1
+    assert len(service.get_contacts()) == 5
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_phonetic_index(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    service = FileDataStoreService(phonetic=True, incremental=True)
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+    assert service._indexes.contacts_by_phonetic_name is not None
+    scan_service = FileDataStoreService()
+    scan_service.set_contacts_file_path(contacts_file_path)
+    assert scan_service.initialize() is True
+    assert scan_service._indexes.contacts_by_phonetic_name is None
+
+    # The index gives the same contacts as a scan
+    for name in ["Jeph", "jeff numan", "Carla Kaufmann", "Perez", "Smith"]:
+        assert service.get_contacts_by_phonetic_name(
+            name,
+        ) == scan_service.get_contacts_by_phonetic_name(name)
+
+    # The index is updated on incremental reloads
+    with contacts_file_path.open("ab") as contacts_file:
+        contacts_file.write(b"BEGIN:VCARD\r\nFN:Jon Smyth\r\nEND:VCARD\r\n")
+    assert service.reload() is True
+    contacts = service.get_contacts_by_phonetic_name("John Smith")
+    assert [contact.id for contact in contacts] == [5]
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_file_data_store_service_stats(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+    service = FileDataStoreService(incremental=True)
+    assert service.get_ingest_stats() is None
+    service.set_contacts_file_path(contacts_file_path)
+    assert service.initialize() is True
+
+    ingest_stats = service.get_ingest_stats()
+    assert ingest_stats.read_seconds > 0
+    assert ingest_stats.parse_seconds > 0
+    assert ingest_stats.index_seconds > 0
+    index_stats = {stats.name: stats for stats in service.get_index_stats()}
+    assert index_stats["all_contacts"].entries == 4
+    assert index_stats["contacts_by_name"].entries == 4
+    assert index_stats["contacts_by_phone_number"].entries == 5
+    assert index_stats["contacts_by_country"].entries == 6
+    assert index_stats["card_fingerprints"].entries == 4
+    # Only enabled indexes are reported
+    assert "contacts_by_phonetic_name" not in index_stats
+    assert all(stats.memory_bytes > 0 for stats in index_stats.values())
+    # The stats of the same indexes are only measured once
+    assert service.get_index_stats() is service.get_index_stats()
+
+    contact = service.get_contact(1)
+    service.get_contact_json(contact)
+    service.get_contact_json(contact)
+    (cache_stats,) = service.get_cache_stats()
+    assert (cache_stats.name, cache_stats.hits, cache_stats.misses) == (
+        "contact_json",
+        1,
+        1,
+    )
+
+    with contacts_file_path.open("ab") as contacts_file:
+        contacts_file.write(b"BEGIN:VCARD\r\nFN:John Doe\r\nEND:VCARD\r\n")
+    assert service.reload() is True
+    assert service.get_ingest_stats() is not ingest_stats
+    assert service.get_ingest_stats().index_seconds > 0
+    index_stats = {stats.name: stats for stats in service.get_index_stats()}
+    assert index_stats["all_contacts"].entries == 5
+    # The cache keeps counting across incremental reloads
+    assert service.get_cache_stats()[0].hits == 1
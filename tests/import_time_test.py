@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+from contactlookup.definitions import ROOT_DIR
+
+# Dependencies that are slow to import, and only needed by some commands
+HEAVY_MODULES = ("fastapi", "uvicorn", "fire", "vobject", "numpy", "logging.config")
+
+
+def _import_times(*args: str) -> dict[str, int]:
+    """Run Python with `-X importtime`, and get the cumulative import time of
+    each imported module, in microseconds."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT_DIR.parent))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT_DIR.parent,
+        env=env,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+def _heavy_modules(times: dict[str, int]) -> list[str]:
+    return [module for module in HEAVY_MODULES if module in times]
+
+
+def test_import_package():
+    # Importing the package does not set up the logger
+    times = _import_times("-c", "import contactlookup")
+    assert "contactlookup" in times
+    assert _heavy_modules(times) == []
+
+
+def test_import_file_data_store_service():
+    # vobject only parses the cards that the fast path rejects
+    times = _import_times(
+        "-c",
+        "import contactlookup.services.file_data_store_service",
+    )
+    assert _heavy_modules(times) == []
+    assert "concurrent.futures.process" not in times
+
+
+def test_import_main():
+    # The server and the data store services are imported when they are used
+    times = _import_times("-c", "import contactlookup.__main__")
+    assert _heavy_modules(times) == []
+    # A generous budget, it is imported in about 20ms
+    assert times["contactlookup.__main__"] < 200_000
+
+
+def test_cli_help():
+    times = _import_times("-m", "contactlookup", "--help")
+    assert _heavy_modules(times) == ["fire"]
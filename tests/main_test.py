@@ -1,7 +1,7 @@
 from pathlib import Path
 from unittest.mock import MagicMock, call, patch
 
-from contactlookup.__main__ import _load_contacts_file
+from contactlookup.__main__ import _load_contacts_file, _setup, main
 from contactlookup.definitions import (
     ROOT_DIR,
     SAMPLE_CONTACTS_DIR,
@@ -78,3 +78,38 @@ def test_load_contacts_file_with_path(mock_print, mock_get_logger):
     # # Check if the contacts file was set to the provided path
     expected_path = Path(contacts_file_path)
     mock_service.set_contacts_file_path.assert_called_once_with(expected_path)
+
+
+@patch("contactlookup.__main__.initialize_application_logger")
+@patch("contactlookup.__main__._setup")
+@patch("contactlookup.__main__.print")
+def test_main_watch_with_workers(mock_print, mock_setup, mock_logger):
+    # The workers would reload the contacts file on their own
+    main(watch=5, workers=2)
+
+    mock_setup.assert_not_called()
+    mock_print.assert_called_once_with(
+        "--watch requires a single worker. Restart the workers to reload.",
+    )
+
+
+@patch("contactlookup.__main__.print")
+def test_setup_ignored_options(mock_print, tmp_path):
+    contacts_file_path = (
+        ROOT_DIR.parent
+        / Path("/".join(split_unix_path_string(SAMPLE_CONTACTS_DIR)))
+        / SAMPLE_CONTACTS_FILE
+    )
+    service = _setup(
+        data_store_service="d",
+        contacts_file_path=str(contacts_file_path),
+        snapshot=True,
+        phonetic=True,
+        database_path=str(tmp_path / "contacts.sqlite"),
+    )
+
+    assert service is not None
+    service.close()
+    mock_print.assert_any_call(
+        "Ignoring the options of FileDataStoreService: --snapshot, --phonetic",
+    )
@@ -0,0 +1,119 @@
+from contactlookup.indexes.name_index import NameIndex, last_name_key
+from contactlookup.models.contact import Contact
+
+
+def _contacts():
+    return [
+        Contact(1, "John", "Doe", None, "ACME", "CEO"),
+        Contact(2, "John", "Deux", None, "ACME", "CEO"),
+        Contact(3, "John", "Drei", None, "ACME", "CEO"),
+        Contact(4, "Jane", "Doe", None, "ACME", "CEO"),
+        Contact(5, "Jane", "Deux", None, "ACME", "CEO"),
+        Contact(6, "Jack", "Doe", None, "ACME", "CEO"),
+        Contact(7, "Bob", "Doe", None, "ACME", "CEO"),
+    ]
+
+
+def test_name_index_empty():
+    index = NameIndex()
+
+    assert len(index) == 0
+    assert index.get("JOHN") == []
+    assert index.prefix("J") == []
+    assert index.range("A", "Z") == []
+
+
+def test_name_index_get():
+    contacts = _contacts()
+    index = NameIndex()
+    index.build(contacts)
+
+    assert len(index) == 7
+    # Contacts with the same first name are sorted by last name
+    assert [contact.id for contact in index.get("JOHN")] == [2, 1, 3]
+    assert [contact.id for contact in index.get("JANE")] == [5, 4]
+    assert index.get("JO") == []
+    assert index.get("JOHNNY") == []
+    assert index.get() == []
+
+
+def test_name_index_get_same_name():
+    # Contacts with the same name are kept in ID order
+    contacts = [
+        Contact(2, "John", "Doe", None, "ACME", "CEO"),
+        Contact(1, "John", "Doe", None, "ACME", "CEO"),
+    ]
+    index = NameIndex()
+    index.build(contacts)
+
+    assert [contact.id for contact in index.get("JOHN")] == [1, 2]
+
+
+def test_name_index_get_composite_key():
+    index = NameIndex()
+    index.build(_contacts())
+
+    assert [contact.id for contact in index.get("JOHN", "DOE")] == [1]
+    assert index.get("JOHN", "DO") == []
+
+
+def test_name_index_last_name_key():
+    index = NameIndex(key=last_name_key)
+    index.build(_contacts())
+
+    # Contacts with the same last name are sorted by first name
+    assert [contact.id for contact in index.get("DOE")] == [7, 6, 4, 1]
+    assert [contact.id for contact in index.get("DOE", "JANE")] == [4]
+    assert [contact.id for contact in index.prefix("DE")] == [5, 2]
+    assert [contact.id for contact in index.prefix("D")] == [5, 2, 7, 6, 4, 1, 3]
+
+
+def test_name_index_prefix():
+    index = NameIndex()
+    index.build(_contacts())
+
+    assert [contact.id for contact in index.prefix("JA")] == [6, 5, 4]
+    assert [contact.id for contact in index.prefix("J")] == [6, 5, 4, 2, 1, 3]
+    assert [contact.id for contact in index.prefix("B")] == [7]
+    assert index.prefix("K") == []
+    assert len(index.prefix("")) == 7
+
+
+def test_name_index_range():
+    index = NameIndex()
+    index.build(_contacts())
+
+    # The start is inclusive and the end is exclusive
+    assert [contact.id for contact in index.range("JACK", "JOHN")] == [6, 5, 4]
+    assert [contact.id for contact in index.range("BOB", "JACK")] == [7]
+    assert len(index.range("A")) == 7
+    assert index.range("Z", "A") == []
+
+
+def test_name_index_sorted_input():
+    # Sorted input used to degrade the previous binary search tree into a list
+    contacts = [
+        Contact(i, f"Name{i:06d}", "Doe", None, None, None) for i in range(1, 20001)
+    ]
+    index = NameIndex()
+    index.build(contacts)
+
+    assert index.get("NAME019999")[0].id == 19999
+    assert len(index.prefix("NAME0199")) == 100
+
+
+def test_name_index_updated():
+    contacts = _contacts()
+    index = NameIndex()
+    index.build(contacts[:5])
+
+    updated = index.updated(
+        removed=[contacts[0], contacts[3]],
+        added=[contacts[6], contacts[5], Contact(8, "John", "Dix", None, None, None)],
+    )
+
+    assert [contact.id for contact in updated.get("JOHN")] == [2, 8, 3]
+    assert [contact.id for contact in updated.get("JANE")] == [5]
+    assert [contact.id for contact in updated.range("A")] == [7, 6, 5, 2, 8, 3]
+    # The original index is not modified
+    assert [contact.id for contact in index.range("A")] == [5, 4, 2, 1, 3]
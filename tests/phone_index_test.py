@@ -0,0 +1,92 @@
+from contactlookup.indexes.phone_index import PhoneNumberIndex
+
+NUMBERS = ["16155551234", "6155551234", "5551234", "12345", "44412121212"]
+
+
+def test_phone_number_index_empty():
+    index = PhoneNumberIndex()
+
+    assert len(index) == 0
+    assert index.ending_with("1234") == []
+    assert index.containing("1234") == []
+
+
+def test_phone_number_index_ending_with():
+    index = PhoneNumberIndex()
+    index.build(NUMBERS)
+
+    assert len(index) == 5
+    # Numbers with and without the country code
+    assert sorted(index.ending_with("6155551234")) == ["16155551234", "6155551234"]
+    assert sorted(index.ending_with("1234")) == [
+        "16155551234",
+        "5551234",
+        "6155551234",
+    ]
+    assert index.ending_with("16155551234") == ["16155551234"]
+    assert index.ending_with("5") == ["12345"]
+    assert index.ending_with("9") == []
+    assert index.ending_with("") == []
+
+
+def test_phone_number_index_containing():
+    index = PhoneNumberIndex()
+    index.build(NUMBERS)
+
+    assert sorted(index.containing("1234")) == [
+        "12345",
+        "16155551234",
+        "5551234",
+        "6155551234",
+    ]
+    assert sorted(index.containing("555")) == [
+        "16155551234",
+        "5551234",
+        "6155551234",
+    ]
+    # The number contains "12" four times, but is only returned once
+    assert sorted(index.containing("12")) == [
+        "12345",
+        "16155551234",
+        "44412121212",
+        "5551234",
+        "6155551234",
+    ]
+    # A match cannot span two numbers
+    assert index.containing("345555") == []
+    assert index.containing("") == []
+
+
+def test_phone_number_index_updated():
+    index = PhoneNumberIndex()
+    index.build(NUMBERS)
+
+    updated = index.updated(
+        removed=["5551234", "99999"],
+        added=["2125551234", "12345", "777"],
+    )
+    # The original index is unchanged
+    assert sorted(index.ending_with("51234")) == [
+        "16155551234",
+        "5551234",
+        "6155551234",
+    ]
+    assert len(updated) == 6
+    assert sorted(updated.ending_with("51234")) == [
+        "16155551234",
+        "2125551234",
+        "6155551234",
+    ]
+    assert updated.containing("77") == ["777"]
+    assert updated.containing("12345") == ["12345"]
+
+    # The index is rebuilt once most of its text is removed numbers
+    rebuilt = updated.updated(
+        removed=["16155551234", "6155551234", "44412121212", "2125551234"],
+        added=[],
+    )
+    assert len(rebuilt) == 2
+    assert len(rebuilt._text) == len("12345|777|")
+    assert rebuilt.containing("") == []
+    assert sorted(rebuilt.containing("7")) == ["777"]
+    assert rebuilt.ending_with("1234") == []
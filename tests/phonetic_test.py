@@ -0,0 +1,27 @@
+from contactlookup.indexes.phonetic import contact_phonetic_keys, phonetic_keys, soundex
+from contactlookup.models.contact import Contact
+
+
+def test_soundex():
+    assert soundex("Robert") == "R163"
+    assert soundex("Rupert") == "R163"
+    assert soundex("Rubin") == "R150"
+    # H and W do not separate consonants with the same digit
+    assert soundex("Ashcraft") == "A261"
+    # The first letter is kept even if it has the digit of the next letter
+    assert soundex("Pfister") == "P236"
+    # Vowels separate consonants with the same digit
+    assert soundex("Tymczak") == "T522"
+    assert soundex("Lee") == "L000"
+    assert soundex("Smith") == soundex("Smyth") == "S530"
+    assert soundex("Sean") == soundex("Shawn") == "S500"
+    assert soundex("O'Neil") == "O540"
+    assert soundex("123") == ""
+
+
+def test_phonetic_keys():
+    assert phonetic_keys("Mary-Ann Smith", None, "SMYTH") == ["M600", "A500", "S530"]
+    assert phonetic_keys("", "42") == []
+    contact = Contact(1, "SHAWN", "SMITH", "Peter", None, None, "Jay")
+    # Only the first and last names are keyed
+    assert contact_phonetic_keys(contact) == ["S500", "S530"]
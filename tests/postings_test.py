@@ -0,0 +1,49 @@
+from contactlookup.indexes.postings import Postings
+
+
+def test_postings_empty():
+    postings = Postings()
+
+    assert len(postings) == 0
+    assert "5551234" not in postings
+    assert postings.get("5551234") == ()
+
+
+def test_postings_add():
+    postings = Postings()
+    postings.add("5551234", 1)
+    postings.add("5551234", 3)
+    postings.add("5551234", 3)
+    postings.add("5559999", 2)
+
+    assert len(postings) == 2
+    assert "5551234" in postings
+    assert list(postings) == ["5551234", "5559999"]
+    assert postings.get("5551234") == (1, 3)
+    assert postings.get("5559999") == (2,)
+    # Keys with a single contact store its ID inline
+    assert postings._ids["5559999"] == 2
+
+
+def test_postings_updated():
+    postings = Postings()
+    for key, contact_id in [("a", 1), ("a", 2), ("a", 3), ("b", 2), ("c", 4)]:
+        postings.add(key, contact_id)
+
+    updated = postings.updated(
+        removed=[("a", 2), ("b", 2), ("c", 5), ("d", 1)],
+        added=[("a", 6), ("c", 6), ("e", 6)],
+    )
+    # The original postings are unchanged
+    assert postings.get("a") == (1, 2, 3)
+    assert postings.get("b") == (2,)
+    assert postings.get("c") == (4,)
+
+    assert updated.get("a") == (1, 3, 6)
+    assert "b" not in updated
+    assert updated.get("c") == (4, 6)
+    assert updated.get("e") == (6,)
+
+    # A key left with a single contact stores its ID inline again
+    updated = updated.updated(removed=[("c", 4)], added=[])
+    assert updated._ids["c"] == 6
@@ -0,0 +1,56 @@
+import pickle
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from contactlookup.models.address import Address
+from contactlookup.models.contact import Contact
+from contactlookup.models.email import Email
+from contactlookup.models.phone_number import PhoneNumber
+from contactlookup.serialization import ContactJsonCache, encode_contact
+
+
+def _contact(contact_id: int = 1) -> Contact:
+    contact = Contact(contact_id, "Zoë", "O'Neil", None, 'Acme "Inc"', "CEO")
+    contact.add_phone_number(
+        PhoneNumber(number="+1 555 0100", contact_id=contact_id, type="cell"),
+    )
+    contact.add_address(
+        Address(
+            street="1 Main St\nUnit 2",
+            city="Montréal",
+            state="QC",
+            postal_code=None,
+            contact_id=contact_id,
+            country="Canada",
+        ),
+    )
+    contact.add_email(Email(email="zoe@example.com", type=None, contact_id=contact_id))
+    return contact
+
+
+def test_encode_contact():
+    # Same bytes as FastAPI's default response
+    for contact in [_contact(), Contact(2, "Jeff", "", None, None, None)]:
+        assert encode_contact(contact) == JSONResponse(jsonable_encoder(contact)).body
+
+
+def test_contact_json_cache():
+    cache = ContactJsonCache()
+    contact = _contact()
+
+    encoded = cache.get(contact)
+    assert encoded == encode_contact(contact)
+    assert cache.get(contact) is encoded
+    assert len(cache) == 1
+
+    # A different contact with the same ID is encoded again
+    other = Contact(1, "Jeff", "Newman", None, None, None)
+    assert cache.get(other) == encode_contact(other)
+
+    updated = cache.updated({1})
+    assert len(updated) == 0
+    assert len(cache) == 1
+
+    # The cache is not pickled
+    assert len(pickle.loads(pickle.dumps(cache))) == 0
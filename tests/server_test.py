@@ -0,0 +1,86 @@
+import gc
+import os
+from pathlib import Path
+
+import pytest
+
+from contactlookup.server import fork_workers, wait_workers
+from contactlookup.services.file_data_store_service import FileDataStoreService
+
+CONTACTS = 20000
+
+
+def _write_contacts_file(file_path: Path) -> Path:
+    with file_path.open("w", encoding="utf-8", newline="") as vcf_file:
+        for index in range(CONTACTS):
+            vcf_file.write(
+                "BEGIN:VCARD\r\nVERSION:3.0\r\n"
+                f"N:LAST{index % 997};FIRST{index % 991};;;\r\n"
+                f"FN:FIRST{index % 991} LAST{index % 997}\r\n"
+                f"ORG:COMPANY{index % 101}\r\n"
+                f"TEL;TYPE=CELL:+1-555-{index:07d}\r\n"
+                f"ADR;TYPE=HOME:;;{index} MAIN ST;CITY{index % 89};"
+                f"ST{index % 50};{index % 90000:05d};USA\r\n"
+                f"EMAIL:contact{index}@example.net\r\n"
+                "END:VCARD\r\n",
+            )
+    return file_path
+
+
+def _pss_kb(pid: int) -> int:
+    """Get the proportional set size of a process: its private memory, plus
+    its share of the memory it shares with other processes."""
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    raise ValueError(f"No Pss for process {pid}")
+
+
+def _total_pss_kb(service: FileDataStoreService, workers: int) -> int:
+    """Fork workers that serve a few lookups and collect the garbage, and get
+    the total memory of this process and of the workers."""
+    ready_read, ready_write = os.pipe()
+    stop_read, stop_write = os.pipe()
+
+    def worker():
+        os.close(ready_read)
+        os.close(stop_write)
+        for index in range(100):
+            service.get_contacts_by_fname(f"first{index}")
+            service.get_contacts_by_email(f"contact{index}@example.net")
+        # Like the full collections of a long running worker
+        gc.collect()
+        os.write(ready_write, b"x")
+        os.read(stop_read, 1)
+
+    pids = fork_workers(workers, worker)
+    gc.unfreeze()
+    os.close(ready_write)
+    os.close(stop_read)
+    try:
+        for _ in pids:
+            assert os.read(ready_read, 1) == b"x"
+        return _pss_kb(os.getpid()) + sum(_pss_kb(pid) for pid in pids)
+    finally:
+        os.close(stop_write)
+        os.close(ready_read)
+        wait_workers(pids)
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "fork") or not os.path.exists("/proc/self/smaps_rollup"),
+    reason="Requires fork and /proc/<pid>/smaps_rollup",
+)
+def test_fork_workers_share_memory(tmp_path):
+    service = FileDataStoreService()
+    service.set_contacts_file_path(_write_contacts_file(tmp_path / "contacts.vcf"))
+    assert service.initialize() is True
+
+    loaded = _pss_kb(os.getpid())
+    one_worker = _total_pss_kb(service, 1)
+    four_workers = _total_pss_kb(service, 4)
+    # The workers share the contacts and indexes with the parent, even after
+    # a garbage collection, so that each extra worker only adds a fraction of
+    # the memory of the loaded data store.
+    assert (four_workers - one_worker) / 3 < loaded / 5
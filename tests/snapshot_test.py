@@ -0,0 +1,78 @@
+import os
+
+from contactlookup.snapshot import (
+    SNAPSHOT_SUFFIX,
+    FileKey,
+    get_file_key,
+    get_snapshot_path,
+    read_snapshot,
+    write_snapshot,
+)
+
+PAYLOAD = {"contacts": ["John", "Jane"]}
+
+
+def test_get_file_key(tmp_path):
+    file_path = tmp_path / "contacts.vcf"
+    file_path.write_bytes(b"BEGIN:VCARD\nEND:VCARD\n")
+
+    key = get_file_key(file_path)
+
+    assert key.size == 22
+    assert key.mtime_ns == file_path.stat().st_mtime_ns
+    assert len(key.sha256) == 64
+    assert get_file_key(file_path) == key
+
+
+def test_get_snapshot_path(tmp_path):
+    file_path = tmp_path / "contacts.vcf"
+
+    assert get_snapshot_path(file_path) == tmp_path / f"contacts.vcf{SNAPSHOT_SUFFIX}"
+
+
+def test_write_and_read_snapshot(tmp_path):
+    file_path = tmp_path / "contacts.vcf"
+    file_path.write_bytes(b"BEGIN:VCARD\nEND:VCARD\n")
+    key = get_file_key(file_path)
+
+    assert read_snapshot(file_path, key) is None
+    assert write_snapshot(file_path, key, PAYLOAD) is True
+    assert get_snapshot_path(file_path).exists()
+    assert read_snapshot(file_path, key) == PAYLOAD
+
+
+def test_read_snapshot_stale(tmp_path):
+    file_path = tmp_path / "contacts.vcf"
+    file_path.write_bytes(b"BEGIN:VCARD\nEND:VCARD\n")
+    key = get_file_key(file_path)
+    write_snapshot(file_path, key, PAYLOAD)
+
+    # Same size, different content
+    file_path.write_bytes(b"BEGIN:VCARD\nEND:VCARX\n")
+    stat = file_path.stat()
+    os.utime(file_path, ns=(stat.st_atime_ns, key.mtime_ns))
+    new_key = get_file_key(file_path)
+
+    assert new_key.size == key.size
+    assert new_key.mtime_ns == key.mtime_ns
+    assert read_snapshot(file_path, new_key) is None
+
+    # Same content, different modification time
+    assert (
+        read_snapshot(file_path, FileKey(key.size, key.mtime_ns + 1, key.sha256))
+        is None
+    )
+
+
+def test_read_snapshot_corrupted(tmp_path):
+    file_path = tmp_path / "contacts.vcf"
+    file_path.write_bytes(b"BEGIN:VCARD\nEND:VCARD\n")
+    key = get_file_key(file_path)
+    snapshot_path = get_snapshot_path(file_path)
+
+    snapshot_path.write_bytes(b"not a snapshot")
+    assert read_snapshot(file_path, key) is None
+
+    write_snapshot(file_path, key, PAYLOAD)
+    snapshot_path.write_bytes(snapshot_path.read_bytes()[:-4])
+    assert read_snapshot(file_path, key) is None
@@ -0,0 +1,159 @@
+import math
+import random
+from collections import Counter
+
+from contactlookup.indexes.text_index import K1, B, TextIndex, contact_tokens, tokenize
+from contactlookup.models.address import Address
+from contactlookup.models.contact import Contact
+from contactlookup.models.email import Email
+
+
+def _contact(contact_id: int, first_name: str, company: str | None = None) -> Contact:
+    return Contact(contact_id, first_name, "", None, company, None)
+
+
+def _index(contacts: list[Contact]) -> TextIndex:
+    index = TextIndex()
+    for contact in contacts:
+        index.add(contact)
+    return index
+
+
+def _reference_search(
+    contacts: list[Contact],
+    query: str,
+    limit: int,
+) -> list[tuple[int, float]]:
+    """Score every contact with BM25, one at a time."""
+    tokens = {contact.id: Counter(contact_tokens(contact)) for contact in contacts}
+    tokens = {contact_id: counts for contact_id, counts in tokens.items() if counts}
+    average_length = sum(sum(counts.values()) for counts in tokens.values()) / len(
+        tokens,
+    )
+    query_tokens = set(tokenize(query))
+    scores = []
+    for contact_id, counts in tokens.items():
+        if not query_tokens or not query_tokens <= counts.keys():
+            continue
+        length = sum(counts.values())
+        score = 0.0
+        for token in query_tokens:
+            count = sum(token in other for other in tokens.values())
+            idf = math.log(1 + (len(tokens) - count + 0.5) / (count + 0.5))
+            frequency = counts[token]
+            score += (
+                idf
+                * frequency
+                * (K1 + 1)
+                / (frequency + K1 * (1 - B + B * length / average_length))
+            )
+        scores.append((contact_id, score))
+    scores.sort(key=lambda entry: (-entry[1], entry[0]))
+    return scores[:limit]
+
+
+def test_contact_tokens():
+    contact = Contact(1, "MARY-ANN", "O'NEIL", None, "Acme Inc.", "CEO", "Em")
+    contact.add_address(
+        Address(
+            street="1 Main St",
+            city="Toronto",
+            state="ON",
+            postal_code=None,
+            contact_id=1,
+            country="Canada",
+        ),
+    )
+    contact.add_email(Email(email="mary.oneil@acme.com", type=None, contact_id=1))
+
+    assert contact_tokens(contact) == [
+        "MARY",
+        "ANN",
+        "O",
+        "NEIL",
+        "ACME",
+        "INC",
+        "CEO",
+        "EM",
+        "1",
+        "MAIN",
+        "ST",
+        "TORONTO",
+        "ON",
+        "CANADA",
+        "MARY",
+        "ONEIL",
+    ]
+    assert tokenize(None) == []
+    assert tokenize("snake_case") == ["SNAKE", "CASE"]
+
+
+def test_text_index_search():
+    index = _index(
+        [
+            _contact(1, "Anna", "Acme"),
+            _contact(2, "Bob", "Acme Widgets Acme"),
+            _contact(3, "Carl", "Widgets"),
+            _contact(4, "Dana", None),
+        ],
+    )
+
+    assert len(index) == 4
+    # A repeated token weighs more, and a rare token weighs more
+    assert [contact_id for contact_id, _ in index.search("acme")] == [2, 1]
+    assert [contact_id for contact_id, _ in index.search("widgets")] == [3, 2]
+    # Every token must match
+    assert [contact_id for contact_id, _ in index.search("acme widgets")] == [2]
+    assert index.search("acme zzz") == []
+    assert index.search("") == []
+    assert index.search("acme", limit=0) == []
+    assert [contact_id for contact_id, _ in index.search("acme", limit=1)] == [2]
+
+
+def test_text_index_matches_reference():
+    rng = random.Random(0)
+    words = ["ALPHA", "BETA", "GAMMA", "DELTA", "EPSILON", "ZETA", "ETA", "THETA"]
+    contacts = [
+        _contact(
+            contact_id,
+            " ".join(rng.choices(words[:4], k=rng.randint(1, 3))),
+            " ".join(rng.choices(words, k=rng.randint(0, 6))),
+        )
+        for contact_id in range(1, 301)
+    ]
+    index = _index(contacts)
+
+    for _ in range(200):
+        query = " ".join(rng.choices(words, k=rng.randint(1, 3)))
+        limit = rng.randint(1, 20)
+        results = index.search(query, limit)
+        expected = _reference_search(contacts, query, limit)
+        assert [contact_id for contact_id, _ in results] == [
+            contact_id for contact_id, _ in expected
+        ]
+        for (_, score), (_, expected_score) in zip(results, expected):
+            assert math.isclose(score, expected_score)
+
+
+def test_text_index_updated():
+    contacts = [
+        _contact(1, "Anna", "Acme"),
+        _contact(2, "Bob", "Acme Widgets"),
+        _contact(3, "Carl", "Widgets"),
+    ]
+    index = _index(contacts)
+
+    updated = index.updated(
+        removed=[contacts[1]],
+        added=[_contact(4, "Dana", "Acme"), _contact(5, "Bob", None)],
+    )
+    # The original index is unchanged
+    assert [contact_id for contact_id, _ in index.search("acme")] == [1, 2]
+    assert [contact_id for contact_id, _ in index.search("bob")] == [2]
+    assert len(updated) == 4
+    assert [contact_id for contact_id, _ in updated.search("acme")] == [1, 4]
+    assert [contact_id for contact_id, _ in updated.search("bob")] == [5]
+    assert updated.search("acme widgets") == []
+    assert updated.search("acme") == _index(
+        [contacts[0], contacts[2], _contact(4, "Dana", "Acme"), _contact(5, "Bob")],
+    ).search("acme")
@@ -0,0 +1,160 @@
+import random
+
+from contactlookup.indexes.trigram_index import (
+    TrigramIndex,
+    bounded_distance,
+    letter_mask,
+    match_terms,
+    min_shared_trigrams,
+    name_terms,
+    rank_matches,
+    trigrams,
+)
+from contactlookup.models.contact import Contact
+
+NAMES = [
+    ("John", "Smith", None, None),
+    ("Jon", "Smyth", None, None),
+    ("Katherine", "Jones", None, "Kate"),
+    ("Catherine", "Johnson", "Mary Ann", None),
+    ("Joan", "Smith", None, None),
+]
+
+
+def _contacts() -> list[Contact]:
+    return [
+        Contact(contact_id, first_name, last_name, other_names, None, None, nickname)
+        for contact_id, (first_name, last_name, other_names, nickname) in enumerate(
+            NAMES,
+            start=1,
+        )
+    ]
+
+
+def _index(contacts: list[Contact]) -> TrigramIndex:
+    index = TrigramIndex()
+    for contact in contacts:
+        index.add(contact)
+    return index
+
+
+def _reference_distance(source: str, target: str) -> int:
+    """Edit distance with transpositions, one cell at a time."""
+    rows = [list(range(len(target) + 1))]
+    for i in range(1, len(source) + 1):
+        row = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            row[j] = min(
+                rows[i - 1][j] + 1,
+                row[j - 1] + 1,
+                rows[i - 1][j - 1] + (source[i - 1] != target[j - 1]),
+            )
+            if (
+                i > 1
+                and j > 1
+                and source[i - 1] == target[j - 2]
+                and source[i - 2] == target[j - 1]
+            ):
+                row[j] = min(row[j], rows[i - 2][j - 2] + 1)
+        rows.append(row)
+    return rows[-1][-1]
+
+
+def test_name_terms():
+    assert name_terms("Mary-Ann", None, "o'neil", "MARY") == [
+        "MARY",
+        "ANN",
+        "O",
+        "NEIL",
+    ]
+    assert name_terms("", None) == []
+    assert trigrams("AB") == {"  A", " AB", "AB "}
+
+
+def test_bounded_distance():
+    assert bounded_distance("JOHN", "JOHN", 2) == 0
+    assert bounded_distance("JONH", "JOHN", 1) == 1
+    assert bounded_distance("KATHERINE", "CATHERINE", 1) == 1
+    assert bounded_distance("KATHERINE", "KATHRYN", 2) is None
+    assert bounded_distance("", "ABC", 3) == 3
+
+    rng = random.Random(0)
+    for _ in range(2000):
+        source = "".join(rng.choice("ABC") for _ in range(rng.randint(0, 8)))
+        target = "".join(rng.choice("ABC") for _ in range(rng.randint(0, 8)))
+        expected = _reference_distance(source, target)
+        assert bounded_distance(source, target, 8) == expected
+        # The letter masks never prune a term within the distance
+        missing = (letter_mask(source) & ~letter_mask(target)).bit_count()
+        assert missing <= expected
+
+
+def test_min_shared_trigrams():
+    assert min_shared_trigrams("JOHNSON", 0) == 8
+    assert min_shared_trigrams("JOHNSON", 1) == 4
+    assert min_shared_trigrams("JOHNSON", 2) == 2
+    assert min_shared_trigrams("JO", 0) == 3
+
+
+def test_trigram_index_matches():
+    index = _index(_contacts())
+
+    # JOAN is two edits away, more than a 4-letter term tolerates
+    assert index.matches("JONH") == {"JOHN": 1, "JON": 1}
+    assert index.matches("JONH", max_distance=2) == {
+        "JOHN": 1,
+        "JON": 1,
+        "JOAN": 2,
+        "JONES": 2,
+    }
+    assert index.matches("JOHN", max_distance=0) == {"JOHN": 0}
+    assert index.matches("CATHERINE") == {"CATHERINE": 0, "KATHERINE": 1}
+    assert index.matches("XYZ") == {}
+    assert match_terms("JONH", ["JOHN", "JON", "JOAN", "SMITH"], 1) == index.matches(
+        "JONH",
+    )
+
+
+def test_trigram_index_search():
+    index = _index(_contacts())
+
+    # Sorted by total distance, then by ID
+    assert index.search("Jonh Smith") == [(1, 1), (2, 2)]
+    assert index.search("Jonh Smith", limit=1) == [(1, 1)]
+    assert index.search("smith") == [(1, 0), (5, 0), (2, 1)]
+    assert index.search("katherine") == [(3, 0), (4, 1)]
+    # Other names and nicknames are searched too
+    assert index.search("mary catherine") == [(4, 0)]
+    assert index.search("kate jones") == [(3, 0)]
+    # Every term must match
+    assert index.search("john xyz") == []
+    assert index.search("") == []
+    assert index.search("john", limit=0) == []
+
+
+def test_trigram_index_updated():
+    contacts = _contacts()
+    index = _index(contacts)
+
+    updated = index.updated(
+        removed=[contacts[0]],
+        added=[Contact(6, "Johnny", "Smith", None, None, None)],
+    )
+    # The original index is unchanged
+    assert index.search("john smith") == [(1, 0), (5, 1), (2, 2)]
+    assert index.search("johnny") == [(1, 2)]
+    assert updated.search("john smith") == [(5, 1), (2, 2)]
+    assert updated.search("johnny") == [(6, 0)]
+
+
+def test_rank_matches():
+    contact_ids = {"A": [1, 2], "B": [2, 3], "C": [3]}.get
+
+    assert rank_matches([{"A": 0, "C": 1}], contact_ids, 10) == [
+        (1, 0),
+        (2, 0),
+        (3, 1),
+    ]
+    assert rank_matches([{"A": 1}, {"B": 0, "C": 0}], contact_ids, 10) == [(2, 1)]
+    assert rank_matches([{"A": 1}, {}], contact_ids, 10) == []
+    assert rank_matches([], contact_ids, 10) == []
@@ -1,6 +1,12 @@
 import logging
+import sys
 
-from contactlookup.utils import initialize_application_logger, split_unix_path_string
+from contactlookup.utils import (
+    TimedIterator,
+    approximate_size,
+    initialize_application_logger,
+    split_unix_path_string,
+)
 
 
 def test_split_unix_path_string():
@@ -59,3 +65,23 @@ def test_initialize_application_logger():
         "%(asctime)s - %(name)s (%(filename)s:%(lineno)d): [%(levelname)s] %(message)s"
     )
     assert logger.handlers[0].formatter._fmt == expected_format
+
+
+def test_timed_iterator():
+    items = TimedIterator(iter([1, 2, 3]))
+    assert list(items) == [1, 2, 3]
+    assert items.seconds > 0
+
+
+def test_approximate_size():
+    values = [f"{index:0100d}" for index in range(10000)]
+    exact = approximate_size(values, sample=len(values))
+    assert exact == sys.getsizeof(values) + sum(map(sys.getsizeof, values))
+    # Only some of the values are walked, and their size is scaled
+    assert abs(approximate_size(values, sample=100) - exact) < exact / 100
+    # Shared objects are counted once, excluded objects are not counted
+    shared = [values, values]
+    assert approximate_size(shared, sample=len(values)) == (
+        sys.getsizeof(shared) + exact
+    )
+    assert approximate_size(values, exclude=(str,)) == sys.getsizeof(values)
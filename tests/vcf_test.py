@@ -0,0 +1,197 @@
+from pathlib import Path
+
+import pytest
+
+from contactlookup.definitions import SAMPLE_CONTACTS_DIR, SAMPLE_CONTACTS_FILE
+from contactlookup.utils import split_unix_path_string
+from contactlookup.vcf import (
+    extract_vcard_properties,
+    iter_vcard_blocks,
+    split_vcard_ranges,
+)
+
+CARD_ONE = b"BEGIN:VCARD\r\nVERSION:4.0\r\nFN:John Doe\r\nEND:VCARD\r\n"
+CARD_TWO = b"BEGIN:VCARD\r\nVERSION:4.0\r\nFN:Jane Doe\r\nEND:VCARD\r\n"
+
+
+def test_iter_vcard_blocks(tmp_path):
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes(CARD_ONE + b"\r\nstray text\r\n" + CARD_TWO)
+
+    blocks = list(iter_vcard_blocks(vcf_file))
+
+    assert blocks == [CARD_ONE, CARD_TWO]
+
+
+def test_iter_vcard_blocks_case_insensitive_markers(tmp_path):
+    card = b"begin:vcard\nFN:John Doe\nend:vcard\n"
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes(card)
+
+    assert list(iter_vcard_blocks(vcf_file)) == [card]
+
+
+def test_iter_vcard_blocks_nested_card(tmp_path):
+    card = (
+        b"BEGIN:VCARD\nFN:John Doe\nAGENT:\nBEGIN:VCARD\nFN:Jane Doe\n"
+        b"END:VCARD\nEND:VCARD\n"
+    )
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes(card + CARD_TWO)
+
+    assert list(iter_vcard_blocks(vcf_file)) == [card, CARD_TWO]
+
+
+def test_iter_vcard_blocks_unterminated_card(tmp_path):
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes(CARD_ONE + b"BEGIN:VCARD\r\nFN:Jane Doe\r\n")
+
+    assert list(iter_vcard_blocks(vcf_file)) == [CARD_ONE]
+
+
+def test_iter_vcard_blocks_byte_range(tmp_path):
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes(CARD_ONE + CARD_TWO)
+
+    # A card that begins before the end offset is read to completion
+    assert list(iter_vcard_blocks(vcf_file, end=1)) == [CARD_ONE]
+    assert list(iter_vcard_blocks(vcf_file, start=len(CARD_ONE))) == [CARD_TWO]
+    assert list(iter_vcard_blocks(vcf_file, start=0, end=0)) == []
+
+
+@pytest.mark.datafiles(SAMPLE_CONTACTS_DIR)
+def test_iter_vcard_blocks_sample_file(datafiles):
+    dir_paths = split_unix_path_string(str(datafiles))
+    contacts_file_path = Path("/".join(dir_paths)) / SAMPLE_CONTACTS_FILE
+
+    blocks = list(iter_vcard_blocks(contacts_file_path))
+
+    assert len(blocks) == 4
+    assert all(block.startswith(b"BEGIN:VCARD") for block in blocks)
+    assert all(block.rstrip().endswith(b"END:VCARD") for block in blocks)
+
+
+def test_split_vcard_ranges(tmp_path):
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes((CARD_ONE + CARD_TWO) * 10)
+
+    ranges = split_vcard_ranges(vcf_file, 4)
+
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == vcf_file.stat().st_size
+    # The ranges are contiguous and every range starts on a card boundary
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert start % len(CARD_ONE) == 0
+
+    blocks = [
+        block
+        for start, end in ranges
+        for block in iter_vcard_blocks(vcf_file, start, end)
+    ]
+    assert blocks == list(iter_vcard_blocks(vcf_file))
+
+
+def test_split_vcard_ranges_nested_cards(tmp_path):
+    nested_card = (
+        b"BEGIN:VCARD\nFN:John Doe\nAGENT:\nBEGIN:VCARD\nFN:Jane Doe\n"
+        b"END:VCARD\nNOTE:" + b"x" * 200 + b"\nEND:VCARD\n"
+    )
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes((CARD_ONE + nested_card) * 10)
+
+    # The ranges never start at the nested card
+    for parts in range(2, 40):
+        ranges = split_vcard_ranges(vcf_file, parts)
+        blocks = [
+            block
+            for start, end in ranges
+            for block in iter_vcard_blocks(vcf_file, start, end)
+        ]
+        assert blocks == list(iter_vcard_blocks(vcf_file))
+
+
+def test_split_vcard_ranges_more_parts_than_cards(tmp_path):
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes(CARD_ONE + CARD_TWO)
+
+    ranges = split_vcard_ranges(vcf_file, 16)
+
+    assert ranges == [(0, len(CARD_ONE)), (len(CARD_ONE), len(CARD_ONE + CARD_TWO))]
+
+
+def test_split_vcard_ranges_single_part(tmp_path):
+    vcf_file = tmp_path / "contacts.vcf"
+    vcf_file.write_bytes(CARD_ONE)
+
+    assert split_vcard_ranges(vcf_file, 1) == [(0, len(CARD_ONE))]
+
+
+def test_extract_vcard_properties():
+    card = (
+        b"BEGIN:VCARD\r\n"
+        b"VERSION:4.0\r\n"
+        b"FN:John\r\n  Doe\r\n"
+        b"item1.TEL;TYPE=cell,voice:+1-555-555-5555\r\n"
+        b"ORG:Acme\\, Inc;Sales\r\n"
+        b"TITLE:CEO\r\n"
+        b"NOTE:Not read\r\n"
+        b"ADR;TYPE=WORK;PREF=1:;;123 Main St;Anytown;CA;12345;USA\r\n"
+        b"END:VCARD\r\n"
+    )
+
+    properties = extract_vcard_properties(card)
+
+    assert set(properties) == {"fn", "tel", "org", "title", "adr"}
+    assert properties["fn"][0].value == "John Doe"
+    assert properties["tel"][0].value == "+1-555-555-5555"
+    assert properties["tel"][0].params == {"TYPE": ["cell", "voice"]}
+    assert properties["org"][0].value == ["Acme, Inc", "Sales"]
+    assert properties["title"][0].value == "CEO"
+    address = properties["adr"][0]
+    assert address.params == {"TYPE": ["WORK"], "PREF": ["1"]}
+    assert address.value.street == "123 Main St"
+    assert address.value.city == "Anytown"
+    assert address.value.region == "CA"
+    assert address.value.code == "12345"
+    assert address.value.country == "USA"
+
+
+def test_extract_vcard_properties_quoted_printable():
+    card = (
+        b"BEGIN:VCARD\r\n"
+        b"VERSION:2.1\r\n"
+        b"FN;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:J=C3=B6rg M=\r\n"
+        b"=C3=BCller\r\n"
+        b"NICKNAME;QUOTED-PRINTABLE:J=C3=B6\r\n"
+        b"END:VCARD\r\n"
+    )
+
+    properties = extract_vcard_properties(card)
+
+    assert properties["fn"][0].value == "Jörg Müller"
+    assert properties["fn"][0].params == {"CHARSET": ["UTF-8"]}
+    assert properties["nickname"][0].value == "Jö"
+
+
+def test_extract_vcard_properties_quoted_param():
+    card = b'BEGIN:VCARD\nTEL;TYPE="work,voice";LABEL="a:b":555\nEND:VCARD\n'
+
+    properties = extract_vcard_properties(card)
+
+    assert properties["tel"][0].value == "555"
+    assert properties["tel"][0].params == {"TYPE": ["work,voice"], "LABEL": ["a:b"]}
+
+
+def test_extract_vcard_properties_rejected():
+    # Cards the fast path does not support are left to vobject
+    base64_card = b"BEGIN:VCARD\nFN;ENCODING=B:Sm9obg==\nEND:VCARD\n"
+    nested_card = (
+        b"BEGIN:VCARD\nFN:John\nAGENT:\nBEGIN:VCARD\nFN:Jane\nEND:VCARD\nEND:VCARD\n"
+    )
+    malformed_card = b"BEGIN:VCARD\nFN John\nEND:VCARD\n"
+
+    assert extract_vcard_properties(base64_card) is None
+    assert extract_vcard_properties(nested_card) is None
+    assert extract_vcard_properties(malformed_card) is None